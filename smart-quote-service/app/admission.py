@@ -0,0 +1,133 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from .config import get_settings
+from .metrics import ADMISSION_REJECTED_TOTAL, SINGLEFLIGHT_JOINED_TOTAL
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight computation.
+
+    The computation is shielded from its callers: if the first caller goes
+    away (client disconnect), the ones that joined still get the result.
+    The key is forgotten once the computation finishes, so only truly
+    concurrent duplicates are merged; nothing is cached.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+            self.started += 1
+        else:
+            self.joined += 1
+            SINGLEFLIGHT_JOINED_TOTAL.inc(group=self.name)
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: Hashable, fut: asyncio.Future):
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "joined": self.joined}
+
+class Overloaded(Exception):
+    def __init__(self, retry_after_s: float):
+        super().__init__(f"over capacity, retry after {retry_after_s:g}s")
+        self.retry_after_s = retry_after_s
+
+class AdmissionGate:
+    """At most `limit` holders at once, at most `queue_max` waiting behind them.
+
+    A caller that finds the queue full, or waits longer than wait_s, gets
+    Overloaded straight away instead of piling onto the upstream.
+    """
+
+    def __init__(self, name: str, limit: int, queue_max: int, wait_s: float, retry_after_s: float):
+        self.name = name
+        self.limit = limit
+        self.queue_max = queue_max
+        self.wait_s = wait_s
+        self.retry_after_s = retry_after_s
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        if self._sem.locked():
+            if self.waiting >= self.queue_max:
+                self.rejected += 1
+                ADMISSION_REJECTED_TOTAL.inc(gate=self.name, reason="queue_full")
+                raise Overloaded(self.retry_after_s)
+            self.waiting += 1
+            # Not wait_for: on 3.11 a timeout racing a successful acquire can
+            # drop the permit. The acquire runs as its own task, so whether it
+            # got the permit can be checked before giving up on it.
+            acquire = asyncio.ensure_future(self._sem.acquire())
+            try:
+                await asyncio.wait((acquire,), timeout=self.wait_s)
+            except BaseException:
+                self._abandon(acquire)
+                raise
+            finally:
+                self.waiting -= 1
+            if not acquire.done():
+                self._abandon(acquire)
+                self.timed_out += 1
+                ADMISSION_REJECTED_TOTAL.inc(gate=self.name, reason="timeout")
+                raise Overloaded(self.retry_after_s)
+        else:
+            await self._sem.acquire()
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+    def _abandon(self, acquire: asyncio.Future) -> None:
+        if acquire.done():
+            if not acquire.cancelled():
+                self._sem.release()
+        else:
+            # Semaphore.acquire hands back a permit it was granted but not yet resumed with
+            acquire.cancel()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "queue_max": self.queue_max, "wait_s": self.wait_s,
+                "active": self.active, "waiting": self.waiting, "admitted": self.admitted,
+                "rejected": self.rejected, "timed_out": self.timed_out}
+
+_llm_gate: Optional[AdmissionGate] = None
+_quote_flights: Optional[SingleFlight] = None
+
+def get_llm_gate() -> AdmissionGate:
+    # Bounds concurrent LLM provider calls per worker (cache hits never queue)
+    global _llm_gate
+    if _llm_gate is None:
+        s = get_settings()
+        _llm_gate = AdmissionGate("llm", s.llm_max_inflight, s.llm_queue_max, s.llm_queue_wait_s,
+                                  s.llm_retry_after_s)
+    return _llm_gate
+
+def get_quote_flights() -> SingleFlight:
+    global _quote_flights
+    if _quote_flights is None:
+        _quote_flights = SingleFlight("quote")
+    return _quote_flights
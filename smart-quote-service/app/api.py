@@ -1,41 +1,58 @@
-import random, datetime as dt
-from fastapi import APIRouter, HTTPException, status
+import asyncio, math, random, time, datetime as dt
+from typing import Optional, Tuple
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pathlib import Path
 from .schemas import (
     PrepareRequest,
     PrepareResponse,
-    CandidateOut,
     InvoiceRequest,
     InvoiceOut,
     SimplePrepareRequest,
     Item,
     Project,
+    BatchPrepareRequest,
+    BatchPrepareResponse,
+    RerankRequest,
+    RerankResponse,
 )
+from .admission import Overloaded
+from .cache import get_shared_cache
 from .config import get_settings
-from .routing import route_distance_eta
-from .costing import material_cost, freight_cost, tax_gst, demo_price_lookup
-from .ranking import Candidate, rank_candidates
-from .llm import summarize_with_llm
-from .invoice import render_invoice
+from .routing import (
+    route_distance_eta_many_async, route_matrix_async, osrm_health,
+)
+from .costing import freight_cost, tax_gst
+from .dispatch import DispatchPlan, next_slot, plan_dispatch
+from .risk import RiskBudgetExceeded, RiskProfile, simulate_risk
+from .geocode import Geocode, resolve_site
+from .normalize import normalize_materials
+from .pricing import get_price_catalog
+from .ranking import Candidate, CandidateBatch, rank_batch
+from .sourcing import SplitPlan, optimize_split
+from .sessions import get_quote_sessions, merge_weights, rerank
+from .llm import (
+    summarize_with_llm_async, is_fallback_summary,
+    stream_summary_async,
+)
+from .invoice import build_invoice_html
+from .invoice_queue import QueueFull
+from .resources import Resources, get_resources
+from .metrics import stage, record_stage, render_prometheus, LLM_FALLBACK_TOTAL
+from .serialize import encode_json, render
+from .vendors import get_vendor_registry
 
 router = APIRouter()
 
-# Replace with your DB later
-VENDORS = [
-    {"id": 1, "name": "Mumbai Steel & Cement Co", "lat": 19.0760, "lng": 72.8777, "on_time_rate": 0.92, "quality_score": 0.88, "accept_prob": 0.65, "rate_tkm": 3.9, "price_volatility": 0.03},
-    {"id": 2, "name": "Chennai BuildSupplies",   "lat": 13.0827, "lng": 80.2707, "on_time_rate": 0.89, "quality_score": 0.86, "accept_prob": 0.60, "rate_tkm": 3.7, "price_volatility": 0.035},
-    {"id": 3, "name": "Delhi InfraMart",          "lat": 28.7041, "lng": 77.1025, "on_time_rate": 0.94, "quality_score": 0.90, "accept_prob": 0.70, "rate_tkm": 4.0, "price_volatility": 0.028},
-    {"id": 4, "name": "Ahmedabad Materials",      "lat": 23.0225, "lng": 72.5714, "on_time_rate": 0.91, "quality_score": 0.87, "accept_prob": 0.62, "rate_tkm": 3.6, "price_volatility": 0.032},
-    {"id": 5, "name": "Bengaluru Supply Hub",     "lat": 12.9716, "lng": 77.5946, "on_time_rate": 0.90, "quality_score": 0.89, "accept_prob": 0.68, "rate_tkm": 3.8, "price_volatility": 0.031},
-]
-
 @router.get("/health")
 def health():
     return {"status": "ok"}
 
 @router.get("/health/ai")
-def health_ai():
+def health_ai(res: Resources = Depends(get_resources)):
     try:
-        s = get_settings()
+        s = res.settings
         return {
             "ai_key_present": bool(s.groq_api_key or s.gemini_api_key),
             "groq": bool(s.groq_api_key),
@@ -44,57 +61,237 @@ def health_ai():
     except Exception:
         return {"ai_key_present": False, "groq": False, "gemini": False}
 
-def compute_candidates(req: PrepareRequest):
-    settings = get_settings()
-    origin = (req.project.site_lat, req.project.site_lng)
+@router.get("/health/osrm")
+def health_osrm(res: Resources = Depends(get_resources)):
+    return {**osrm_health(), "tiles": res.route_tiles.stats()}
 
-    items_dict = [it.dict() for it in req.items]
-    total_weight = sum((it.get("weight_ton") or 0.0) for it in items_dict)
-    m_cost = material_cost(items_dict, demo_price_lookup)
-
-    cands = []
-    for v in VENDORS:
-        dist_km, eta_min, _ = route_distance_eta(settings.osrm_url, origin, (v["lat"], v["lng"]), dow=2, hour=10, rain_mm=0.0)
-        f_cost = freight_cost(dist_km, total_weight, base_rate_per_tkm=v["rate_tkm"])
-        taxes = tax_gst(m_cost, settings.gst_pct)
-        handling = 0.01 * m_cost
-        c = Candidate(
-            vendor_id=v["id"], vendor_name=v["name"], distance_km=dist_km,
-            on_time_rate=v["on_time_rate"], quality_score=v["quality_score"],
-            acceptance_prob=v["accept_prob"], material_cost=m_cost,
-            freight_cost=f_cost, taxes=taxes, handling=handling,
-            eta_minutes=eta_min, price_volatility=v["price_volatility"]
-        )
-        cands.append(c)
+@router.get("/health/geocode")
+def health_geocode(res: Resources = Depends(get_resources)):
+    return res.gazetteer.stats()
+
+@router.get("/health/quote-sessions")
+def health_quote_sessions(res: Resources = Depends(get_resources)):
+    return res.quote_sessions.stats()
+
+@router.get("/health/route-cache")
+def health_route_cache(res: Resources = Depends(get_resources)):
+    return res.route_cache.stats()
+
+@router.get("/health/shared-cache")
+def health_shared_cache(res: Resources = Depends(get_resources)):
+    return res.shared_cache.stats() if res.shared_cache else {"enabled": False}
+
+@router.get("/health/admission")
+def health_admission(res: Resources = Depends(get_resources)):
+    return {"llm": res.llm_gate.stats(), "quote_flights": res.quote_flights.stats()}
+
+@router.get("/health/llm-providers")
+def health_llm_providers(res: Resources = Depends(get_resources)):
+    return res.llm_router.stats()
+
+@router.get("/health/llm-cache")
+def health_llm_cache(res: Resources = Depends(get_resources)):
+    return res.summary_cache.stats() if res.summary_cache else {"enabled": False}
+
+@router.get("/health/vendors")
+def health_vendors(res: Resources = Depends(get_resources)):
+    return res.vendors.stats()
+
+@router.post("/v1/vendors/reload")
+def reload_vendors(res: Resources = Depends(get_resources)):
+    res.vendors.reload()
+    return res.vendors.stats()
+
+@router.get("/health/prices")
+def health_prices(res: Resources = Depends(get_resources)):
+    return res.prices.stats()
+
+@router.post("/v1/prices/reload")
+def reload_prices(res: Resources = Depends(get_resources)):
+    res.prices.reload()
+    return res.prices.stats()
+
+def _shortlist(req: PrepareRequest, settings, snap=None):
+    # Spatial prefilter so only nearby vendors go on to routing and costing
+    snap = snap or get_vendor_registry().snapshot()
+    k = req.prefilter_k if req.prefilter_k is not None else settings.vendor_prefilter_k
+    idx = snap.index.shortlist(
+        req.project.site_lat, req.project.site_lng, k=k, radius_km=req.prefilter_radius_km,
+    )
+    return snap, idx
+
+def _dispatch_at(plan: Optional[DispatchPlan], i: int) -> Optional[str]:
+    return plan.dispatch_at(i).isoformat() if plan is not None else None
+
+def _risk_out(risk: Optional[RiskProfile], i: int, score: float) -> Optional[dict]:
+    if risk is None:
+        return None
+    return {"p50_landed_cost": round(float(risk.p50[i]),2), "p90_landed_cost": round(float(risk.p90[i]),2),
+            "p_on_time": round(float(risk.p_on_time[i]),4), "score": round(float(score),4),
+            "scenarios": risk.scenarios}
 
-    ranked = rank_candidates(cands)
-    top = [CandidateOut(
-        vendor_id=c.vendor_id, vendor_name=c.vendor_name,
-        landed_cost=round(c.landed_cost,2),
-        breakdown={
+def _candidate_out(c: Candidate, route_source: Optional[str]=None, dispatch_at: Optional[str]=None,
+                   risk: Optional[dict]=None) -> dict:
+    # Plain dict with CandidateOut's fields, encoded once by app.serialize
+    return {
+        "vendor_id": c.vendor_id, "vendor_name": c.vendor_name,
+        "landed_cost": round(c.landed_cost,2),
+        "breakdown": {
             "material": round(c.material_cost,2),
             "freight": round(c.freight_cost,2),
             "taxes": round(c.taxes,2),
             "handling": round(c.handling,2)
         },
-        eta_minutes=int(c.eta_minutes),
-        on_time_rate=round(c.on_time_rate,2),
-        quality_score=round(c.quality_score,2),
-        acceptance_prob=round(c.acceptance_prob,2),
-        distance_km=round(c.distance_km,1)
-    ) for (c, s) in ranked[:5]]
+        "eta_minutes": int(c.eta_minutes),
+        "on_time_rate": round(c.on_time_rate,2),
+        "quality_score": round(c.quality_score,2),
+        "acceptance_prob": round(c.acceptance_prob,2),
+        "distance_km": round(c.distance_km,1),
+        "route_source": route_source,
+        "dispatch_at": dispatch_at,
+        "risk": risk,
+    }
+
+def _no_candidates(settings):
+    # Nothing in the prefilter (e.g. a radius with no vendors): no routing, costing or LLM
+    return [], {"currency": settings.currency, "gst_pct": settings.gst_pct, "candidates": []}, None
+
+def _build_candidates(req: PrepareRequest, snap, idx, routes, settings):
+    if not len(idx):
+        return _no_candidates(settings)
+    # routes are free-flow; ETAs are for each vendor's best dispatch slot in the window
+    with stage("dispatch"):
+        dispatch = plan_dispatch([r[1] for r in routes], req.project.delivery_window_days, next_slot())
+    t0 = time.perf_counter()
+    weights = merge_weights(req.weights)
+    items_dict = [it.dict() for it in req.items]
+    site = (req.project.site_lat, req.project.site_lng)
+    qty = np.array([it["qty"] for it in items_dict], dtype=float)
+    weight_ton = np.array([it.get("weight_ton") or 0.0 for it in items_dict], dtype=float)
+    # Per-vendor unit prices from the price catalog (vendor prices, tiers, region)
+    prices = get_price_catalog().snapshot()
+    unit = prices.line_prices(items_dict, snap.id[idx], site)
+    m_cost = unit @ qty
+
+    dist_km = np.array([r[0] for r in routes], dtype=float)
+    rate_tkm = snap.rate_tkm[idx]
+    batch = CandidateBatch(
+        vendor_id=snap.id[idx], vendor_name=snap.name[idx].tolist(),
+        distance_km=dist_km, eta_minutes=dispatch.eta_minutes,
+        on_time_rate=snap.on_time_rate[idx], quality_score=snap.quality_score[idx],
+        acceptance_prob=snap.accept_prob[idx], price_volatility=snap.price_volatility[idx],
+        material_cost=m_cost, taxes=tax_gst(m_cost, settings.gst_pct), handling=0.01 * m_cost,
+        freight_cost=freight_cost(dist_km, float(weight_ton.sum()), base_rate_per_tkm=rate_tkm),
+    )
+
+    record_stage("costing", time.perf_counter() - t0)
+    risk = None
+    if req.risk_mode:
+        try:
+            with stage("risk"):
+                risk = simulate_risk(
+                    batch, req.project.delivery_window_days * 24, dispatch.slot,
+                    scenarios=req.risk_scenarios or settings.risk_scenarios,
+                    seed=settings.risk_seed if req.risk_seed is None else req.risk_seed, max_cells=settings.risk_max_cells,
+                )
+        except RiskBudgetExceeded as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{e}; lower prefilter_k")
+    t1 = time.perf_counter()
+    order, scores = rank_batch(batch, weights, top_k=5, risk=risk)
+    top = [_candidate_out(batch.candidate(i), routes[i][2], _dispatch_at(dispatch, i), _risk_out(risk, i, score))
+           for i, score in zip(order, scores)]
 
     candidates_json = {
         "currency": settings.currency,
         "gst_pct": settings.gst_pct,
-        "candidates": [t.dict() for t in top]
+        "candidates": top,
+    }
+    # The pre-rank set is kept so /quotes/{id}/rerank needs no routing or pricing
+    session = get_quote_sessions().put(
+        items=items_dict, site=site, batch=batch, route_source=[r[2] for r in routes], rate_tkm=rate_tkm,
+        unit_prices=unit, qty=qty, weight_ton=weight_ton, prices=prices, gst_pct=settings.gst_pct,
+        weights=weights, dispatch=dispatch, risk=risk,
+    )
+    record_stage("ranking", time.perf_counter() - t1)
+    if req.split_sourcing and len(order):
+        with stage("sourcing"):
+            plan = optimize_split(
+                batch, unit * qty, weight_ton, rate_tkm, settings.gst_pct, weights=weights,
+                max_vendors=req.split_max_vendors or settings.split_max_vendors, per_item=settings.split_per_item,
+            )
+        if plan is not None:
+            candidates_json["split_plan"] = _split_plan_out(
+                plan, batch, routes, items_dict, float(scores[0]), float(batch.landed_cost[order[0]]), dispatch)
+    return top, candidates_json, session.quote_id
+
+def _split_plan_out(plan: SplitPlan, batch: CandidateBatch, routes, items_dict,
+                    best_single_score: float, best_single_landed: float,
+                    dispatch: Optional[DispatchPlan]=None) -> dict:
+    # SplitPlanOut's fields
+    allocations = []
+    for n, r in enumerate(plan.rows):
+        lines = [int(i) for i in np.flatnonzero(plan.assign == n)]
+        allocations.append({
+            "vendor_id": int(batch.vendor_id[r]), "vendor_name": batch.vendor_name[r],
+            "items": lines, "skus": [items_dict[i]["sku"] for i in lines],
+            "landed_cost": round(float(plan.landed[n]),2),
+            "breakdown": {
+                "material": round(float(plan.material[n]),2),
+                "freight": round(float(plan.freight[n]),2),
+                "taxes": round(float(plan.taxes[n]),2),
+                "handling": round(float(plan.handling[n]),2)
+            },
+            "eta_minutes": int(batch.eta_minutes[r]), "distance_km": round(float(batch.distance_km[r]),1),
+            "route_source": routes[r][2], "dispatch_at": _dispatch_at(dispatch, r),
+        })
+    return {
+        "allocations": allocations, "landed_cost": round(plan.landed_cost,2), "eta_minutes": int(plan.eta_minutes),
+        "on_time_rate": round(plan.on_time_rate,3), "acceptance_prob": round(plan.acceptance_prob,3),
+        "score": round(plan.score,4), "best_single_score": round(best_single_score,4),
+        "best_single_landed_cost": round(best_single_landed,2),
     }
-    return top, candidates_json
 
-def compute_prepare(req: PrepareRequest) -> PrepareResponse:
-    top, candidates_json = compute_candidates(req)
-    summary = summarize_with_llm(req.project.brief, req.project.site_name, candidates_json)
-    if (not summary) or summary.startswith("SmartQuotation (fallback)") or ("API call failed" in summary):
+def _shared_shortlist(req: PrepareRequest, settings, snap):
+    # The routed shortlist for this site and vendor version, as computed by any worker
+    shared = get_shared_cache()
+    if shared is None:
+        return None, None
+    key = "|".join(map(str, (snap.version, settings.osrm_url, "free-flow", *_site_key(req))))
+    hit = shared.get("shortlist", key)
+    if hit is not None:
+        hit = (np.array(hit["idx"], dtype=np.intp), [tuple(r) for r in hit["routes"]])
+    return key, hit
+
+def _share_shortlist(key: Optional[str], idx, routes, settings):
+    # Only fully OSRM-routed shortlists, like the route cache
+    if key is not None and all(r[2] == "osrm" for r in routes):
+        get_shared_cache().set("shortlist", key, {"idx": idx.tolist(), "routes": routes},
+                               settings.shared_cache_shortlist_ttl_s)
+
+async def compute_candidates_async(req: PrepareRequest, settings=None):
+    settings = settings or get_settings()
+    origin = (req.project.site_lat, req.project.site_lng)
+    snap = get_vendor_registry().snapshot()
+    key, hit = _shared_shortlist(req, settings, snap)
+    if hit is not None:
+        return _build_candidates(req, snap, *hit, settings)
+    with stage("shortlist"):
+        snap, idx = _shortlist(req, settings, snap)
+    if not len(idx):
+        return _no_candidates(settings)
+    with stage("routing"):
+        routes = await route_distance_eta_many_async(
+            settings.osrm_url, origin, list(zip(snap.lat[idx].tolist(), snap.lng[idx].tolist())),
+            dow=None, hour=None, chunk_size=settings.osrm_table_chunk,
+        )
+    _share_shortlist(key, idx, routes, settings)
+    return _build_candidates(req, snap, idx, routes, settings)
+
+def _risk_applied(top) -> bool:
+    return bool(top) and top[0]["risk"] is not None
+
+def _finish_prepare(top, summary: str, candidates_json: dict, quote_id: str):
+    if is_fallback_summary(summary):
         summary = ""
     # Console log for verification of AI summary vs computed
     try:
@@ -104,72 +301,141 @@ def compute_prepare(req: PrepareRequest) -> PrepareResponse:
             print("[AI SUMMARY] (empty) -> Computed mode (no LLM)")
     except Exception:
         pass
-    return {"summary": summary, "candidates": top}
+    return {"summary": summary, "candidates": top, "split_plan": candidates_json.get("split_plan"),
+            "quote_id": quote_id, "risk_applied": _risk_applied(top)}
 
+async def compute_prepare_async(req: PrepareRequest, settings=None) -> PrepareResponse:
+    top, candidates_json, quote_id = await compute_candidates_async(req, settings)
+    if not top:
+        return _finish_prepare(top, "", candidates_json, quote_id)
+    try:
+        summary = await summarize_with_llm_async(req.project.brief, req.project.site_name, candidates_json, req.llm_budget_s)
+    except Overloaded:
+        # The summary is optional here: shed the LLM call, answer in computed mode
+        LLM_FALLBACK_TOTAL.inc(reason="overloaded")
+        summary = ""
+    return _finish_prepare(top, summary, candidates_json, quote_id)
+
+def _flight_key(endpoint: str, req: PrepareRequest) -> str:
+    # The normalized request: retries and double submits map to the same key
+    return f"{endpoint}:{req.model_dump_json()}"
+
+
+def _check_weights(weights):
+    try:
+        merge_weights(weights)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.post("/v1/smart-quote/prepare", response_model=PrepareResponse)
-def prepare(req: PrepareRequest):
-    return compute_prepare(req)
+async def prepare(req: PrepareRequest, request: Request, res: Resources = Depends(get_resources)):
+    _check_weights(req.weights)
+    out = await res.quote_flights.do(_flight_key("prepare", req), lambda: compute_prepare_async(req, res.settings))
+    return render(request, out, PrepareResponse)
+
+@router.post("/v1/smart-quote/quotes/{quote_id}/rerank", response_model=RerankResponse)
+def rerank_quote(quote_id: str, req: RerankRequest, request: Request, res: Resources = Depends(get_resources)):
+    session = res.quote_sessions.get(quote_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quote not found or expired")
+    t0 = time.perf_counter()
+    try:
+        batch, rows, scores, filtered_out, risk = rerank(session, req.weights, req.max_eta_minutes,
+                                                         req.min_quality_score, req.quantities, req.top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    elapsed = time.perf_counter() - t0
+    record_stage("rerank", elapsed)
+    return render(request, {
+        "quote_id": quote_id,
+        "candidates": [_candidate_out(batch.candidate(i), session.route_source[i], _dispatch_at(session.dispatch, i),
+                                      _risk_out(risk, i, score)) for i, score in zip(rows, scores)],
+        "weights": merge_weights(req.weights, session.weights),
+        "risk_applied": risk is not None,
+        "filtered_out": filtered_out,
+        "compute_ms": round(elapsed*1000, 4),
+    }, RerankResponse)
 
 
-@router.post("/v1/smart-quote/prepare-simple", response_model=PrepareResponse)
-def prepare_simple(req: SimplePrepareRequest):
-    # Helpers
-    def infer_coords_from_address(addr: str):
-        if not addr:
-            return None
-        a = addr.lower()
-        cities = {
-            "pune": (18.5204, 73.8567),
-            "mumbai": (19.0760, 72.8777),
-            "bombay": (19.0760, 72.8777),
-            "delhi": (28.7041, 77.1025),
-            "new delhi": (28.6139, 77.2090),
-            "chennai": (13.0827, 80.2707),
-            "hyderabad": (17.3850, 78.4867),
-            "hyd": (17.3850, 78.4867),
-            "bengaluru": (12.9716, 77.5946),
-            "bangalore": (12.9716, 77.5946),
-            "ahmedabad": (23.0225, 72.5714),
-        }
-        for k, v in cities.items():
-            if k in a:
-                return v
-        return None
+def _site_key(req: PrepareRequest):
+    return (req.project.site_lat, req.project.site_lng, req.prefilter_k, req.prefilter_radius_km)
 
-    def parse_quantity(q: str) -> float:
-        # Extract leading number; very rough multiplier for demonstration
-        if not q:
-            return 1.0
-        import re
-        m = re.search(r"([0-9]+(?:\.[0-9]+)?)", q)
-        if not m:
-            return 1.0
-        val = float(m.group(1))
-        ql = q.lower()
-        # Heuristic scaling based on unit keywords
-        if "sq ft" in ql or "sqft" in ql:
-            return max(1.0, val / 200.0)  # ~200 sq ft per base unit
-        if "m3" in ql or "cubic" in ql:
-            return max(1.0, val / 2.0)
-        if "ton" in ql or "tons" in ql or "tonne" in ql:
-            return max(1.0, val)
-        if "meter" in ql or "metre" in ql or "m " in ql:
-            return max(1.0, val / 50.0)
-        return max(1.0, val)
+def _items_key(req: PrepareRequest):
+    # Everything besides the site that changes the computed candidates
+    return (tuple((it.sku, it.qty, it.unit_price, it.weight_ton) for it in req.items),
+            req.split_sourcing, req.split_max_vendors, tuple(sorted((req.weights or {}).items())),
+            req.project.delivery_window_days, req.risk_mode, req.risk_scenarios, req.risk_seed)
 
-    # Map simple fields from the frontend into structured request
-    site_lat = req.site_lat if req.site_lat is not None else None
-    site_lng = req.site_lng if req.site_lng is not None else None
-    if site_lat is None or site_lng is None:
-        guessed = infer_coords_from_address(req.address or "")
-        if guessed:
-            site_lat, site_lng = guessed
+async def compute_prepare_batch(breq: BatchPrepareRequest, settings=None):
+    settings = settings or get_settings()
+    snap = get_vendor_registry().snapshot()
+    reqs = breq.requests
+
+    # One shortlist per distinct site (and prefilter), then a single
+    # site x vendor matrix over the union of all shortlisted vendors.
+    shortlists = {}
+    for r in reqs:
+        if _site_key(r) not in shortlists:
+            shortlists[_site_key(r)] = _shortlist(r, settings, snap)[1]
+    origins = list(dict.fromkeys((k[0], k[1]) for k in shortlists))
+    rows = np.unique(np.concatenate(list(shortlists.values()))) if shortlists else np.empty(0, dtype=np.intp)
+    with stage("routing"):
+        matrix = await route_matrix_async(
+            settings.osrm_url, origins, list(zip(snap.lat[rows].tolist(), snap.lng[rows].tolist())),
+            dow=None, hour=None, chunk_size=settings.osrm_table_chunk,
+        )
+    origin_pos = {o: n for n, o in enumerate(origins)}
+    col = {int(r): n for n, r in enumerate(rows)}
+
+    computed = {}
+    results = []
+    for n, r in enumerate(reqs):
+        try:
+            key = (_site_key(r), _items_key(r))
+            if key not in computed:
+                idx = shortlists[key[0]]
+                row = matrix[origin_pos[key[0][:2]]]
+                routes = [row[col[int(i)]] for i in idx]
+                computed[key] = _build_candidates(r, snap, idx, routes, settings)
+            top, candidates_json, quote_id = computed[key]
+            results.append({"index": n, "summary": None, "candidates": top,
+                            "split_plan": candidates_json.get("split_plan"), "quote_id": quote_id,
+                            "risk_applied": _risk_applied(top), "error": None})
+        except HTTPException as e:
+            results.append({"index": n, "summary": None, "candidates": [], "error": e.detail})
+        except Exception as e:
+            results.append({"index": n, "summary": None, "candidates": [], "error": str(e) or type(e).__name__})
+
+    # Optional LLM summaries, run concurrently
+    want = [n for n, on in enumerate(breq.summarize[:len(reqs)]) if on and results[n]["error"] is None]
+    for n in [n for n in want if not results[n]["candidates"]]:
+        results[n]["summary"] = ""
+    want = [n for n in want if results[n]["candidates"]]
+    summaries = await asyncio.gather(*(
+        summarize_with_llm_async(reqs[n].project.brief, reqs[n].project.site_name,
+                                 computed[(_site_key(reqs[n]), _items_key(reqs[n]))][1], reqs[n].llm_budget_s)
+        for n in want
+    ), return_exceptions=True)
+    for n, summary in zip(want, summaries):
+        if isinstance(summary, Overloaded):
+            LLM_FALLBACK_TOTAL.inc(reason="overloaded")
+            results[n]["summary"] = ""
+        elif isinstance(summary, Exception):
+            results[n]["error"] = f"summary failed: {summary}"
         else:
-            site_lat, site_lng = (18.5204, 73.8567)  # Pune default
+            results[n]["summary"] = "" if is_fallback_summary(summary) else summary
+    return {"results": results}
 
-    qty_multiplier = parse_quantity(req.quantity or "")
+@router.post("/v1/smart-quote/prepare-batch", response_model=BatchPrepareResponse)
+async def prepare_batch(req: BatchPrepareRequest, request: Request, res: Resources = Depends(get_resources)):
+    if len(req.requests) > res.settings.batch_max_entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {res.settings.batch_max_entries} requests per batch")
+    return render(request, await compute_prepare_batch(req, res.settings), BatchPrepareResponse)
 
+def _simple_to_prepare(req: SimplePrepareRequest) -> Tuple[PrepareRequest, Geocode]:
+    # Map simple fields from the frontend into structured request
+    site = resolve_site(req.address, req.site_lat, req.site_lng)
     brief = (
         f"Project type: {req.project_type}. Quantity: {req.quantity or 'N/A'}. "
         f"Materials: {', '.join(req.materials)}."
@@ -177,87 +443,69 @@ def prepare_simple(req: SimplePrepareRequest):
     project = Project(
         brief=brief,
         site_name=req.address,
-        site_lat=site_lat,
-        site_lng=site_lng,
+        site_lat=site.lat,
+        site_lng=site.lng,
         delivery_window_days=14,
     )
+    items = [Item(sku=ln.sku, desc=ln.desc, qty=ln.qty, unit_price=None, weight_ton=ln.weight_ton)
+             for ln in normalize_materials(tuple(req.materials), req.quantity)]
+    return PrepareRequest(project=project, items=items, llm_budget_s=req.llm_budget_s), site
 
-    # Simple material to SKU + rough base weight per unit (tons)
-    material_map = {
-        "cement": ("cement_bag_50kg", 0.05),
-        "sand": ("sand_mt", 1.0),
-        "steel tmt": ("rebar_tmt_10mm_ton", 1.0),
-        "tmt": ("rebar_tmt_10mm_ton", 1.0),
-        "bricks": ("bricks_1000", 1.6),
-        "aggregates": ("aggregates_mt", 1.0),
-        "concrete": ("concrete_m3", 2.4),
-    }
+@router.post("/v1/smart-quote/prepare-simple", response_model=PrepareResponse)
+async def prepare_simple(req: SimplePrepareRequest, request: Request, res: Resources = Depends(get_resources)):
+    prep, site = _simple_to_prepare(req)
+    out = await res.quote_flights.do(_flight_key("prepare", prep), lambda: compute_prepare_async(prep, res.settings))
+    return render(request, {**out, "site_geocode": site.dict()}, PrepareResponse)
 
-    items = []
-    per_item_qty = max(1, int(round(qty_multiplier)))
-    for m in req.materials:
-        key = m.strip().lower()
-        sku, base_wt = material_map.get(key, (key, 1.0))
-        items.append(
-            Item(
-                sku=sku,
-                desc=m,
-                qty=per_item_qty,
-                unit_price=None,
-                weight_ton=base_wt * per_item_qty,
-            )
-        )
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {encode_json(data).decode()}\n\n"
 
-    prep = PrepareRequest(project=project, items=items)
-    return compute_prepare(prep)
+async def _stream_prepare(req: PrepareRequest, settings=None):
+    # candidates -> (token | reset)* -> done (full PrepareResponse); reset
+    # tells the client to drop the tokens so far (a provider broke off)
+    top, candidates_json, quote_id = await compute_candidates_async(req, settings)
+    yield _sse("candidates", candidates_json["candidates"])
+    parts = []
+    if top:
+        async for delta in stream_summary_async(req.project.brief, req.project.site_name,
+                                                candidates_json, req.llm_budget_s):
+            if delta is None:
+                parts.clear()
+                yield _sse("reset", {})
+                continue
+            parts.append(delta)
+            yield _sse("token", {"text": delta})
+    done = _finish_prepare(top, "".join(parts), candidates_json, quote_id)
+    yield _sse("done", {**done, "candidates": candidates_json["candidates"]})
 
-@router.post("/v1/smart-quote/prepare-ai")
-def prepare_ai(req: SimplePrepareRequest):
-    # Build structured request like prepare_simple
-    site_lat = req.site_lat if req.site_lat is not None else None
-    site_lng = req.site_lng if req.site_lng is not None else None
-    if site_lat is None or site_lng is None:
-        # reuse inference from prepare_simple by duplicating minimal logic
-        a = (req.address or "").lower()
-        cities = {
-            "pune": (18.5204, 73.8567),
-            "mumbai": (19.0760, 72.8777),
-            "bombay": (19.0760, 72.8777),
-            "delhi": (28.7041, 77.1025),
-            "new delhi": (28.6139, 77.2090),
-            "chennai": (13.0827, 80.2707),
-            "hyderabad": (17.3850, 78.4867),
-            "hyd": (17.3850, 78.4867),
-            "bengaluru": (12.9716, 77.5946),
-            "bangalore": (12.9716, 77.5946),
-            "ahmedabad": (23.0225, 72.5714),
-        }
-        for k, v in cities.items():
-            if k in a:
-                site_lat, site_lng = v
-                break
-        if site_lat is None or site_lng is None:
-            site_lat, site_lng = (18.5204, 73.8567)
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-    brief = (
-        f"Project type: {req.project_type}. Quantity: {req.quantity or 'N/A'}. "
-        f"Materials: {', '.join(req.materials)}."
-    )
-    project = Project(
-        brief=brief,
-        site_name=req.address,
-        site_lat=site_lat,
-        site_lng=site_lng,
-        delivery_window_days=14,
-    )
+@router.post("/v1/smart-quote/prepare/stream")
+async def prepare_stream(req: PrepareRequest, res: Resources = Depends(get_resources)):
+    _check_weights(req.weights)
+    return StreamingResponse(_stream_prepare(req, res.settings), media_type="text/event-stream", headers=_SSE_HEADERS)
 
-    # minimal items list (weights are not critical for AI-only summary)
-    items = [Item(sku=m.lower().replace(" ", "_"), desc=m, qty=1) for m in req.materials]
-    prep = PrepareRequest(project=project, items=items)
+@router.post("/v1/smart-quote/prepare-simple/stream")
+async def prepare_simple_stream(req: SimplePrepareRequest, res: Resources = Depends(get_resources)):
+    return StreamingResponse(_stream_prepare(_simple_to_prepare(req)[0], res.settings),
+                             media_type="text/event-stream", headers=_SSE_HEADERS)
 
-    top, candidates_json = compute_candidates(prep)
-    summary = summarize_with_llm(project.brief, project.site_name, candidates_json)
-    if (not summary) or summary.startswith("SmartQuotation (fallback)") or ("API call failed" in summary):
+@router.post("/v1/smart-quote/prepare-ai")
+async def prepare_ai(req: SimplePrepareRequest, res: Resources = Depends(get_resources)):
+    prep, _ = _simple_to_prepare(req)
+
+    async def run():
+        _, candidates_json, _ = await compute_candidates_async(prep, res.settings)
+        if not candidates_json["candidates"]:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No vendors to quote for this site")
+        return await summarize_with_llm_async(prep.project.brief, prep.project.site_name, candidates_json, req.llm_budget_s)
+
+    try:
+        summary = await res.quote_flights.do(_flight_key("ai", prep), run)
+    except Overloaded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="AI summaries are over capacity",
+                            headers={"Retry-After": str(int(math.ceil(e.retry_after_s)))})
+    if is_fallback_summary(summary):
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="AI response unavailable")
     # Console log for verification of AI summary
     try:
@@ -267,8 +515,8 @@ def prepare_ai(req: SimplePrepareRequest):
     return {"summary": summary}
 
 @router.post("/v1/smart-quote/invoice", response_model=InvoiceOut)
-def invoice(req: InvoiceRequest):
-    settings = get_settings()
+def invoice(req: InvoiceRequest, request: Request, res: Resources = Depends(get_resources)):
+    settings = res.settings
     chosen = req.chosen_candidate
 
     lines = []
@@ -302,6 +550,49 @@ def invoice(req: InvoiceRequest):
     file_stem = inv["invoice_no"].replace("/", "-")
     out_pdf = f"{settings.invoice_dir}/{file_stem}.pdf"
     out_html = f"{settings.invoice_dir}/{file_stem}.html"
-    file_path = render_invoice(inv, out_pdf_path=out_pdf, out_html_path=out_html)
-    inv["file_path"] = file_path
-    return inv
+    # The HTML is cheap and written inline; the PDF is rendered by the
+    # invoice process pool and fetched later via the job endpoints.
+    with stage("invoice_html"):
+        html = build_invoice_html(inv)
+        Path(out_html).write_text(html, encoding="utf-8")
+    try:
+        job_id = res.invoice_queue.submit(html, out_pdf_path=out_pdf, out_html_path=out_html)
+    except QueueFull:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Invoice render queue is full", headers={"Retry-After": "5"})
+    inv["file_path"] = out_html
+    inv["html_path"] = out_html
+    inv["job_id"] = job_id
+    return render(request, inv, InvoiceOut)
+
+@router.get("/v1/smart-quote/invoice/jobs/{job_id}")
+def invoice_job(job_id: str, res: Resources = Depends(get_resources)):
+    job = res.invoice_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown invoice job")
+    return job
+
+@router.get("/v1/smart-quote/invoice/jobs/{job_id}/pdf")
+def invoice_job_pdf(job_id: str, res: Resources = Depends(get_resources)):
+    job = res.invoice_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown invoice job")
+    if job["status"] == "queued":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Invoice PDF not ready",
+                            headers={"Retry-After": "1"})
+    if not job["pdf_path"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PDF rendering failed; HTML invoice only")
+    return FileResponse(job["pdf_path"], media_type="application/pdf",
+                        filename=Path(job["pdf_path"]).name)
+
+@router.get("/health/invoice-queue")
+def health_invoice_queue(res: Resources = Depends(get_resources)):
+    return res.invoice_queue.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/health/startup")
+def health_startup(res: Resources = Depends(get_resources)):
+    return res.startup_ms
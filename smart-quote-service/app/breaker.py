@@ -0,0 +1,50 @@
+import time
+from typing import Optional
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown_s` one trial is let through.
+
+    While the trial is out (half-open) every other caller is refused; its
+    record() closes or re-opens the breaker. A trial that never reports
+    back is given up after another cooldown_s.
+    """
+
+    def __init__(self, threshold: int=3, cooldown_s: float=60.0):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown_s:
+            return False
+        if self.probe_at is not None and now - self.probe_at < self.cooldown_s:
+            return False
+        self.probe_at = now
+        return True
+
+    def release(self) -> None:
+        # The trial was abandoned (e.g. cancelled) without a verdict
+        self.probe_at = None
+
+    def record(self, ok: bool) -> None:
+        self.probe_at = None
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probe_at is not None or time.monotonic() - self.opened_at >= self.cooldown_s:
+            return "half-open"
+        return "open"
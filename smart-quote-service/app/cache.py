@@ -0,0 +1,349 @@
+import os, sqlite3, threading, time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, List, Optional
+import orjson
+from .config import get_settings
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int=10000, ttl_s: float=3600.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class DiskCache:
+    """Directory-backed string cache with a TTL and a total size cap.
+
+    One file per key (written via temp file + os.replace); the oldest files
+    are evicted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int=64*1024*1024, ttl_s: float=86400.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(e.stat().st_size for e in os.scandir(directory) if e.is_file())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_s:
+                self._remove(path)
+                self.misses += 1
+                return None
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(value)
+            size = os.path.getsize(tmp)
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._bytes += size - old
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._bytes -= size
+
+    def _evict(self) -> None:
+        # Oldest first, down to 90% of the cap so we don't rescan on every set
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path)
+                         for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp"))
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if self._bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+_SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL,
+    PRIMARY KEY (ns, key)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    ns TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0);
+"""
+
+def _ratio(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+def _rollback(db: Optional[sqlite3.Connection]) -> None:
+    try:
+        if db is not None and db.in_transaction:
+            db.execute("ROLLBACK")
+    except sqlite3.Error:
+        pass
+
+class SharedCache:
+    """Namespaced JSON cache in one SQLite WAL file, shared by every worker on the host.
+
+    Each entry carries its own expiry; once the stored values pass
+    max_bytes, the entries closest to expiry go first. Hit/miss counters are
+    kept per namespace in-process and flushed to the file every FLUSH_S, so
+    stats() reports both this worker and all workers. SQLite errors (e.g. a
+    lock held past the timeout) degrade to misses and dropped writes, and an
+    undecodable value to a miss.
+    """
+
+    FLUSH_S = 5.0
+    # Bytes written by this process between size checks, as a share of max_bytes
+    CHECK_SHARE = 0.05
+
+    def __init__(self, path: str, max_bytes: int=256*1024*1024, busy_timeout_s: float=0.05):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Kept short: callers run on the event loop, and a miss beats a stall
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        self._pending: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._last_flush = time.monotonic()
+        self._written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(_SHARED_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get_many(self, ns: str, keys: List[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        bad: List[str] = []
+        now = time.time()
+        try:
+            db = self._conn()
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                rows = db.execute(
+                    f"SELECT key, value FROM entries WHERE ns = ? AND key IN ({','.join('?'*len(part))})"
+                    " AND expires_at > ?", (ns, *part, now)).fetchall()
+                for k, v in rows:
+                    try:
+                        found[k] = orjson.loads(v)
+                    except orjson.JSONDecodeError:
+                        bad.append(k)
+        except sqlite3.Error:
+            found = {}
+        if bad:
+            # A torn or corrupt row is a miss, and is dropped so it is rewritten
+            self._delete(ns, bad)
+        self._count(ns, len(found), len(keys) - len(found))
+        return found
+
+    def _delete(self, ns: str, keys: List[str]) -> None:
+        try:
+            self._conn().executemany("DELETE FROM entries WHERE ns = ? AND key = ?", [(ns, k) for k in keys])
+        except sqlite3.Error:
+            pass
+
+    def get(self, ns: str, key: str) -> Optional[Any]:
+        return self.get_many(ns, [key]).get(key)
+
+    def set_many(self, ns: str, items: Dict[str, Any], ttl_s: float) -> None:
+        if not items:
+            return
+        expires_at = time.time() + ttl_s
+        rows = [(ns, k, orjson.dumps(v, option=orjson.OPT_SERIALIZE_NUMPY), expires_at) for k, v in items.items()]
+        db = None
+        try:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+            db.execute("COMMIT")
+        except sqlite3.Error:
+            _rollback(db)
+            return
+        with self._lock:
+            self._written += sum(len(r[2]) for r in rows)
+            due = self._written >= self.max_bytes * self.CHECK_SHARE
+            if due:
+                self._written = 0
+        if due:
+            # A full scan of the file: off the request path
+            threading.Thread(target=self._evict, daemon=True).start()
+
+    def set(self, ns: str, key: str, value: Any, ttl_s: float) -> None:
+        self.set_many(ns, {key: value}, ttl_s)
+
+    def _evict(self) -> None:
+        db = None
+        try:
+            db = self._conn()
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            total = db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Closest to expiry first, down to 90% of the cap
+            victims, target = [], int(self.max_bytes * 0.9)
+            for ns, key, size in db.execute("SELECT ns, key, LENGTH(value) FROM entries ORDER BY expires_at"):
+                if total <= target:
+                    break
+                victims.append((ns, key))
+                total -= size
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("DELETE FROM entries WHERE ns = ? AND key = ?", victims)
+            db.execute("COMMIT")
+        except sqlite3.Error:
+            _rollback(db)
+            return
+        with self._lock:
+            self.evictions += len(victims)
+
+    def _count(self, ns: str, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits[ns] += hits
+            self.misses[ns] += misses
+            p = self._pending[ns]
+            p[0] += hits
+            p[1] += misses
+        if time.monotonic() - self._last_flush >= self.FLUSH_S:
+            self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+            self._last_flush = time.monotonic()
+        try:
+            self._conn().executemany(
+                "INSERT INTO counters (ns, hits, misses) VALUES (?, ?, ?) ON CONFLICT (ns) DO UPDATE"
+                " SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                [(ns, h, m) for ns, (h, m) in pending.items()])
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        self._flush()
+        error = None
+        try:
+            db = self._conn()
+            sizes = {ns: (n, b) for ns, n, b in db.execute(
+                "SELECT ns, COUNT(*), SUM(LENGTH(value)) FROM entries GROUP BY ns")}
+            totals = {ns: (h, m) for ns, h, m in db.execute("SELECT ns, hits, misses FROM counters")}
+        except sqlite3.Error as e:
+            # This worker's counters still hold; the file-wide figures read as zero
+            sizes, totals, error = {}, {}, str(e)
+        namespaces = {}
+        for ns in sorted(set(sizes) | set(totals) | set(self.hits)):
+            h, m = self.hits.get(ns, 0), self.misses.get(ns, 0)
+            th, tm = totals.get(ns, (0, 0))
+            namespaces[ns] = {
+                "entries": sizes.get(ns, (0, 0))[0], "bytes": sizes.get(ns, (0, 0))[1],
+                "hits": h, "misses": m, "hit_ratio": _ratio(h, m),
+                "all_workers": {"hits": th, "misses": tm, "hit_ratio": _ratio(th, tm)},
+            }
+        return {"path": self.path, "max_bytes": self.max_bytes, "evictions": self.evictions,
+                "namespaces": namespaces, "error": error}
+
+_shared_cache: Optional[SharedCache] = None
+
+def get_shared_cache() -> Optional[SharedCache]:
+    # None unless SHARED_CACHE_PATH is set; every tier works without it
+    global _shared_cache
+    s = get_settings()
+    if not s.shared_cache_path:
+        return None
+    if _shared_cache is None:
+        _shared_cache = SharedCache(s.shared_cache_path, s.shared_cache_max_bytes, s.shared_cache_busy_timeout_ms / 1000)
+    return _shared_cache
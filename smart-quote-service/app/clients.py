@@ -0,0 +1,48 @@
+import httpx
+from typing import Optional
+from .config import get_settings
+
+# Shared keep-alive pools, opened in the FastAPI lifespan (main.py). OSRM is
+# local and latency-sensitive, LLM providers are remote and slow, so each gets
+# its own pool and timeouts.
+_osrm_client: Optional[httpx.AsyncClient] = None
+_llm_client: Optional[httpx.AsyncClient] = None
+
+def _new_osrm_client() -> httpx.AsyncClient:
+    s = get_settings()
+    limits = httpx.Limits(max_connections=s.osrm_max_connections,
+                          max_keepalive_connections=s.osrm_max_connections)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(s.osrm_timeout_s))
+
+def _new_llm_client() -> httpx.AsyncClient:
+    s = get_settings()
+    limits = httpx.Limits(max_connections=s.llm_max_connections,
+                          max_keepalive_connections=s.llm_max_connections)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(25.0, connect=5.0))
+
+async def open_clients() -> None:
+    global _osrm_client, _llm_client
+    if _osrm_client is None:
+        _osrm_client = _new_osrm_client()
+    if _llm_client is None:
+        _llm_client = _new_llm_client()
+
+async def close_clients() -> None:
+    global _osrm_client, _llm_client
+    for c in (_osrm_client, _llm_client):
+        if c is not None:
+            await c.aclose()
+    _osrm_client = _llm_client = None
+
+def get_osrm_client() -> httpx.AsyncClient:
+    # Lazily created if used outside the app lifespan (scripts, REPL).
+    global _osrm_client
+    if _osrm_client is None:
+        _osrm_client = _new_osrm_client()
+    return _osrm_client
+
+def get_llm_client() -> httpx.AsyncClient:
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = _new_llm_client()
+    return _llm_client
@@ -1,18 +1,87 @@
 import os
+from functools import lru_cache
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class Settings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     app_name: str = "Smart Quote Service"
     version: str = "1.0.0"
     gemini_api_key: Optional[str] = None
     groq_api_key: Optional[str] = None
     osrm_url: str = os.environ.get("OSRM_URL", "http://localhost:5000")
+    osrm_table_chunk: int = int(os.environ.get("OSRM_TABLE_CHUNK", "100"))
+    osrm_max_connections: int = int(os.environ.get("OSRM_MAX_CONNECTIONS", "64"))
+    llm_max_connections: int = int(os.environ.get("LLM_MAX_CONNECTIONS", "200"))
+    osrm_timeout_s: float = float(os.environ.get("OSRM_TIMEOUT_S", "4"))
+    # Fast-fail: after this many consecutive OSRM errors, skip the network for the cooldown
+    osrm_breaker_threshold: int = int(os.environ.get("OSRM_BREAKER_THRESHOLD", "2"))
+    osrm_breaker_cooldown_s: float = float(os.environ.get("OSRM_BREAKER_COOLDOWN_S", "15"))
+    route_tiles_path: Optional[str] = os.environ.get("ROUTE_TILES_PATH")
+    route_tiles_check_s: float = float(os.environ.get("ROUTE_TILES_CHECK_S", "60"))
+    # GeoNames postal-code dump (IN.txt) loaded into the geocoder on top of the builtin cities
+    gazetteer_path: Optional[str] = os.environ.get("GAZETTEER_PATH")
+    geocode_cache_size: int = int(os.environ.get("GEOCODE_CACHE_SIZE", "10000"))
+    # SQLite WAL file shared by all workers on the host (routes, summaries, routed shortlists, quote sessions)
+    shared_cache_path: Optional[str] = os.environ.get("SHARED_CACHE_PATH")
+    shared_cache_max_bytes: int = int(os.environ.get("SHARED_CACHE_MAX_BYTES", str(256*1024*1024)))
+    shared_cache_shortlist_ttl_s: float = float(os.environ.get("SHARED_CACHE_SHORTLIST_TTL_S", "600"))
+    # How long a shared-cache call waits on another worker's write lock before giving up (miss / dropped write)
+    shared_cache_busy_timeout_ms: float = float(os.environ.get("SHARED_CACHE_BUSY_TIMEOUT_MS", "50"))
+    route_cache_size: int = int(os.environ.get("ROUTE_CACHE_SIZE", "50000"))
+    route_cache_ttl_s: float = float(os.environ.get("ROUTE_CACHE_TTL_S", "86400"))
+    route_cache_cell_deg: float = float(os.environ.get("ROUTE_CACHE_CELL_DEG", "0.001"))
+    # Provider endpoint overrides (proxies, local stubs for benchmarks)
+    groq_url: Optional[str] = os.environ.get("GROQ_URL")
+    gemini_base_url: Optional[str] = os.environ.get("GEMINI_BASE_URL")
+    llm_budget_s: float = float(os.environ.get("LLM_BUDGET_S", "20"))
+    llm_hedge_delay_s: Optional[float] = float(os.environ["LLM_HEDGE_DELAY_S"]) if os.environ.get("LLM_HEDGE_DELAY_S") else None
+    # Admission: concurrent LLM calls per worker, and how many may queue (and for how long) behind them
+    llm_max_inflight: int = int(os.environ.get("LLM_MAX_INFLIGHT", "32"))
+    llm_queue_max: int = int(os.environ.get("LLM_QUEUE_MAX", "64"))
+    llm_queue_wait_s: float = float(os.environ.get("LLM_QUEUE_WAIT_S", "2"))
+    llm_retry_after_s: float = float(os.environ.get("LLM_RETRY_AFTER_S", "5"))
+    llm_breaker_threshold: int = int(os.environ.get("LLM_BREAKER_THRESHOLD", "3"))
+    llm_breaker_cooldown_s: float = float(os.environ.get("LLM_BREAKER_COOLDOWN_S", "60"))
+    llm_cache_enabled: bool = os.environ.get("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    llm_cache_mem_size: int = int(os.environ.get("LLM_CACHE_MEM_SIZE", "1024"))
+    llm_cache_ttl_s: float = float(os.environ.get("LLM_CACHE_TTL_S", "86400"))
+    llm_cache_dir: str = os.environ.get("LLM_CACHE_DIR", "./.cache/llm")
+    llm_cache_max_bytes: int = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64*1024*1024)))
+    vendor_registry_path: Optional[str] = os.environ.get("VENDOR_REGISTRY_PATH")
+    vendor_reload_check_s: float = float(os.environ.get("VENDOR_RELOAD_CHECK_S", "5"))
+    vendor_prefilter_k: int = int(os.environ.get("VENDOR_PREFILTER_K", "50"))
+    price_catalog_path: Optional[str] = os.environ.get("PRICE_CATALOG_PATH")
+    price_reload_check_s: float = float(os.environ.get("PRICE_RELOAD_CHECK_S", "5"))
+    split_max_vendors: int = int(os.environ.get("SPLIT_MAX_VENDORS", "3"))
+    split_per_item: int = int(os.environ.get("SPLIT_PER_ITEM", "3"))
+    # JSON hour-of-week congestion factors (168, Monday 00:00 first); unset: the traffic_factor rules
+    dispatch_profile_path: Optional[str] = os.environ.get("DISPATCH_PROFILE_PATH")
+    dispatch_utc_offset_min: int = int(os.environ.get("DISPATCH_UTC_OFFSET_MIN", "330"))
+    # Longest project.delivery_window_days accepted; dispatch planning is linear in it
+    dispatch_max_window_days: int = int(os.environ.get("DISPATCH_MAX_WINDOW_DAYS", "90"))
+    # Monte Carlo risk mode: scenarios per candidate, capped so vendors x scenarios <= RISK_MAX_CELLS
+    risk_scenarios: int = int(os.environ.get("RISK_SCENARIOS", "2000"))
+    risk_max_cells: int = int(os.environ.get("RISK_MAX_CELLS", "200000"))
+    risk_seed: int = int(os.environ.get("RISK_SEED", "0"))
+    # Quote sessions (for /rerank) are per worker unless SHARED_CACHE_PATH is set; without it, run
+    # one worker or route each quote_id back to the worker that created it
+    quote_session_max: int = int(os.environ.get("QUOTE_SESSION_MAX", "10000"))
+    quote_session_ttl_s: float = float(os.environ.get("QUOTE_SESSION_TTL_S", "1800"))
+    # Check every quote response against its response_model (off in production: the payloads are built typed)
+    validate_responses: bool = os.environ.get("VALIDATE_RESPONSES", "0") in ("1", "true", "True")
+    batch_max_entries: int = int(os.environ.get("BATCH_MAX_ENTRIES", "200"))
     currency: str = "INR"
     gst_pct: float = 18.0
     invoice_dir: str = os.environ.get("INVOICE_DIR", "./invoices")
+    invoice_workers: int = int(os.environ.get("INVOICE_WORKERS", "2"))
+    invoice_queue_max: int = int(os.environ.get("INVOICE_QUEUE_MAX", "64"))
+    invoice_job_ttl_s: float = float(os.environ.get("INVOICE_JOB_TTL_S", "3600"))
 
+@lru_cache(maxsize=None)
 def get_settings() -> Settings:
+    # Built once per process; call get_settings.cache_clear() to re-read env
     gem_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
     groq_key = os.environ.get("GROQ_API_KEY")
     s = Settings(gemini_api_key=gem_key, groq_api_key=groq_key)
@@ -1,4 +1,6 @@
-from typing import List, Dict, Callable
+import numpy as np
+from typing import List, Dict, Callable, Optional, Tuple
+from .pricing import get_price_catalog
 
 def freight_cost(distance_km: float, weight_tons: float, base_rate_per_tkm: float=3.5,
                  fuel_surcharge_pct: float=0.08, tolls: float=0.0) -> float:
@@ -8,7 +10,15 @@ def freight_cost(distance_km: float, weight_tons: float, base_rate_per_tkm: floa
 def tax_gst(amount: float, gst_pct: float) -> float:
     return amount * (gst_pct/100.0)
 
-def material_cost(items: List[Dict], price_lookup: Callable[[str], float]) -> float:
+def material_cost(items: List[Dict], price_lookup: Optional[Callable[[str], float]]=None,
+                  vendor_ids=None, site: Optional[Tuple[float, float]]=None):
+    """Material cost of the item list; one value per vendor when vendor_ids is given.
+
+    Without a price_lookup, prices come from the live price catalog, with
+    per-vendor prices, quantity tiers and the site's regional overrides.
+    """
+    if price_lookup is None:
+        return get_price_catalog().snapshot().material_costs(items, vendor_ids, site)
     total = 0.0
     for it in items:
         unit_price = it.get("unit_price")
@@ -17,14 +27,7 @@ def material_cost(items: List[Dict], price_lookup: Callable[[str], float]) -> fl
         total += it["qty"] * float(unit_price)
     return total
 
-def demo_price_lookup(sku: str) -> float:
-    price_map = {
-        "cement_bag_50kg": 360.0,
-        "rebar_tmt_10mm_ton": 51500.0,
-        "sand_mt": 1200.0,
-        # aliases
-        "cement": 360.0,
-        "tmt": 52000.0,
-        "sand": 1100.0,
-    }
-    return price_map.get(sku, 1000.0)
+def material_lines(items: List[Dict], vendor_ids, site: Optional[Tuple[float, float]]=None) -> np.ndarray:
+    """Material cost per vendor and item line (vendors x lines) from the live price catalog."""
+    qty = np.array([it["qty"] for it in items], dtype=np.float64)
+    return get_price_catalog().snapshot().line_prices(items, vendor_ids, site) * qty
@@ -0,0 +1,107 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+import numpy as np
+from .config import get_settings
+from .routing import traffic_factor
+
+# Time-dependent ETA: free-flow minutes (OSRM, tiles or haversine) are
+# stretched by an hour-of-week congestion factor, hour by hour along the
+# trip, so a drive that starts before the evening peak slows down when it
+# reaches it. Every hourly dispatch slot in the delivery window is
+# evaluated for every vendor at once; the best one is the shortest trip
+# that still arrives inside the window, the earliest on ties.
+
+HOURS_PER_WEEK = 168
+RAIN_MM = 5.0
+RAIN_FACTOR = 0.10
+# slots x vendors evaluated exactly; above it, slots are chosen on a grid of
+# free-flow durations and only the chosen slots are evaluated per vendor
+DIRECT_BUDGET = 50_000
+GRID_POINTS = 128
+
+def default_profile() -> np.ndarray:
+    """Hour-of-week factors (Monday 00:00 first) from routing.traffic_factor's rules."""
+    return np.array([traffic_factor(d, h) for d in range(7) for h in range(24)])
+
+def load_profile(path: str) -> np.ndarray:
+    """A JSON list of 168 factors, or 7 lists of 24 (Monday first); each at least 1."""
+    with open(path) as f:
+        profile = np.asarray(json.load(f), dtype=float).reshape(-1)
+    if profile.shape != (HOURS_PER_WEEK,) or not (profile >= 1.0).all():
+        raise ValueError(f"{path}: expected {HOURS_PER_WEEK} congestion factors >= 1")
+    return profile
+
+@dataclass
+class DispatchPlan:
+    start: datetime         # slot 0
+    slot: np.ndarray        # per vendor, hours after start
+    eta_minutes: np.ndarray # per vendor, trip time when dispatched at slot
+
+    def dispatch_at(self, i: int) -> datetime:
+        return self.start + timedelta(hours=int(self.slot[i]))
+
+class CongestionModel:
+    """Trip times over an hourly horizon starting at `start`."""
+
+    def __init__(self, profile: np.ndarray, start: datetime, hours: int, rain_mm: float=0.0):
+        week_hour = start.weekday()*24 + start.hour
+        factor = profile[(week_hour + np.arange(hours)) % HOURS_PER_WEEK]
+        if rain_mm > RAIN_MM:
+            factor = factor + RAIN_FACTOR
+        # Free-flow minutes covered by each hour boundary; trips invert it
+        self.hours = np.arange(hours + 1, dtype=float)
+        self.covered = np.concatenate(([0.0], np.cumsum(60.0 / factor)))
+
+    def minutes(self, slots: np.ndarray, free_flow: np.ndarray) -> np.ndarray:
+        """Trip minutes departing at slots (hours) for free-flow minutes (broadcast)."""
+        arrive = np.interp(self.covered[slots] + free_flow, self.covered, self.hours)
+        return (arrive - slots) * 60.0
+
+def _best(minutes: np.ndarray, slots: np.ndarray, window_h: int) -> np.ndarray:
+    # argmin over slots (axis 0) of trips arriving in the window; all late -> the first
+    # (rounded, so equal trips tie exactly and the earliest slot wins)
+    late = slots[:, None] * 60.0 + minutes > window_h * 60.0
+    return np.where(late, np.inf, minutes.round(6)).argmin(axis=0)
+
+def plan_dispatch(free_flow_minutes: Sequence[float], window_days: int, start: datetime,
+                  rain_mm: float=0.0, profile: Optional[np.ndarray]=None) -> DispatchPlan:
+    m = np.asarray(free_flow_minutes, dtype=float)
+    profile = get_congestion_profile() if profile is None else profile
+    window_h = min(max(1, int(window_days)), get_settings().dispatch_max_window_days) * 24
+    slots = np.arange(window_h)
+    # Long enough for the longest trip from the last slot at the worst factor
+    slowest = profile.max() + RAIN_FACTOR
+    model = CongestionModel(profile, start, window_h + int(np.ceil(m.max(initial=0.0) * slowest / 60.0)) + 1, rain_mm)
+    if len(m) * window_h <= DIRECT_BUDGET:
+        trips = model.minutes(slots[:, None], m[None, :])
+        best = _best(trips, slots, window_h)
+        return DispatchPlan(start, best, trips[best, np.arange(len(m))])
+    # Trip time is piecewise linear in free-flow minutes, so the best slot of
+    # the grid points either side of a vendor is (nearly) its own best slot
+    grid = np.linspace(m.min(), m.max(), GRID_POINTS)
+    grid_best = _best(model.minutes(slots[:, None], grid[None, :]), slots, window_h)
+    hi = np.clip(np.searchsorted(grid, m), 0, GRID_POINTS - 1)
+    lo = np.maximum(hi - 1, 0)
+    pair = np.stack((grid_best[lo], grid_best[hi]))
+    trips = model.minutes(pair, m[None, :])
+    late = pair * 60.0 + trips > window_h * 60.0
+    pick = np.where(late, np.inf, trips.round(6)).argmin(axis=0)
+    cols = np.arange(len(m))
+    return DispatchPlan(start, pair[pick, cols], trips[pick, cols])
+
+def next_slot(now: Optional[datetime]=None) -> datetime:
+    """The next whole hour in the dispatch timezone."""
+    tz = timezone(timedelta(minutes=get_settings().dispatch_utc_offset_min))
+    now = (now or datetime.now(timezone.utc)).astimezone(tz)
+    return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+_profile: Optional[np.ndarray] = None
+
+def get_congestion_profile() -> np.ndarray:
+    global _profile
+    if _profile is None:
+        path = get_settings().dispatch_profile_path
+        _profile = load_profile(path) if path else default_profile()
+    return _profile
@@ -0,0 +1,240 @@
+import csv, re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from .cache import TTLCache
+from .config import get_settings
+
+# Offline address -> coordinate resolution against a gazetteer of Indian
+# places. Names are indexed in a word-level trie, so matching an address is
+# one walk per token position (addresses are ~10 tokens, names <= ~5), i.e.
+# microseconds regardless of how many names the gazetteer holds.
+#
+# GAZETTEER_PATH takes the GeoNames postal-code dump for India (IN.txt,
+# tab-separated, ~155k rows): every row yields a PIN code and a locality,
+# and districts/states are added at the centroid of their rows. The builtin
+# major-city list below is always loaded on top.
+
+PIN, LOCALITY, CITY, DISTRICT, STATE = range(5)
+KIND_NAMES = ("pin", "locality", "city", "district", "state")
+# Confidence of a lone, unambiguous match of each kind
+BASE_CONFIDENCE = (0.9, 0.7, 0.8, 0.6, 0.3)
+# Added when another matched place agrees on district or state; enough to
+# cap any corroborated match, so the most precise of those wins
+CORROBORATION_BONUS = 0.3
+MAX_CONFIDENCE = 0.99
+DEFAULT_SITE = (18.5204, 73.8567)  # Pune, when nothing matches
+
+# name, state, lat, lng, aliases
+MAJOR_CITIES = [
+    ("mumbai", "maharashtra", 19.0760, 72.8777, ("bombay",)),
+    ("navi mumbai", "maharashtra", 19.0330, 73.0297, ()),
+    ("thane", "maharashtra", 19.2183, 72.9781, ()),
+    ("pune", "maharashtra", 18.5204, 73.8567, ("poona",)),
+    ("nagpur", "maharashtra", 21.1458, 79.0882, ()),
+    ("nashik", "maharashtra", 19.9975, 73.7898, ("nasik",)),
+    ("aurangabad", "maharashtra", 19.8762, 75.3433, ()),
+    ("delhi", "delhi", 28.7041, 77.1025, ()),
+    ("new delhi", "delhi", 28.6139, 77.2090, ()),
+    ("gurugram", "haryana", 28.4595, 77.0266, ("gurgaon",)),
+    ("faridabad", "haryana", 28.4089, 77.3178, ()),
+    ("noida", "uttar pradesh", 28.5355, 77.3910, ()),
+    ("ghaziabad", "uttar pradesh", 28.6692, 77.4538, ()),
+    ("lucknow", "uttar pradesh", 26.8467, 80.9462, ()),
+    ("kanpur", "uttar pradesh", 26.4499, 80.3319, ()),
+    ("agra", "uttar pradesh", 27.1767, 78.0081, ()),
+    ("meerut", "uttar pradesh", 28.9845, 77.7064, ()),
+    ("varanasi", "uttar pradesh", 25.3176, 82.9739, ("benares", "banaras")),
+    ("bengaluru", "karnataka", 12.9716, 77.5946, ("bangalore", "blr")),
+    ("mysuru", "karnataka", 12.2958, 76.6394, ("mysore",)),
+    ("hyderabad", "telangana", 17.3850, 78.4867, ("hyd",)),
+    ("chennai", "tamil nadu", 13.0827, 80.2707, ("madras",)),
+    ("coimbatore", "tamil nadu", 11.0168, 76.9558, ()),
+    ("madurai", "tamil nadu", 9.9252, 78.1198, ()),
+    ("kolkata", "west bengal", 22.5726, 88.3639, ("calcutta",)),
+    ("ahmedabad", "gujarat", 23.0225, 72.5714, ("amdavad",)),
+    ("surat", "gujarat", 21.1702, 72.8311, ()),
+    ("vadodara", "gujarat", 22.3072, 73.1812, ("baroda",)),
+    ("rajkot", "gujarat", 22.3039, 70.8022, ()),
+    ("jaipur", "rajasthan", 26.9124, 75.7873, ()),
+    ("indore", "madhya pradesh", 22.7196, 75.8577, ()),
+    ("bhopal", "madhya pradesh", 23.2599, 77.4126, ()),
+    ("patna", "bihar", 25.5941, 85.1376, ()),
+    ("ranchi", "jharkhand", 23.3441, 85.3096, ()),
+    ("raipur", "chhattisgarh", 21.2514, 81.6296, ()),
+    ("bhubaneswar", "odisha", 20.2961, 85.8245, ()),
+    ("visakhapatnam", "andhra pradesh", 17.6868, 83.2185, ("vizag",)),
+    ("vijayawada", "andhra pradesh", 16.5062, 80.6480, ()),
+    ("ludhiana", "punjab", 30.9010, 75.8573, ()),
+    ("amritsar", "punjab", 31.6340, 74.8723, ()),
+    ("chandigarh", "chandigarh", 30.7333, 76.7794, ()),
+    ("dehradun", "uttarakhand", 30.3165, 78.0322, ()),
+    ("srinagar", "jammu and kashmir", 34.0837, 74.7973, ()),
+    ("guwahati", "assam", 26.1445, 91.7362, ()),
+    ("kochi", "kerala", 9.9312, 76.2673, ("cochin",)),
+    ("thiruvananthapuram", "kerala", 8.5241, 76.9366, ("trivandrum",)),
+    ("panaji", "goa", 15.4909, 73.8278, ("panjim",)),
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN.findall(text.lower()))
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    kind: int
+    lat: float
+    lng: float
+    state: str = ""
+    district: str = ""
+
+@dataclass(frozen=True)
+class Geocode:
+    lat: float
+    lng: float
+    confidence: float
+    matched: Optional[str]
+    kind: Optional[str]
+    source: str  # request | gazetteer | default
+
+    def dict(self) -> dict:
+        return {"lat": self.lat, "lng": self.lng, "confidence": self.confidence,
+                "matched": self.matched, "kind": self.kind, "source": self.source}
+
+class Gazetteer:
+    """Word-level trie over place names with an LRU of resolved addresses."""
+
+    def __init__(self, places: List[Place], cache_size: int=10000):
+        self.places = places
+        # node: {token: child}; the None key holds the place ids ending here
+        self._root: Dict = {}
+        for pid, p in enumerate(places):
+            node = self._root
+            for tok in tokenize(p.name):
+                node = node.setdefault(tok, {})
+            node.setdefault(None, []).append(pid)
+        self._cache = TTLCache(maxsize=cache_size, ttl_s=86400.0)
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def matches(self, tokens: Tuple[str, ...]) -> List[Tuple[int, int, List[int]]]:
+        """(start, end, place ids) for every name found, minus those inside a longer one."""
+        found = []
+        for i in range(len(tokens)):
+            node = self._root
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if None in node:
+                    found.append((i, j + 1, node[None]))
+        return [m for m in found
+                if not any(o[0] <= m[0] and m[1] <= o[1] and o[1] - o[0] > m[1] - m[0] for o in found)]
+
+    def resolve(self, address: str) -> Optional[Geocode]:
+        tokens = tokenize(address or "")
+        if not tokens:
+            return None
+        hit = self._cache.get(tokens)
+        if hit is None:
+            hit = self._resolve(tokens) or False
+            self._cache.set(tokens, hit)
+        return hit or None
+
+    def _resolve(self, tokens: Tuple[str, ...]) -> Optional[Geocode]:
+        found = self.matches(tokens)
+        if not found:
+            return None
+        # Districts and states named anywhere in the address
+        districts, states = defaultdict(set), defaultdict(set)
+        for n, (_, _, ids) in enumerate(found):
+            for pid in ids:
+                p = self.places[pid]
+                states[p.state].add(n)
+                if p.district:
+                    districts[p.district].add(n)
+                if p.kind in (CITY, DISTRICT):
+                    districts[p.name].add(n)
+                if p.kind == STATE:
+                    states[p.name].add(n)
+
+        best = None
+        for n, (_, _, ids) in enumerate(found):
+            for pid in ids:
+                p = self.places[pid]
+                others = (districts.get(p.district, set()) | districts.get(p.name, set())
+                          | states.get(p.state, set())) - {n}
+                conf = BASE_CONFIDENCE[p.kind]
+                if others:
+                    conf += CORROBORATION_BONUS
+                else:
+                    # Same name, several places and nothing to choose between them
+                    conf /= len(ids) ** 0.5
+                key = (min(conf, MAX_CONFIDENCE), -p.kind)
+                if best is None or key > best[0]:
+                    best = (key, p)
+        (conf, _), p = best
+        return Geocode(p.lat, p.lng, round(conf, 3), p.name, KIND_NAMES[p.kind], "gazetteer")
+
+    def stats(self) -> dict:
+        return {"places": len(self.places), "cache": self._cache.stats()}
+
+def builtin_places() -> List[Place]:
+    out = []
+    for name, state, lat, lng, aliases in MAJOR_CITIES:
+        for n in (name, *aliases):
+            out.append(Place(n, CITY, lat, lng, state, name))
+    return out
+
+def load_geonames_postal(path: str) -> List[Place]:
+    """Places from a GeoNames postal-code dump (IN.txt)."""
+    pins: Dict[str, List[Tuple[float, float, str, str]]] = defaultdict(list)
+    localities: Dict[Tuple[str, str, str], List[Tuple[float, float]]] = defaultdict(list)
+    districts: Dict[Tuple[str, str], List[Tuple[float, float]]] = defaultdict(list)
+    states: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) < 11 or not row[9] or not row[10]:
+                continue
+            pin, place, state, district = row[1], row[2], row[3].lower(), row[5].lower()
+            lat, lng = float(row[9]), float(row[10])
+            pins[pin].append((lat, lng, state, district))
+            localities[(" ".join(tokenize(place)), state, district)].append((lat, lng))
+            districts[(district, state)].append((lat, lng))
+            states[state].append((lat, lng))
+
+    def centroid(pts):
+        return sum(p[0] for p in pts)/len(pts), sum(p[1] for p in pts)/len(pts)
+
+    out = []
+    for pin, rows in pins.items():
+        out.append(Place(pin, PIN, *centroid(rows), rows[0][2], rows[0][3]))
+    for (name, state, district), pts in localities.items():
+        out.append(Place(name, LOCALITY, *centroid(pts), state, district))
+    for (name, state), pts in districts.items():
+        if name:
+            out.append(Place(name, DISTRICT, *centroid(pts), state, name))
+    for name, pts in states.items():
+        if name:
+            out.append(Place(name, STATE, *centroid(pts), name))
+    return out
+
+_gazetteer: Optional[Gazetteer] = None
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        s = get_settings()
+        places = load_geonames_postal(s.gazetteer_path) if s.gazetteer_path else []
+        _gazetteer = Gazetteer(places + builtin_places(), s.geocode_cache_size)
+    return _gazetteer
+
+def resolve_site(address: str, lat: Optional[float]=None, lng: Optional[float]=None) -> Geocode:
+    """Explicit coordinates win; else the gazetteer; else DEFAULT_SITE at confidence 0."""
+    if lat is not None and lng is not None:
+        return Geocode(lat, lng, 1.0, None, None, "request")
+    hit = get_gazetteer().resolve(address)
+    return hit or Geocode(DEFAULT_SITE[0], DEFAULT_SITE[1], 0.0, None, None, "default")
@@ -1,7 +1,8 @@
 from pathlib import Path
+from .metrics import stage
 
-def render_invoice(invoice_json: dict, out_pdf_path: str, out_html_path: str) -> str:
-    html = f"""<!doctype html>
+def build_invoice_html(invoice_json: dict) -> str:
+    return f"""<!doctype html>
 <html><head><meta charset='utf-8'><title>Invoice</title>
 <style>
 body {{ font-family: Arial, sans-serif; margin: 24px; }}
@@ -28,10 +29,17 @@ h1 {{ margin: 0 0 8px 0; }}
 <p>Payment Terms: {invoice_json.get('payment_terms','')}</p>
 <p>Notes: {invoice_json.get('notes','')}</p>
 </body></html>"""
-    Path(out_html_path).write_text(html, encoding="utf-8")
+
+def write_invoice_pdf(html: str, out_pdf_path: str) -> bool:
     try:
         from weasyprint import HTML
         HTML(string=html).write_pdf(out_pdf_path)
-        return out_pdf_path
+        return True
     except Exception:
-        return out_html_path
+        return False
+
+def render_invoice(invoice_json: dict, out_pdf_path: str, out_html_path: str) -> str:
+    with stage("invoice_render"):
+        html = build_invoice_html(invoice_json)
+        Path(out_html_path).write_text(html, encoding="utf-8")
+        return out_pdf_path if write_invoice_pdf(html, out_pdf_path) else out_html_path
@@ -0,0 +1,161 @@
+import threading, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+from .config import get_settings
+from .invoice import write_invoice_pdf
+from .metrics import INVOICE_RENDER_SECONDS
+
+def _warm_worker():
+    # Pay WeasyPrint's import cost once per worker, not on the first job
+    try:
+        import weasyprint  # noqa: F401
+    except Exception:
+        pass
+
+def _render_job(html: str, out_pdf_path: str):
+    t0 = time.perf_counter()
+    ok = write_invoice_pdf(html, out_pdf_path)
+    return ok, time.perf_counter() - t0
+
+class QueueFull(Exception):
+    pass
+
+class InvoiceQueue:
+    """PDF rendering off the request path, on a pool of pre-warmed processes.
+
+    Jobs are tracked in memory by id; finished jobs are forgotten after
+    job_ttl_s. submit() raises QueueFull once max_pending jobs are waiting.
+    """
+
+    def __init__(self, workers: int=2, max_pending: int=64, job_ttl_s: float=3600.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl_s = job_ttl_s
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pool_lock = threading.Lock()
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+        self._render_s = []
+
+    def start(self, wait: bool=True) -> ProcessPoolExecutor:
+        """The live pool, created on first use; wait=True also blocks until its workers are warm."""
+        with self._pool_lock:
+            pool, new = self._pool, self._pool is None
+            if new:
+                pool = self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        if new:
+            # Spin the workers up now so the first invoice doesn't pay for it;
+            # outside the lock, so concurrent submitters never wait on a warm-up
+            warm = [pool.submit(_warm_worker) for _ in range(self.workers)]
+            if wait:
+                for f in warm:
+                    f.result()
+        return pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, html: str, out_pdf_path: str, out_html_path: str) -> str:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull()
+            self._pending += 1
+            self._prune()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id, "status": "queued", "submitted_at": time.time(),
+                "html_path": out_html_path, "pdf_path": None, "render_ms": None,
+            }
+        try:
+            fut = self._submit(html, out_pdf_path)
+        except Exception as e:
+            # No worker to take it: the job ends now with the HTML invoice only
+            print("[INVOICE] submit failed:", repr(e))
+            self._finish(job_id, out_pdf_path, None)
+            return job_id
+        fut.add_done_callback(lambda f: self._finish(job_id, out_pdf_path, f))
+        return job_id
+
+    def _submit(self, html: str, out_pdf_path: str):
+        pool = self.start(wait=False)
+        try:
+            return pool.submit(_render_job, html, out_pdf_path)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a native lib); the executor is
+            # unusable from then on, so replace it and try once more
+            self._restart(pool)
+            return self.start(wait=False).submit(_render_job, html, out_pdf_path)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._pool_lock:
+            if self._pool is not broken:
+                return  # another thread already replaced it
+            self._pool = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, job_id: str, out_pdf_path: str, fut) -> None:
+        ok, elapsed = False, None
+        if fut is not None:  # None: the job never reached a worker
+            try:
+                ok, elapsed = fut.result()
+            except Exception:
+                pass
+        with self._lock:
+            self._pending -= 1
+            job = self._jobs.get(job_id)
+            if elapsed is not None:
+                INVOICE_RENDER_SECONDS.observe(elapsed)
+                self._render_s.append(elapsed)
+                del self._render_s[:-1000]
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if job is not None:
+                # WeasyPrint failures still leave the HTML invoice behind
+                job.update(status="done" if ok else "html_only", finished_at=time.time(),
+                           pdf_path=out_pdf_path if ok else None,
+                           render_ms=round(elapsed*1000, 1) if elapsed is not None else None)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl_s
+        for jid in [j for j, v in self._jobs.items() if v.get("finished_at", time.time()) < cutoff]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            times = sorted(self._render_s)
+        pct = lambda q: round(times[min(len(times)-1, int(q*len(times)))]*1000, 1) if times else None
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pool_restarts": self.restarts,
+            "render_ms_p50": pct(0.5),
+            "render_ms_p95": pct(0.95),
+        }
+
+_queue: Optional[InvoiceQueue] = None
+
+def get_invoice_queue() -> InvoiceQueue:
+    global _queue
+    if _queue is None:
+        s = get_settings()
+        _queue = InvoiceQueue(s.invoice_workers, s.invoice_queue_max, s.invoice_job_ttl_s)
+    return _queue
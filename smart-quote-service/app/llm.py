@@ -1,5 +1,12 @@
-import os, json, requests
+import asyncio, os, json, hashlib, time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
 from .config import get_settings
+from .clients import get_llm_client
+from .admission import Overloaded, get_llm_gate
+from .breaker import CircuitBreaker
+from .cache import DiskCache, SharedCache, TTLCache, get_shared_cache
+from .metrics import stage, LLM_ATTEMPT_SECONDS, LLM_FALLBACK_TOTAL
 
 def _extract_text_from_resp(j):
     if not isinstance(j, dict):
@@ -26,82 +33,41 @@ def _extract_text_from_resp(j):
             return v
     return None
 
-def summarize_with_llm(project_brief: str, site_name: str, candidates_json: dict) -> str:
-    settings = get_settings()
+# Bump whenever the prompt template changes so cached summaries are not reused
+PROMPT_VERSION = "1"
 
-    # 1) Try Groq first if available
-    groq_key = getattr(settings, 'groq_api_key', None) or os.environ.get('GROQ_API_KEY')
-    if groq_key:
-        try:
-            system = "You are SmartQuotation, a B2B procurement assistant. NEVER invent prices/ETAs; use the provided JSON."
-            user_prompt = f"""{system}
+SYSTEM_PROMPT = "You are SmartQuotation, a B2B procurement assistant. NEVER invent prices/ETAs; use the provided JSON."
 
-Project brief:
-{project_brief}
-Site: {site_name}
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.3-70b-versatile"
 
-CANDIDATES JSON:
-{json.dumps(candidates_json, indent=2)}
+GEMINI_MODELS = [
+    'models/gemini-pro-latest',
+    'models/gemini-2.5-pro',
+    'models/gemini-2.5-flash',
+    'models/gemini-flash-latest'
+]
+GEMINI_BASE_URLS = [
+    'https://generativelanguage.googleapis.com/v1',
+    'https://generativelanguage.googleapis.com/v1beta2',
+    'https://generativelanguage.googleapis.com/v1beta3'
+]
 
-Tasks:
-1) Pick Best overall, Cheapest, Fastest (2–4 bullets WHY).
-2) Provide a concise table (vendor, landed_cost, ETA(min), on_time_rate, top risk).
-3) Draft RFQ text for the recommended vendor.
-4) Provide Invoice JSON fields based on chosen candidate's numeric values only.
-"""
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {groq_key}",
-                "Content-Type": "application/json",
-            }
-            body = {
-                "model": "llama-3.3-70b-versatile",
-                "messages": [
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "temperature": 0.7,
-            }
-            r = requests.post(url, headers=headers, json=body, timeout=25)
-            if r.status_code < 400:
-                j = r.json()
-                # OpenAI-style response shape
-                if 'choices' in j and j['choices']:
-                    msg = j['choices'][0].get('message', {})
-                    txt = msg.get('content')
-                    if txt:
-                        return txt
-        except Exception:
-            pass
-
-    # 2) Fallback to Gemini if Groq not available
-    api_key = settings.gemini_api_key
-    if not api_key:
-        best = min(candidates_json["candidates"], key=lambda c: c["landed_cost"]*0.6 + c["eta_minutes"]*0.4)
-        cheapest = min(candidates_json["candidates"], key=lambda c: c["landed_cost"])
-        fastest = min(candidates_json["candidates"], key=lambda c: c["eta_minutes"])
-        lines = [
-            f"SmartQuotation (fallback) for {site_name}:",
-            f"- Best overall: {best['vendor_name']} (₹{best['landed_cost']:.0f}, ETA {best['eta_minutes']} min)",
-            f"- Cheapest: {cheapest['vendor_name']} (₹{cheapest['landed_cost']:.0f})",
-            f"- Fastest: {fastest['vendor_name']} ({fastest['eta_minutes']} min)",
-            "Set GEMINI_API_KEY or GROQ_API_KEY to enable rich narrative and RFQ/Invoice JSON."
-        ]
-        return "\n".join(lines)
-
-    candidate_models = [
-        'models/gemini-pro-latest',
-        'models/gemini-2.5-pro',
-        'models/gemini-2.5-flash',
-        'models/gemini-flash-latest'
-    ]
-    base_urls = [
-        'https://generativelanguage.googleapis.com/v1',
-        'https://generativelanguage.googleapis.com/v1beta2',
-        'https://generativelanguage.googleapis.com/v1beta3'
-    ]
-    system = "You are SmartQuotation, a B2B procurement assistant. NEVER invent prices/ETAs; use the provided JSON."
-    prompt = f"""{system}
+# Absolute, clock-dependent fields: they change every hour for the same
+# quote, so they stay out of the prompt and the summary cache key (the
+# response carries them)
+_VOLATILE = ("dispatch_at",)
+
+def _stable_view(candidates_json: dict) -> dict:
+    strip = lambda d: {k: v for k, v in d.items() if k not in _VOLATILE}
+    out = {**candidates_json, "candidates": [strip(c) for c in candidates_json["candidates"]]}
+    if out.get("split_plan"):
+        out["split_plan"] = {**out["split_plan"], "allocations": [strip(a) for a in out["split_plan"]["allocations"]]}
+    return out
+
+def _build_prompt(project_brief: str, site_name: str, candidates_json: dict) -> str:
+    candidates_json = _stable_view(candidates_json)
+    return f"""{SYSTEM_PROMPT}
 
 Project brief:
 {project_brief}
@@ -117,8 +83,30 @@ Tasks:
 4) Provide Invoice JSON fields based on chosen candidate's numeric values only.
 """
 
-    headers = {"Content-Type": "application/json"}
-    for m in candidate_models:
+def _groq_request(groq_key: str, prompt: str, url: str=GROQ_URL):
+    headers = {
+        "Authorization": f"Bearer {groq_key}",
+        "Content-Type": "application/json",
+    }
+    body = {
+        "model": GROQ_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+    }
+    return url, headers, body
+
+def _groq_text(j):
+    # OpenAI-style response shape
+    if 'choices' in j and j['choices']:
+        msg = j['choices'][0].get('message', {})
+        return msg.get('content')
+    return None
+
+def _gemini_attempts(api_key: str, prompt: str, base_urls: List[str]=GEMINI_BASE_URLS):
+    for m in GEMINI_MODELS:
         model_id = m.split('/')[-1]
         for base in base_urls:
             url = f"{base}/models/{model_id}:generate?key={api_key}"
@@ -127,15 +115,340 @@ Tasks:
                 {"input": prompt},
                 {"instances": [{"content": prompt}]}
             ]
-            for body in bodies:
-                try:
-                    r = requests.post(url, json=body, headers=headers, timeout=20)
-                    if r.status_code >= 400:
-                        continue
-                    j = r.json()
-                    txt = _extract_text_from_resp(j)
-                    if txt:
-                        return txt
-                except Exception:
-                    continue
-    return "Gemini API call failed. Verify GEMINI_API_KEY or GROQ_API_KEY and model access. Returning without LLM."
+            for i, body in enumerate(bodies):
+                # The breaker key must not contain the API key from the URL
+                yield f"gemini:{model_id}@{base}#{i}", url, body
+
+def _fallback_summary(site_name: str, candidates_json: dict) -> str:
+    if not candidates_json["candidates"]:
+        return ""
+    best = min(candidates_json["candidates"], key=lambda c: c["landed_cost"]*0.6 + c["eta_minutes"]*0.4)
+    cheapest = min(candidates_json["candidates"], key=lambda c: c["landed_cost"])
+    fastest = min(candidates_json["candidates"], key=lambda c: c["eta_minutes"])
+    lines = [
+        f"SmartQuotation (fallback) for {site_name}:",
+        f"- Best overall: {best['vendor_name']} (₹{best['landed_cost']:.0f}, ETA {best['eta_minutes']} min)",
+        f"- Cheapest: {cheapest['vendor_name']} (₹{cheapest['landed_cost']:.0f})",
+        f"- Fastest: {fastest['vendor_name']} ({fastest['eta_minutes']} min)",
+        "Set GEMINI_API_KEY or GROQ_API_KEY to enable rich narrative and RFQ/Invoice JSON."
+    ]
+    return "\n".join(lines)
+
+GEMINI_FAILED = "Gemini API call failed. Verify GEMINI_API_KEY or GROQ_API_KEY and model access. Returning without LLM."
+
+def is_fallback_summary(summary: Optional[str]) -> bool:
+    return (not summary) or summary.startswith("SmartQuotation (fallback)") or ("API call failed" in summary)
+
+def summary_cache_key(project_brief: str, site_name: str, candidates_json: dict) -> str:
+    canonical = json.dumps({
+        "brief": project_brief,
+        "site_name": site_name,
+        "candidates": _stable_view(candidates_json),
+        "model": [GROQ_MODEL, *GEMINI_MODELS],
+        "prompt_version": PROMPT_VERSION,
+    }, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """Tiered cache of successful LLM summaries: memory LRU, then the shared cache, then disk."""
+
+    def __init__(self, mem_size: int, ttl_s: float, directory: Optional[str], max_bytes: int,
+                 shared: Optional[SharedCache]=None):
+        self.ttl_s = ttl_s
+        self.mem = TTLCache(maxsize=mem_size, ttl_s=ttl_s)
+        self.shared = shared
+        self.disk = DiskCache(directory, max_bytes=max_bytes, ttl_s=ttl_s) if directory else None
+
+    def get(self, key: str) -> Optional[str]:
+        txt = self.mem.get(key)
+        if txt is None and self.shared is not None:
+            txt = self.shared.get("summary", key)
+        if txt is None and self.disk is not None:
+            txt = self.disk.get(key)
+        if txt is not None:
+            self.mem.set(key, txt)
+        return txt
+
+    def set(self, key: str, summary: str) -> None:
+        # Fallback and failure strings must never be served from cache
+        if is_fallback_summary(summary):
+            return
+        self.mem.set(key, summary)
+        if self.shared is not None:
+            self.shared.set("summary", key, summary, self.ttl_s)
+        if self.disk is not None:
+            self.disk.set(key, summary)
+
+    def stats(self) -> dict:
+        return {"memory": self.mem.stats(), "shared": self.shared is not None,
+                "disk": self.disk.stats() if self.disk else None}
+
+_summary_cache: Optional[SummaryCache] = None
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    global _summary_cache
+    s = get_settings()
+    if not s.llm_cache_enabled:
+        return None
+    if _summary_cache is None:
+        _summary_cache = SummaryCache(s.llm_cache_mem_size, s.llm_cache_ttl_s,
+                                      s.llm_cache_dir or None, s.llm_cache_max_bytes, get_shared_cache())
+    return _summary_cache
+
+@dataclass
+class _Attempt:
+    key: str
+    url: str
+    headers: dict
+    body: dict
+    timeout: float
+    parse: Callable[[dict], Optional[str]]
+
+class ProviderRouter:
+    """Deadline-aware LLM provider selection.
+
+    Each provider is a "lane" of attempts (Groq has one; Gemini has
+    model x base URL x body shape). Attempts whose breaker is open are
+    skipped, the attempt that last succeeded in a lane is tried first, and
+    every call's timeout is clamped to what is left of the request budget.
+    The async runner can hedge: if a lane hasn't answered after
+    hedge_delay_s, the next lane starts in parallel and the first text wins.
+    """
+
+    def __init__(self, threshold: int=3, cooldown_s: float=60.0):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._preferred: Dict[str, str] = {}
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        b = self._breakers.get(key)
+        if b is None:
+            b = self._breakers[key] = CircuitBreaker(self.threshold, self.cooldown_s)
+        return b
+
+    def _ordered(self, lane: List[_Attempt]) -> List[_Attempt]:
+        provider = lane[0].key.split(":")[0]
+        pref = self._preferred.get(provider)
+        # Breakers are consulted per attempt, right before it is sent, so a
+        # half-open breaker's single trial goes to the attempt actually made
+        return sorted(lane, key=lambda a: a.key != pref)
+
+    def allow(self, a: _Attempt) -> bool:
+        return self._breaker(a.key).allow()
+
+    def record(self, a: _Attempt, ok: bool, elapsed: Optional[float]=None) -> None:
+        self._breaker(a.key).record(ok)
+        if elapsed is not None:
+            LLM_ATTEMPT_SECONDS.observe(elapsed, provider=a.key.split(":")[0], attempt=a.key,
+                                        outcome="ok" if ok else "fail")
+        if ok:
+            self._preferred[a.key.split(":")[0]] = a.key
+
+    async def _run_lane_async(self, client, lane: List[_Attempt], deadline: float) -> Optional[str]:
+        for a in self._ordered(lane):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if not self.allow(a):
+                continue
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(a.url, headers=a.headers, json=a.body, timeout=min(a.timeout, remaining))
+                txt = a.parse(r.json()) if r.status_code < 400 else None
+            except asyncio.CancelledError:
+                # Lost a hedge race: no verdict on this provider
+                self._breaker(a.key).release()
+                raise
+            except Exception:
+                txt = None
+            self.record(a, bool(txt), time.perf_counter() - t0)
+            if txt:
+                return txt
+        return None
+
+    async def run_async(self, client, lanes: List[List[_Attempt]], deadline: float,
+                        hedge_delay_s: Optional[float]=None) -> Optional[str]:
+        lanes = [l for l in lanes if l]
+        pending = set()
+        next_lane = 0
+        try:
+            while True:
+                # Start the next lane when everything in flight has failed, or
+                # when the hedge delay expired without an answer.
+                if next_lane < len(lanes) and not pending:
+                    pending.add(asyncio.ensure_future(self._run_lane_async(client, lanes[next_lane], deadline)))
+                    next_lane += 1
+                if not pending:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                hedging = hedge_delay_s is not None and next_lane < len(lanes)
+                done, pending = await asyncio.wait(
+                    pending, timeout=min(remaining, hedge_delay_s) if hedging else remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for t in done:
+                    if t.result():
+                        return t.result()
+                if not done and hedging:
+                    pending.add(asyncio.ensure_future(self._run_lane_async(client, lanes[next_lane], deadline)))
+                    next_lane += 1
+        finally:
+            for t in pending:
+                t.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "preferred": dict(self._preferred),
+            "breakers": {k: {"state": b.state, "failures": b.failures} for k, b in self._breakers.items()},
+        }
+
+_router: Optional[ProviderRouter] = None
+
+def get_provider_router() -> ProviderRouter:
+    global _router
+    if _router is None:
+        s = get_settings()
+        _router = ProviderRouter(s.llm_breaker_threshold, s.llm_breaker_cooldown_s)
+    return _router
+
+def _lanes(settings, prompt: str) -> List[List[_Attempt]]:
+    lanes = []
+    # 1) Groq first if available
+    groq_key = getattr(settings, 'groq_api_key', None) or os.environ.get('GROQ_API_KEY')
+    if groq_key:
+        url, headers, body = _groq_request(groq_key, prompt, settings.groq_url or GROQ_URL)
+        lanes.append([_Attempt(f"groq:{GROQ_MODEL}", url, headers, body, 25, _groq_text)])
+    # 2) Then Gemini
+    if settings.gemini_api_key:
+        headers = {"Content-Type": "application/json"}
+        bases = [settings.gemini_base_url] if settings.gemini_base_url else GEMINI_BASE_URLS
+        lanes.append([_Attempt(key, url, headers, body, 20, _extract_text_from_resp)
+                      for key, url, body in _gemini_attempts(settings.gemini_api_key, prompt, bases)])
+    return lanes
+
+def _no_text(settings, site_name: str, candidates_json: dict, deadline: float) -> str:
+    # Out of budget, or no provider configured: answer with the computed summary
+    if time.monotonic() >= deadline:
+        LLM_FALLBACK_TOTAL.inc(reason="budget")
+        return _fallback_summary(site_name, candidates_json)
+    if not settings.gemini_api_key:
+        LLM_FALLBACK_TOTAL.inc(reason="no_provider" if not settings.groq_api_key else "failed")
+        return _fallback_summary(site_name, candidates_json)
+    LLM_FALLBACK_TOTAL.inc(reason="failed")
+    return GEMINI_FAILED
+
+async def summarize_with_llm_async(project_brief: str, site_name: str, candidates_json: dict,
+                                   budget_s: Optional[float]=None) -> str:
+    """The LLM summary (or the computed fallback), on the shared pooled LLM client."""
+    with stage("llm"):
+        return await _summarize_cached_async(project_brief, site_name, candidates_json, budget_s)
+
+async def _summarize_cached_async(project_brief: str, site_name: str, candidates_json: dict,
+                                  budget_s: Optional[float]=None) -> str:
+    cache = get_summary_cache()
+    if cache is None:
+        return await _summarize_with_llm_async(project_brief, site_name, candidates_json, budget_s)
+    key = summary_cache_key(project_brief, site_name, candidates_json)
+    summary = cache.get(key)
+    if summary is None:
+        summary = await _summarize_with_llm_async(project_brief, site_name, candidates_json, budget_s)
+        cache.set(key, summary)
+    return summary
+
+async def _summarize_with_llm_async(project_brief: str, site_name: str, candidates_json: dict,
+                                    budget_s: Optional[float]=None) -> str:
+    settings = get_settings()
+    deadline = time.monotonic() + (settings.llm_budget_s if budget_s is None else budget_s)
+    lanes = _lanes(settings, _build_prompt(project_brief, site_name, candidates_json))
+    txt = None
+    if lanes:
+        # Raises Overloaded rather than queueing past the gate's bounds
+        async with get_llm_gate().slot():
+            txt = await get_provider_router().run_async(get_llm_client(), lanes, deadline, settings.llm_hedge_delay_s)
+    return txt or _no_text(settings, site_name, candidates_json, deadline)
+
+async def _groq_stream(client, a: _Attempt, deadline: float) -> AsyncIterator[Optional[str]]:
+    # OpenAI-style SSE: yields content deltas, then None once [DONE] arrives
+    body = {**a.body, "stream": True}
+    timeout = max(0.1, min(a.timeout, deadline - time.monotonic()))
+    async with client.stream("POST", a.url, headers=a.headers, json=body, timeout=timeout) as r:
+        if r.status_code >= 400:
+            return
+        async for line in r.aiter_lines():
+            if time.monotonic() >= deadline:
+                return
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                yield None
+                return
+            choices = json.loads(data).get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+async def stream_summary_async(project_brief: str, site_name: str, candidates_json: dict,
+                               budget_s: Optional[float]=None) -> AsyncIterator[Optional[str]]:
+    """Yield the LLM summary as it arrives.
+
+    Groq streams token deltas; other providers (and cache hits) arrive as a
+    single chunk. Fallback/failure text is never yielded, so an empty stream
+    means "computed mode". None means "discard what was yielded so far": a
+    Groq stream broke off, and what follows (if anything) is the whole
+    summary from the remaining providers. Only complete streams are cached.
+    """
+    settings = get_settings()
+    cache = get_summary_cache()
+    key = summary_cache_key(project_brief, site_name, candidates_json)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            yield hit
+            return
+
+    deadline = time.monotonic() + (settings.llm_budget_s if budget_s is None else budget_s)
+    lanes = _lanes(settings, _build_prompt(project_brief, site_name, candidates_json))
+    if not lanes:
+        return
+    try:
+        async with get_llm_gate().slot():
+            async for delta in _stream_lanes(lanes, cache, key, deadline, settings):
+                yield delta
+    except Overloaded:
+        LLM_FALLBACK_TOTAL.inc(reason="overloaded")
+
+async def _stream_lanes(lanes, cache: Optional[SummaryCache], key: str, deadline: float, settings) -> AsyncIterator[Optional[str]]:
+    router = get_provider_router()
+    client = get_llm_client()
+    if lanes and lanes[0][0].key.startswith("groq:"):
+        groq = lanes.pop(0)[0]
+        if router.allow(groq):
+            parts, complete = [], False
+            t0 = time.perf_counter()
+            try:
+                async for delta in _groq_stream(client, groq, deadline):
+                    if delta is None:
+                        complete = True
+                        break
+                    parts.append(delta)
+                    yield delta
+            except Exception:
+                pass
+            router.record(groq, complete, time.perf_counter() - t0)
+            if complete and parts:
+                if cache is not None:
+                    cache.set(key, "".join(parts))
+                return
+            if parts:
+                # Broken off mid-summary: retract it and fall through to the other lanes
+                yield None
+
+    txt = await router.run_async(client, lanes, deadline, settings.llm_hedge_delay_s)
+    if txt:
+        if cache is not None:
+            cache.set(key, txt)
+        yield txt
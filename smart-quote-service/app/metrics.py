@@ -0,0 +1,141 @@
+import bisect, contextvars, threading, time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; spans sub-ms costing up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25)
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str="") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]=()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float=1.0, **labels) -> None:
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            out.append(f"{self.name}{_fmt_labels(self.labels, key)} {v}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [[0]*(len(self.buckets)+1), 0.0]
+            v[0][i] += 1
+            v[1] += seconds
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._values.items()):
+            acc = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                acc += c
+                labels = _fmt_labels(self.labels, key, 'le="%s"' % le)
+                out.append(f"{self.name}_bucket{labels} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {acc}")
+        return out
+
+REQUEST_SECONDS = Histogram("smartquote_request_seconds", "HTTP request latency.", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("smartquote_stage_seconds", "Latency of quote pipeline stages.", ("stage",))
+LLM_ATTEMPT_SECONDS = Histogram("smartquote_llm_attempt_seconds", "Latency of each LLM provider/model attempt.",
+                                ("provider", "attempt", "outcome"))
+INVOICE_RENDER_SECONDS = Histogram("smartquote_invoice_render_seconds", "PDF render time in the invoice workers.")
+OSRM_FALLBACK_TOTAL = Counter("smartquote_osrm_fallback_total", "Routes answered without OSRM, by fallback source.",
+                              ("source",))
+LLM_FALLBACK_TOTAL = Counter("smartquote_llm_fallback_total", "Summaries answered by the computed fallback.", ("reason",))
+ADMISSION_REJECTED_TOTAL = Counter("smartquote_admission_rejected_total",
+                                   "Calls turned away by an admission gate.", ("gate", "reason"))
+SINGLEFLIGHT_JOINED_TOTAL = Counter("smartquote_singleflight_joined_total",
+                                    "Requests served by an identical in-flight computation.", ("group",))
+
+METRICS = (REQUEST_SECONDS, STAGE_SECONDS, LLM_ATTEMPT_SECONDS, INVOICE_RENDER_SECONDS,
+           OSRM_FALLBACK_TOTAL, LLM_FALLBACK_TOTAL, ADMISSION_REJECTED_TOTAL, SINGLEFLIGHT_JOINED_TOTAL)
+
+def render_prometheus() -> str:
+    lines = []
+    for m in METRICS:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+# Per-request stage timings for the Server-Timing header. None outside a
+# request (scripts, background threads), in which case only the histogram
+# is updated.
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("timings", default=None)
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _timings.set(timings)
+    return timings
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds*1000:.2f}" for name, seconds in timings)
+
+class TimingMiddleware:
+    """Pure ASGI middleware: request histogram plus a Server-Timing header.
+
+    The header is attached at http.response.start, so for ordinary responses
+    it lists every stage; streamed responses only show the stages that ran
+    before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = start_request_timings()
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                timings.append(("app", time.perf_counter() - t0))
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, method=scope["method"], route=route, status=status[0])
@@ -0,0 +1,100 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from .geocode import tokenize
+
+# Free-text materials and quantities from the simple endpoints -> catalog
+# lines. Everything is compiled at import; results are memoized per
+# (materials, quantity), so repeat requests cost a dict lookup.
+
+# sku, tons per unit, aliases (the sku's own words always match too)
+MATERIALS = [
+    ("cement_bag_50kg", 0.05, ("cement", "opc", "ppc", "opc cement", "ppc cement")),
+    ("sand_mt", 1.0, ("sand", "river sand", "m sand", "msand", "manufactured sand", "crushed sand")),
+    ("rebar_tmt_10mm_ton", 1.0, ("steel", "steel tmt", "tmt", "tmt bar", "tmt bars", "rebar", "rebars",
+                                 "sariya", "saria")),
+    ("bricks_1000", 1.6, ("brick", "bricks", "red bricks", "fly ash bricks")),
+    ("aggregates_mt", 1.0, ("aggregate", "aggregates", "gravel", "coarse aggregate", "crushed stone",
+                            "jelly", "gitti")),
+    ("concrete_m3", 2.4, ("concrete", "rmc", "ready mix", "ready mix concrete", "ready mixed concrete")),
+]
+UNKNOWN_WEIGHT_TON = 1.0
+
+# Base units per unit of each quantity unit. A base unit is the endpoint's
+# long-standing rough scale: ~200 sq ft of built-up area, 2 m3, 1 ton or 50 m.
+UNIT_GROUPS = [
+    (1/200, ("sq ft", "sqft", "sft", "square feet", "square foot", "ft2")),
+    (10.764/200, ("sq m", "sqm", "m2", "square metre", "square metres", "square meter", "square meters")),
+    (1/2, ("m3", "cum", "cu m", "cbm", "cubic metre", "cubic metres", "cubic meter", "cubic meters")),
+    (1/35.315/2, ("cft", "cu ft", "cubic feet", "cubic foot")),
+    (2.832/2, ("brass",)),  # 100 cft, the usual unit for sand and aggregates
+    (1.0, ("ton", "tons", "tonne", "tonnes", "mt", "t")),
+    (1/1000, ("kg", "kgs")),
+    (1.0, ("bag", "bags")),
+    (1/50, ("m", "meter", "meters", "metre", "metres", "mtr", "mtrs", "rmt")),
+    (0.3048/50, ("ft", "feet", "rft")),
+]
+UNIT_FACTOR = {u: f for f, names in UNIT_GROUPS for u in names}
+
+_QUANTITY = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(?:("
+    + "|".join(r"\s*".join(map(re.escape, u.split())) for u in sorted(UNIT_FACTOR, key=len, reverse=True))
+    + r")(?![a-z0-9]))?",
+    re.IGNORECASE,
+)
+
+def _alias_index():
+    index = {}
+    for sku, weight, aliases in MATERIALS:
+        for a in (sku, *aliases):
+            index[tokenize(a)] = (sku, weight)
+    return index, max(map(len, index))
+
+_ALIASES, _MAX_ALIAS = _alias_index()
+
+class Line(NamedTuple):
+    sku: str
+    desc: str
+    qty: int
+    weight_ton: float
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text: Optional[str]) -> float:
+    """Base units in a free-text quantity such as '1,200 sq ft' or '3 brass'; at least 1."""
+    m = _QUANTITY.search(text or "")
+    if not m:
+        return 1.0
+    unit = re.sub(r"\s+", " ", m.group(2).lower()) if m.group(2) else None
+    return max(1.0, float(m.group(1).replace(",", "")) * UNIT_FACTOR.get(unit, 1.0))
+
+def match_materials(text: str) -> Tuple[Tuple[str, float], ...]:
+    """(sku, tons per unit) for each material named in text, longest alias first."""
+    tokens = tokenize(text)
+    out, i = [], 0
+    while i < len(tokens):
+        for n in range(min(_MAX_ALIAS, len(tokens) - i), 0, -1):
+            hit = _ALIASES.get(tokens[i:i+n])
+            if hit:
+                out.append(hit)
+                i += n
+                break
+        else:
+            i += 1
+    return tuple(out)
+
+@lru_cache(maxsize=4096)
+def normalize_materials(materials: Tuple[str, ...], quantity: Optional[str]=None) -> Tuple[Line, ...]:
+    """One line per catalog SKU named in materials, each sized by the quantity text.
+
+    Unrecognized materials keep a slug of their text as SKU, which the price
+    catalog prices at its default.
+    """
+    qty = max(1, int(round(parse_quantity(quantity))))
+    lines, seen = [], set()
+    for m in materials:
+        hits = match_materials(m) or (("_".join(tokenize(m)), UNKNOWN_WEIGHT_TON),)
+        for sku, weight in hits:
+            if sku and sku not in seen:
+                seen.add(sku)
+                lines.append(Line(sku, m.strip(), qty, weight * qty))
+    return tuple(lines)
@@ -0,0 +1,208 @@
+import json, os, sys
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from .config import get_settings
+from .geo import haversine_km_np
+from .snapshots import HotSnapshot, current_version, publish_version
+
+# Built-in list prices, used when no PRICE_CATALOG_PATH is configured
+DEMO_PRICES = {
+    "cement_bag_50kg": 360.0,
+    "rebar_tmt_10mm_ton": 51500.0,
+    "sand_mt": 1200.0,
+    # aliases
+    "cement": 360.0,
+    "tmt": 52000.0,
+    "sand": 1100.0,
+}
+DEFAULT_PRICE = 1000.0
+
+# Catalog source format (JSON), as accepted by write_price_catalog:
+#   {"default_price": 1000.0,
+#    "skus":    {"sand_mt": {"price": 1200.0, "tiers": [[50, 0.97], [200, 0.94]]}, ...},
+#    "vendors": {"3": {"sand_mt": 1150.0}, ...},
+#    "regions": [{"name": "mumbai", "lat": 19.07, "lng": 72.88, "radius_km": 60,
+#                 "prices": {"sand_mt": 1450.0}}, ...]}
+# A tier [min_qty, multiplier] applies to lines of at least min_qty units.
+# Price precedence per line: vendor price, else regional price, else list
+# price; the quantity tier multiplies whichever one wins.
+
+ARRAYS = ("base", "tier_qty", "tier_mult", "vendor_id", "vendor_price",
+          "region_lat", "region_lng", "region_radius_km", "region_price")
+
+class PriceSnapshot:
+    """Immutable, indexed view of one price catalog version.
+
+    SKUs are mapped to column codes once; every price table carries one
+    extra trailing column for unknown SKUs (list price = default_price, no
+    overrides, no tiers), so code -1 needs no special-casing in lookups.
+    """
+
+    def __init__(self, version: str, skus: List[str], regions: List[str], arrays: Dict[str, np.ndarray]):
+        self.version = version
+        self.skus = skus
+        self.regions = regions
+        self._code = {s: i for i, s in enumerate(skus)}
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def codes(self, skus: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self._code.get(s, -1) for s in skus), dtype=np.intp, count=len(skus))
+
+    def region_at(self, site: Optional[Tuple[float, float]]) -> Optional[int]:
+        # Nearest region whose radius covers the site
+        if site is None or not len(self.region_lat):
+            return None
+        d = haversine_km_np(site[0], site[1], self.region_lat, self.region_lng)
+        d = np.where(d <= self.region_radius_km, d, np.inf)
+        r = int(np.argmin(d))
+        return r if np.isfinite(d[r]) else None
+
+    def unit_prices(self, skus: Sequence[str], qtys: Sequence[float], vendor_ids=None,
+                    site: Optional[Tuple[float, float]]=None) -> np.ndarray:
+        """Unit prices per line; shape (lines,), or (vendors, lines) when vendor_ids is given."""
+        codes = self.codes(skus)
+        qty = np.asarray(qtys, dtype=np.float64)
+        price = self.base[codes]
+        r = self.region_at(site)
+        if r is not None:
+            regional = self.region_price[r, codes]
+            price = np.where(np.isnan(regional), price, regional)
+        # Tier breaks are sorted ascending and padded with +inf
+        k = (self.tier_qty[codes] <= qty[:, None]).sum(axis=1)
+        mult = np.where(k > 0, self.tier_mult[codes, np.maximum(k - 1, 0)], 1.0)
+        if vendor_ids is None:
+            return price * mult
+        ids = np.asarray(vendor_ids, dtype=np.int64)
+        out = np.repeat(price[None, :], len(ids), axis=0)
+        if len(self.vendor_id) and len(ids):
+            rows = np.searchsorted(self.vendor_id, ids).clip(max=len(self.vendor_id) - 1)
+            hit = self.vendor_id[rows] == ids
+            own = self.vendor_price[rows[hit][:, None], codes]
+            out[hit] = np.where(np.isnan(own), out[hit], own)
+        return out * mult
+
+    def line_prices(self, items: List[Dict], vendor_ids=None,
+                    site: Optional[Tuple[float, float]]=None) -> np.ndarray:
+        """unit_prices for an item list; an explicit unit_price overrides the catalog for every vendor."""
+        prices = self.unit_prices([it["sku"] for it in items], [it["qty"] for it in items], vendor_ids, site)
+        fixed = [i for i, it in enumerate(items) if it.get("unit_price") is not None]
+        if fixed:
+            prices[..., fixed] = [float(items[i]["unit_price"]) for i in fixed]
+        return prices
+
+    def material_costs(self, items: List[Dict], vendor_ids=None,
+                       site: Optional[Tuple[float, float]]=None):
+        """Material cost of the item list: a float, or one per vendor when vendor_ids is given."""
+        qty = np.array([it["qty"] for it in items], dtype=np.float64)
+        out = self.line_prices(items, vendor_ids, site) @ qty
+        return float(out) if vendor_ids is None else out
+
+    def price(self, sku: str) -> float:
+        # Scalar list price, for callers that only need the reference price
+        return float(self.base[self._code.get(sku, -1)])
+
+    @classmethod
+    def from_catalog(cls, catalog: Dict, version: str="builtin") -> "PriceSnapshot":
+        skus, regions, arrays = _arrays_from_catalog(catalog)
+        return cls(version, skus, regions, arrays)
+
+def _arrays_from_catalog(catalog: Dict) -> Tuple[List[str], List[str], Dict[str, np.ndarray]]:
+    sku_rows = catalog.get("skus", {})
+    skus = list(sku_rows)
+    code = {s: i for i, s in enumerate(skus)}
+    width = len(skus) + 1
+
+    def row(prices: Dict[str, float]) -> np.ndarray:
+        out = np.full(width, np.nan)
+        for sku, p in prices.items():
+            if sku in code:
+                out[code[sku]] = float(p)
+        return out
+
+    base = np.array([float(sku_rows[s]["price"]) for s in skus] + [float(catalog.get("default_price", DEFAULT_PRICE))])
+    n_tiers = max([len(r.get("tiers") or []) for r in sku_rows.values()] + [1])
+    tier_qty = np.full((width, n_tiers), np.inf)
+    tier_mult = np.ones((width, n_tiers))
+    for s in skus:
+        for t, (min_qty, mult) in enumerate(sorted(sku_rows[s].get("tiers") or [])):
+            tier_qty[code[s], t], tier_mult[code[s], t] = float(min_qty), float(mult)
+
+    vendors = sorted((int(v), p) for v, p in catalog.get("vendors", {}).items())
+    regions = catalog.get("regions", [])
+    arrays = {
+        "base": base, "tier_qty": tier_qty, "tier_mult": tier_mult,
+        "vendor_id": np.array([v for v, _ in vendors], dtype=np.int64),
+        "vendor_price": np.array([row(p) for _, p in vendors]).reshape(len(vendors), width),
+        "region_lat": np.array([float(r["lat"]) for r in regions]),
+        "region_lng": np.array([float(r["lng"]) for r in regions]),
+        "region_radius_km": np.array([float(r["radius_km"]) for r in regions]),
+        "region_price": np.array([row(r.get("prices", {})) for r in regions]).reshape(len(regions), width),
+    }
+    return skus, [r["name"] for r in regions], arrays
+
+BUILTIN_CATALOG = {"default_price": DEFAULT_PRICE, "skus": {s: {"price": p} for s, p in DEMO_PRICES.items()}}
+
+def write_price_catalog(root: str, catalog: Dict, keep: int=2) -> str:
+    def write(vdir: str, version: str):
+        skus, regions, arrays = _arrays_from_catalog(catalog)
+        for name, arr in arrays.items():
+            np.save(os.path.join(vdir, f"{name}.npy"), arr)
+        with open(os.path.join(vdir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "skus": skus, "regions": regions}, f)
+    return publish_version(root, write, keep)
+
+def load_price_catalog(root: str, version: Optional[str]=None) -> PriceSnapshot:
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"no price catalog published under {root}")
+    vdir = os.path.join(root, version)
+    with open(os.path.join(vdir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    arrays = {a: np.load(os.path.join(vdir, f"{a}.npy"), mmap_mode="r") for a in ARRAYS}
+    return PriceSnapshot(version, manifest["skus"], manifest["regions"], arrays)
+
+class PriceCatalog(HotSnapshot[PriceSnapshot]):
+    """Holds the live PriceSnapshot and hot-swaps it when CURRENT changes."""
+
+    label = "PRICES"
+
+    def _load(self) -> PriceSnapshot:
+        if self.root and current_version(self.root):
+            return load_price_catalog(self.root)
+        return PriceSnapshot.from_catalog(BUILTIN_CATALOG)
+
+    def at(self, version: str) -> PriceSnapshot:
+        """That version if it is live or still published, else the live snapshot."""
+        snap = self.snapshot()
+        if snap.version == version or not self.root:
+            return snap
+        try:
+            return load_price_catalog(self.root, version)
+        except (OSError, ValueError):
+            return snap
+
+    def stats(self) -> dict:
+        s = self._snap
+        return {"version": s.version, "skus": len(s), "vendors": len(s.vendor_id),
+                "regions": len(s.regions), "root": self.root}
+
+_catalog: Optional[PriceCatalog] = None
+
+def get_price_catalog() -> PriceCatalog:
+    global _catalog
+    if _catalog is None:
+        s = get_settings()
+        _catalog = PriceCatalog(s.price_catalog_path, s.price_reload_check_s)
+    return _catalog
+
+if __name__ == "__main__":
+    # python -m app.pricing <catalog.json> <catalog_dir>
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.pricing <catalog.json> <catalog_dir>")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        catalog = json.load(f)
+    print(write_price_catalog(sys.argv[2], catalog))
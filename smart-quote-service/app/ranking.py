@@ -1,5 +1,6 @@
+import numpy as np
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 @dataclass
 class Candidate:
@@ -21,21 +22,101 @@ class Candidate:
         risk_buffer = 0.02 * self.material_cost + 100.0 * self.price_volatility
         return self.material_cost + self.freight_cost + self.taxes + self.handling + risk_buffer
 
+DEFAULT_WEIGHTS = {"price":0.55,"eta":0.2,"sla":0.15,"rel":0.1}
+
 def _norm(arr):
     lo, hi = min(arr), max(arr)
     if hi - lo < 1e-9:
         return [0.0]*len(arr)
     return [(x - lo)/(hi - lo) for x in arr]
 
-def rank_candidates(cands: List[Candidate], weights=None) -> List[Tuple[Candidate,float]]:
+def rank_candidates(cands: List[Candidate], weights=None, risk=None) -> List[Tuple[Candidate,float]]:
+    """(candidate, score) best-first; with a risk.RiskProfile (aligned with cands) price is
+    scored on P90 landed cost and SLA on the simulated P(on time)."""
     if not cands:
         return []
-    w = {"price":0.55,"eta":0.2,"sla":0.15,"rel":0.1} if weights is None else weights
-    lc = [c.landed_cost for c in cands]
+    w = DEFAULT_WEIGHTS if weights is None else weights
+    lc = [c.landed_cost for c in cands] if risk is None else risk.p90.tolist()
     et = [c.eta_minutes for c in cands]
-    sla = [1-c.on_time_rate for c in cands]
+    sla = [1-c.on_time_rate for c in cands] if risk is None else (1-risk.p_on_time).tolist()
     rel = [1-c.acceptance_prob for c in cands]
     score = [w["price"]*a + w["eta"]*b + w["sla"]*c + w["rel"]*d
              for a,b,c,d in zip(_norm(lc), _norm(et), _norm(sla), _norm(rel))]
     ranked = sorted(zip(cands, score), key=lambda x: x[1])
     return ranked
+
+_BATCH_FIELDS = ("distance_km", "on_time_rate", "quality_score", "acceptance_prob", "material_cost",
+                 "freight_cost", "taxes", "handling", "eta_minutes", "price_volatility")
+
+class CandidateBatch:
+    """Struct-of-arrays view of many candidates for vectorized costing and ranking.
+
+    Scalar inputs broadcast to the batch length. landed_cost is computed once
+    with the same operation order as Candidate.landed_cost, so values match the
+    scalar path bit for bit.
+    """
+
+    def __init__(self, vendor_id, vendor_name, **cols):
+        self.vendor_id = np.asarray(vendor_id)
+        self.vendor_name = list(vendor_name)
+        n = len(self.vendor_id)
+        for f in _BATCH_FIELDS:
+            setattr(self, f, np.broadcast_to(np.asarray(cols[f], dtype=np.float64), (n,)))
+        risk_buffer = 0.02 * self.material_cost + 100.0 * self.price_volatility
+        self.landed_cost = self.material_cost + self.freight_cost + self.taxes + self.handling + risk_buffer
+
+    def __len__(self) -> int:
+        return len(self.vendor_id)
+
+    @classmethod
+    def from_candidates(cls, cands: List[Candidate]) -> "CandidateBatch":
+        return cls([c.vendor_id for c in cands], [c.vendor_name for c in cands],
+                   **{f: [getattr(c, f) for c in cands] for f in _BATCH_FIELDS})
+
+    def take(self, rows) -> "CandidateBatch":
+        """Sub-batch of the given rows (landed_cost is recomputed identically)."""
+        rows = np.asarray(rows, dtype=np.intp)
+        return CandidateBatch(self.vendor_id[rows], [self.vendor_name[r] for r in rows],
+                              **{f: getattr(self, f)[rows] for f in _BATCH_FIELDS})
+
+    def columns(self) -> dict:
+        """The constructor's keyword columns (landed_cost is derived from them)."""
+        return {f: getattr(self, f) for f in _BATCH_FIELDS}
+
+    def candidate(self, i: int) -> Candidate:
+        return Candidate(vendor_id=int(self.vendor_id[i]), vendor_name=self.vendor_name[i],
+                         **{f: float(getattr(self, f)[i]) for f in _BATCH_FIELDS})
+
+def _norm_np(arr: np.ndarray) -> np.ndarray:
+    lo, hi = arr.min(), arr.max()
+    if hi - lo < 1e-9:
+        return np.zeros(len(arr))
+    return (arr - lo)/(hi - lo)
+
+def score_batch(batch: CandidateBatch, weights=None, risk=None) -> np.ndarray:
+    w = DEFAULT_WEIGHTS if weights is None else weights
+    landed = batch.landed_cost if risk is None else risk.p90
+    on_time = batch.on_time_rate if risk is None else risk.p_on_time
+    return (w["price"]*_norm_np(landed) + w["eta"]*_norm_np(batch.eta_minutes)
+            + w["sla"]*_norm_np(1-on_time) + w["rel"]*_norm_np(1-batch.acceptance_prob))
+
+def top_k_indices(score: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k lowest scores, ordered like a stable sort of the full array."""
+    n = len(score)
+    if k >= n:
+        return np.argsort(score, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = score[np.argpartition(score, k-1)[k-1]]
+    # Keep every tie at the cutoff so the stable order picks the same winners
+    # as sorted() would.
+    idx = np.flatnonzero(score <= kth)
+    return idx[np.argsort(score[idx], kind="stable")][:k]
+
+def rank_batch(batch: CandidateBatch, weights=None, top_k: Optional[int]=None, risk=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized rank_candidates: (indices best-first, their scores)."""
+    if len(batch) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+    score = score_batch(batch, weights, risk)
+    idx = top_k_indices(score, len(batch) if top_k is None else top_k)
+    return idx, score[idx]
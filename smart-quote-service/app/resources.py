@@ -0,0 +1,103 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import httpx
+import numpy as np
+from fastapi import Request
+from .admission import AdmissionGate, SingleFlight, get_llm_gate, get_quote_flights
+from .cache import SharedCache, get_shared_cache
+from .config import Settings, get_settings
+from .geocode import Gazetteer, get_gazetteer
+from .clients import open_clients, close_clients, get_osrm_client, get_llm_client
+from .invoice_queue import InvoiceQueue, get_invoice_queue
+from .llm import ProviderRouter, SummaryCache, get_provider_router, get_summary_cache
+from .pricing import PriceCatalog, get_price_catalog
+from .ranking import CandidateBatch, rank_batch
+from .routing import RouteCache, get_route_cache
+from .serialize import encode_json
+from .sessions import QuoteSessionStore, get_quote_sessions
+from .tiles import RouteTiles, get_route_tiles
+from .vendors import VendorRegistry, get_vendor_registry
+
+@dataclass
+class Resources:
+    """Process-wide state built once in the FastAPI lifespan.
+
+    Routers receive it via Depends(get_resources); the fields are the same
+    singletons the module-level getters return, so library code called
+    outside a request (scripts, benchmarks) sees identical state.
+    """
+    settings: Settings
+    osrm_client: httpx.AsyncClient
+    llm_client: httpx.AsyncClient
+    vendors: VendorRegistry
+    shared_cache: Optional[SharedCache]
+    route_cache: RouteCache
+    route_tiles: RouteTiles
+    gazetteer: Gazetteer
+    quote_sessions: QuoteSessionStore
+    summary_cache: Optional[SummaryCache]
+    llm_router: ProviderRouter
+    llm_gate: AdmissionGate
+    quote_flights: SingleFlight
+    invoice_queue: InvoiceQueue
+    prices: PriceCatalog
+    startup_ms: Dict[str, float] = field(default_factory=dict)
+
+def _warm_up(res: "Resources") -> None:
+    # Touch the first-call paths (NumPy ufunc dispatch, k-d tree walk,
+    # response encoding) so the first real quote doesn't pay for them.
+    snap = res.vendors.snapshot()
+    if len(snap):
+        snap.index.shortlist(float(snap.lat[0]), float(snap.lng[0]), k=res.settings.vendor_prefilter_k)
+    batch = CandidateBatch(
+        vendor_id=np.arange(2), vendor_name=["a", "b"], distance_km=[1.0, 2.0], eta_minutes=[1.0, 2.0],
+        on_time_rate=0.9, quality_score=0.9, acceptance_prob=0.6, price_volatility=0.03,
+        material_cost=1.0, freight_cost=1.0, taxes=1.0, handling=1.0,
+    )
+    order, scores = rank_batch(batch, top_k=1)
+    encode_json({"candidates": [{"vendor_id": int(order[0]), "score": scores[0], "eta": batch.eta_minutes}]})
+    res.prices.snapshot().material_costs([{"sku": "", "qty": 1.0}], snap.id[:2], (0.0, 0.0))
+
+async def open_resources() -> Resources:
+    timings: Dict[str, float] = {}
+    t_start = t = time.perf_counter()
+
+    def lap(name: str):
+        nonlocal t
+        now = time.perf_counter()
+        timings[name] = round((now - t)*1000, 1)
+        t = now
+
+    settings = get_settings(); lap("settings")
+    await open_clients(); lap("http_clients")
+    vendors = get_vendor_registry(); vendors.snapshot(); lap("vendors")
+    prices = get_price_catalog(); prices.snapshot(); lap("prices")
+    route_tiles = get_route_tiles(); route_tiles.snapshot(); lap("route_tiles")
+    gazetteer = get_gazetteer(); lap("gazetteer")
+    shared_cache = get_shared_cache()
+    route_cache = get_route_cache()
+    summary_cache = get_summary_cache()
+    quote_sessions = get_quote_sessions()
+    llm_router = get_provider_router()
+    llm_gate = get_llm_gate()
+    quote_flights = get_quote_flights(); lap("caches")
+    invoice_queue = get_invoice_queue(); invoice_queue.start(); lap("invoice_workers")
+    res = Resources(
+        settings=settings, osrm_client=get_osrm_client(), llm_client=get_llm_client(),
+        vendors=vendors, shared_cache=shared_cache, route_cache=route_cache, route_tiles=route_tiles, gazetteer=gazetteer, summary_cache=summary_cache,
+        quote_sessions=quote_sessions,
+        llm_router=llm_router, llm_gate=llm_gate, quote_flights=quote_flights, invoice_queue=invoice_queue, prices=prices,
+    )
+    _warm_up(res); lap("warm_up")
+    timings["total"] = round((time.perf_counter() - t_start)*1000, 1)
+    res.startup_ms = timings
+    print("[STARTUP] ready in", timings["total"], "ms", timings)
+    return res
+
+async def close_resources(res: Resources) -> None:
+    res.invoice_queue.shutdown()
+    await close_clients()
+
+def get_resources(request: Request) -> Resources:
+    return request.app.state.resources
@@ -0,0 +1,86 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+from .ranking import CandidateBatch
+
+# Monte Carlo risk mode: per candidate, `scenarios` joint draws of the
+# material price, the trip time, whether the vendor accepts the order and
+# whether it misses its SLA, as (vendors x scenarios) float32 arrays.
+#
+# - price: lognormal around material_cost with sigma = price_volatility;
+#   GST and handling follow it, freight follows the trip time
+# - decline (1 - acceptance_prob): re-sourced at DECLINE_PREMIUM on material,
+#   DECLINE_DELAY_H later
+# - late (1 - on_time_rate): an exponential delay, LATE_MEAN_H on average
+#
+# The simulated landed cost replaces Candidate.landed_cost's fixed risk
+# buffer. Draws come from one seeded generator, so a request reproduces
+# exactly; the scenario count is capped so vendors x scenarios stays within
+# max_cells, the per-request compute budget, and a shortlist too long for
+# MIN_SCENARIOS within it is refused (RiskBudgetExceeded) rather than
+# quietly ranked without risk.
+
+TRIP_SIGMA = 0.20
+DECLINE_PREMIUM = 0.05
+DECLINE_DELAY_H = 24.0
+LATE_MEAN_H = 48.0
+MIN_SCENARIOS = 200
+
+class RiskBudgetExceeded(ValueError):
+    pass
+
+@dataclass
+class RiskProfile:
+    p50: np.ndarray         # per vendor, landed cost
+    p90: np.ndarray
+    p_on_time: np.ndarray   # delivered within the window
+    scenarios: int
+    seed: int
+    window_h: float
+
+    def take(self, rows) -> "RiskProfile":
+        return RiskProfile(self.p50[rows], self.p90[rows], self.p_on_time[rows], self.scenarios, self.seed,
+                           self.window_h)
+
+def _lognormal(z: np.ndarray, sigma) -> np.ndarray:
+    # Mean-one multiplier
+    return np.exp(sigma*z - np.float32(0.5)*sigma*sigma)
+
+def simulate_risk(batch: CandidateBatch, window_h: float, dispatch_h=0.0, scenarios: int=2000, seed: int=0,
+                  max_cells: int=1_000_000) -> Optional[RiskProfile]:
+    """P50/P90 landed cost and P(on time) per candidate; None for an empty batch.
+
+    dispatch_h: per-vendor hours from now to dispatch (the dispatch slot).
+    Raises RiskBudgetExceeded if MIN_SCENARIOS per candidate do not fit max_cells.
+    """
+    n = len(batch)
+    if n == 0:
+        return None
+    scenarios = min(scenarios, max_cells // n)
+    if scenarios < MIN_SCENARIOS:
+        raise RiskBudgetExceeded(f"risk_mode needs {MIN_SCENARIOS} scenarios per candidate; {n} candidates "
+                                 f"exceed the budget of {max_cells} cells (at most {max_cells // MIN_SCENARIOS})")
+    # Per-vendor columns against the scenario axis
+    f32 = lambda a: np.broadcast_to(np.asarray(a, dtype=np.float32), (n,))[:, None]
+    material, freight = f32(batch.material_cost), f32(batch.freight_cost)
+    overhead = f32(np.divide(batch.taxes + batch.handling, batch.material_cost,
+                             out=np.zeros(n), where=batch.material_cost > 0))
+    rng = np.random.default_rng(seed)
+    shape = (n, scenarios)
+    trip = _lognormal(rng.standard_normal(shape, dtype=np.float32), np.float32(TRIP_SIGMA))
+    price = _lognormal(rng.standard_normal(shape, dtype=np.float32), f32(batch.price_volatility))
+    declined = rng.random(shape, dtype=np.float32) >= f32(batch.acceptance_prob)
+    price[declined] *= np.float32(1 + DECLINE_PREMIUM)
+    landed = material*(1 + overhead)*price + freight*trip
+    p50, p90 = np.percentile(landed, (50, 90), axis=1)
+
+    # u < p_late marks a late delivery; u / p_late is then uniform again and
+    # gives its exponential delay without another draw
+    p_late = f32(np.maximum(1 - batch.on_time_rate, 1e-6))
+    u = rng.random(shape, dtype=np.float32)
+    late = u < p_late
+    arrive = f32(dispatch_h) + f32(batch.eta_minutes / 60.0)*trip + declined*np.float32(DECLINE_DELAY_H)
+    arrive[late] -= np.float32(LATE_MEAN_H) * np.log((u / p_late)[late])
+    p_on_time = (arrive <= window_h).mean(axis=1)
+    return RiskProfile(p50.astype(float), p90.astype(float), p_on_time.astype(float), scenarios, seed,
+                       float(window_h))
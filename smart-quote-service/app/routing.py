@@ -1,34 +1,250 @@
-import math, requests
-from typing import Tuple
-
-def haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    p1, p2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlmb = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(p1)*math.cos(p2)*math.sin(dlmb/2)**2
-    return 2*R*math.asin(math.sqrt(a))
-
-def try_osrm_distance_eta(osrm_url: str, origin: Tuple[float,float], dest: Tuple[float,float]):
-    try:
-        url = f"{osrm_url}/route/v1/driving/{origin[1]},{origin[0]};{dest[1]},{dest[0]}?overview=false"
-        j = requests.get(url, timeout=4).json()
-        dist_km = j["routes"][0]["distance"]/1000.0
-        minutes = j["routes"][0]["duration"]/60.0
-        return dist_km, minutes, "osrm"
-    except Exception:
-        return None, None, "fallback"
-
-def route_distance_eta(osrm_url: str, origin: Tuple[float,float], dest: Tuple[float,float],
-                       dow:int=2, hour:int=10, rain_mm:float=0.0):
-    dist_km, minutes, src = try_osrm_distance_eta(osrm_url, origin, dest)
-    if dist_km is None:
-        dist_km = haversine_km(origin[0], origin[1], dest[0], dest[1])
-        base_speed_kmph = 45.0
-        minutes = (dist_km / base_speed_kmph) * 60.0
-        src = "haversine"
+import asyncio, requests
+import numpy as np
+from typing import List, Optional, Tuple
+from .breaker import CircuitBreaker
+from .cache import SharedCache, TTLCache, get_shared_cache
+from .config import get_settings
+from .clients import get_osrm_client
+from .geo import haversine_km, haversine_km_np
+from .metrics import OSRM_FALLBACK_TOTAL
+from .tiles import get_route_tiles
+
+class RouteCache:
+    """Raw (pre-traffic-factor) OSRM distance/duration keyed on quantized grid cells.
+
+    A per-process LRU in front of the optional SharedCache ("route"
+    namespace), so one worker's OSRM answers serve every worker on the host.
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float, cell_deg: float, shared: Optional[SharedCache]=None):
+        self.cell_deg = cell_deg
+        self.ttl_s = ttl_s
+        self.shared = shared
+        self._cache = TTLCache(maxsize=maxsize, ttl_s=ttl_s)
+
+    def key(self, osrm_url: str, origin: Tuple[float,float], dest: Tuple[float,float]):
+        q = lambda x: int(round(x / self.cell_deg))
+        return (osrm_url, q(origin[0]), q(origin[1]), q(dest[0]), q(dest[1]))
+
+    @staticmethod
+    def _shared_key(key) -> str:
+        return "|".join(map(str, key))
+
+    def get(self, osrm_url, origin, dest):
+        return self.get_many(osrm_url, origin, [dest])[0]
+
+    def get_many(self, osrm_url, origin, dests) -> List[Optional[Tuple[float, float]]]:
+        keys = [self.key(osrm_url, origin, d) for d in dests]
+        out = [self._cache.get(k) for k in keys]
+        miss = [i for i, v in enumerate(out) if v is None]
+        if miss and self.shared is not None:
+            found = self.shared.get_many("route", [self._shared_key(keys[i]) for i in miss])
+            for i in miss:
+                hit = found.get(self._shared_key(keys[i]))
+                if hit is not None:
+                    out[i] = tuple(hit)
+                    self._cache.set(keys[i], out[i])
+        return out
+
+    def set(self, osrm_url, origin, dest, dist_km: float, minutes: float):
+        self.set_many(osrm_url, origin, [dest], [(dist_km, minutes)])
+
+    def set_many(self, osrm_url, origin, dests, values):
+        keys = [self.key(osrm_url, origin, d) for d in dests]
+        for k, (dist_km, minutes) in zip(keys, values):
+            self._cache.set(k, (dist_km, minutes))
+        if self.shared is not None:
+            self.shared.set_many("route", {self._shared_key(k): list(v) for k, v in zip(keys, values)}, self.ttl_s)
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "cell_deg": self.cell_deg, "shared": self.shared is not None}
+
+_route_cache: Optional[RouteCache] = None
+
+def get_route_cache() -> RouteCache:
+    global _route_cache
+    if _route_cache is None:
+        s = get_settings()
+        _route_cache = RouteCache(s.route_cache_size, s.route_cache_ttl_s, s.route_cache_cell_deg, get_shared_cache())
+    return _route_cache
+
+_osrm_breaker: Optional[CircuitBreaker] = None
+
+def get_osrm_breaker() -> CircuitBreaker:
+    # Shared OSRM health: once it trips, route lookups skip the network
+    # entirely (tiles/haversine answer) until the cooldown lets a probe through.
+    global _osrm_breaker
+    if _osrm_breaker is None:
+        s = get_settings()
+        _osrm_breaker = CircuitBreaker(s.osrm_breaker_threshold, s.osrm_breaker_cooldown_s)
+    return _osrm_breaker
+
+def osrm_health() -> dict:
+    b = get_osrm_breaker()
+    return {"state": b.state, "consecutive_failures": b.failures}
+
+Cell = Tuple[Optional[float], Optional[float]]
+
+def _table_url(osrm_url: str, sources: List[Tuple[float,float]], dests: List[Tuple[float,float]]) -> str:
+    coords = ";".join(f"{lng},{lat}" for lat, lng in [*sources, *dests])
+    src_idx = ";".join(str(i) for i in range(len(sources)))
+    dest_idx = ";".join(str(i) for i in range(len(sources), len(sources)+len(dests)))
+    return (f"{osrm_url}/table/v1/driving/{coords}"
+            f"?sources={src_idx}&destinations={dest_idx}&annotations=distance,duration")
+
+def _parse_table(j: dict) -> List[List[Cell]]:
+    # Unreachable pairs come back as null cells -> (None, None).
+    rows = []
+    for drow, trow in zip(j["distances"], j["durations"]):
+        rows.append([(None, None) if d is None or t is None else (d/1000.0, t/60.0)
+                     for d, t in zip(drow, trow)])
+    return rows
+
+def _blocks(n_src: int, n_dst: int, chunk_size: int):
+    # Tile the matrix so each request carries at most chunk_size locations
+    # (OSRM's --max-table-size counts sources plus destinations).
+    src_step = max(1, min(n_src, chunk_size//2))
+    dst_step = max(1, chunk_size - src_step)
+    for s0 in range(0, n_src, src_step):
+        for d0 in range(0, n_dst, dst_step):
+            yield slice(s0, s0+src_step), slice(d0, d0+dst_step)
+
+def _empty_matrix(n_src: int, n_dst: int) -> List[List[Cell]]:
+    return [[(None, None)] * n_dst for _ in range(n_src)]
+
+def _fill(out: List[List[Cell]], si: slice, di: slice, rows: List[List[Cell]]) -> None:
+    for r, row in zip(range(si.start, si.stop), rows):
+        out[r][di] = row
+
+def try_osrm_matrix(osrm_url: str, sources: List[Tuple[float,float]], dests: List[Tuple[float,float]],
+                    chunk_size: int=100, fast_fail: bool=True) -> List[List[Cell]]:
+    # One /table request per block; a failed block stays (None, None).
+    # fast_fail=False ignores the breaker (offline tile builds).
+    breaker = get_osrm_breaker()
+    timeout = get_settings().osrm_timeout_s
+    out = _empty_matrix(len(sources), len(dests))
+    for si, di in _blocks(len(sources), len(dests), chunk_size):
+        if fast_fail and not breaker.allow():
+            continue
+        try:
+            r = requests.get(_table_url(osrm_url, sources[si], dests[di]), timeout=timeout)
+        except Exception:
+            breaker.record(False)
+            continue
+        breaker.record(r.status_code < 500)
+        try:
+            _fill(out, si, di, _parse_table(r.json()))
+        except Exception:
+            pass
+    return out
+
+async def try_osrm_matrix_async(osrm_url: str, sources: List[Tuple[float,float]], dests: List[Tuple[float,float]],
+                                chunk_size: int=100) -> List[List[Cell]]:
+    client = get_osrm_client()
+    breaker = get_osrm_breaker()
+    out = _empty_matrix(len(sources), len(dests))
+
+    async def one(si, di):
+        # Half-open, only one block (of all concurrent requests) probes OSRM
+        if not breaker.allow():
+            return
+        try:
+            r = await client.get(_table_url(osrm_url, sources[si], dests[di]))
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record(False)
+            return
+        breaker.record(r.status_code < 500)
+        try:
+            _fill(out, si, di, _parse_table(r.json()))
+        except Exception:
+            pass
+
+    await asyncio.gather(*(one(si, di) for si, di in _blocks(len(sources), len(dests), chunk_size)))
+    return out
+
+async def try_osrm_table_async(osrm_url: str, origin: Tuple[float,float], dests: List[Tuple[float,float]],
+                               chunk_size: int=100) -> List[Cell]:
+    return (await try_osrm_matrix_async(osrm_url, [origin], dests, chunk_size))[0]
+
+def _haversine_eta(origin: Tuple[float,float], dest: Tuple[float,float]):
+    dist_km = haversine_km(origin[0], origin[1], dest[0], dest[1])
+    base_speed_kmph = 45.0
+    return dist_km, (dist_km / base_speed_kmph) * 60.0
+
+def _fallback_raw(origin: Tuple[float,float], dests: List[Tuple[float,float]]):
+    # No OSRM answer: precomputed tiles first, then straight line at 45 km/h
+    out = []
+    for dest, hit in zip(dests, get_route_tiles().snapshot().lookup(origin, dests)):
+        src = "tile" if hit is not None else "haversine"
+        OSRM_FALLBACK_TOTAL.inc(source=src)
+        out.append((*(hit or _haversine_eta(origin, dest)), src))
+    return out
+
+def traffic_factor(dow:Optional[int]=2, hour:Optional[int]=10, rain_mm:float=0.0) -> float:
+    # dow/hour None: no time-of-week term (free-flow minutes, for app.dispatch)
     factor = 1.0
     if hour in range(8,11) or hour in range(17,21): factor += 0.15
     if rain_mm > 5: factor += 0.10
     if dow in [5,6]: factor += 0.05
-    return dist_km, minutes*factor, src
+    return factor
+
+def _cached_raw(cache: RouteCache, osrm_url: str, origin: Tuple[float,float], dests: List[Tuple[float,float]]):
+    raw: List[Tuple[Optional[float], Optional[float]]] = [hit or (None, None) for hit in cache.get_many(osrm_url, origin, dests)]
+    miss_idx = [i for i, (d, _) in enumerate(raw) if d is None]
+    return raw, miss_idx
+
+def _merge_fetched(cache: RouteCache, osrm_url, origin, dests, raw, miss_idx, fetched):
+    # Tile/haversine fallbacks are never cached so a brief OSRM outage does
+    # not pin estimates for the whole TTL.
+    routed = [(dests[i], (dist_km, minutes)) for i, (dist_km, minutes) in zip(miss_idx, fetched) if dist_km is not None]
+    if routed:
+        cache.set_many(osrm_url, origin, *zip(*routed))
+    for i, (dist_km, minutes) in zip(miss_idx, fetched):
+        raw[i] = (dist_km, minutes)
+
+def _apply_factor(origin, dests, raw, factor: float):
+    out = [(dist_km, minutes, "osrm") for dist_km, minutes in raw]
+    miss = [i for i, (dist_km, _) in enumerate(raw) if dist_km is None]
+    if miss:
+        for i, fb in zip(miss, _fallback_raw(origin, [dests[i] for i in miss])):
+            out[i] = fb
+    return [(dist_km, minutes*factor, src) for dist_km, minutes, src in out]
+
+async def route_distance_eta_many_async(osrm_url: str, origin: Tuple[float,float], dests: List[Tuple[float,float]],
+                                        dow:Optional[int]=2, hour:Optional[int]=10, rain_mm:float=0.0, chunk_size: int=100):
+    """One site to many vendors via OSRM /table; table chunks are fetched concurrently."""
+    cache = get_route_cache()
+    raw, miss_idx = _cached_raw(cache, osrm_url, origin, dests)
+    if miss_idx:
+        fetched = await try_osrm_table_async(osrm_url, origin, [dests[i] for i in miss_idx], chunk_size)
+        _merge_fetched(cache, osrm_url, origin, dests, raw, miss_idx, fetched)
+    return _apply_factor(origin, dests, raw, traffic_factor(dow, hour, rain_mm))
+
+async def route_matrix_async(osrm_url: str, origins: List[Tuple[float,float]], dests: List[Tuple[float,float]],
+                             dow:Optional[int]=2, hour:Optional[int]=10, rain_mm:float=0.0, chunk_size: int=100):
+    """Many sites x many vendors: rows of (dist_km, eta_min, src), one per origin.
+
+    Cached pairs are served locally; the rest is fetched as one sub-matrix of
+    (origins with a miss) x (vendors with a miss).
+    """
+    cache = get_route_cache()
+    raw = [[hit or (None, None) for hit in cache.get_many(osrm_url, o, dests)] for o in origins]
+    miss_o = [i for i, row in enumerate(raw) if any(c[0] is None for c in row)]
+    miss_d = sorted({j for i in miss_o for j, c in enumerate(raw[i]) if c[0] is None})
+    if miss_o:
+        fetched = await try_osrm_matrix_async(osrm_url, [origins[i] for i in miss_o],
+                                              [dests[j] for j in miss_d], chunk_size)
+        for i, row in zip(miss_o, fetched):
+            routed = []
+            for j, (dist_km, minutes) in zip(miss_d, row):
+                if raw[i][j][0] is None:
+                    if dist_km is not None:
+                        routed.append((dests[j], (dist_km, minutes)))
+                    raw[i][j] = (dist_km, minutes)
+            if routed:
+                cache.set_many(osrm_url, origins[i], *zip(*routed))
+    factor = traffic_factor(dow, hour, rain_mm)
+    return [_apply_factor(o, dests, row, factor) for o, row in zip(origins, raw)]
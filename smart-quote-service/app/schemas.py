@@ -1,5 +1,6 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from .config import get_settings
 
 class Item(BaseModel):
     sku: str
@@ -13,11 +14,34 @@ class Project(BaseModel):
     site_name: str
     site_lat: float
     site_lng: float
-    delivery_window_days: int = 14
+    delivery_window_days: int = Field(14, ge=1, le=get_settings().dispatch_max_window_days)
 
 class PrepareRequest(BaseModel):
     project: Project
     items: List[Item]
+    # Spatial prefilter: route only the K nearest vendors, optionally within a radius
+    prefilter_k: Optional[int] = None
+    prefilter_radius_km: Optional[float] = None
+    # Latency budget for the LLM summary; the computed summary is used once it runs out
+    llm_budget_s: Optional[float] = None
+    # Also return a plan that splits the items across up to split_max_vendors vendors
+    split_sourcing: bool = False
+    split_max_vendors: Optional[int] = None
+    # Ranking weights (price/eta/sla/rel); missing keys keep their defaults
+    weights: Optional[Dict[str, float]] = None
+    # Rank on simulated P90 landed cost and P(on time) instead of the fixed risk buffer
+    risk_mode: bool = False
+    risk_scenarios: Optional[int] = None
+    risk_seed: Optional[int] = None
+
+class RiskOut(BaseModel):
+    p50_landed_cost: float
+    p90_landed_cost: float
+    # Delivered within project.delivery_window_days
+    p_on_time: float
+    # Risk-adjusted ranking score (lower is better)
+    score: float
+    scenarios: int
 
 class CandidateOut(BaseModel):
     vendor_id: int
@@ -29,10 +53,88 @@ class CandidateOut(BaseModel):
     quality_score: float
     acceptance_prob: float
     distance_km: float
+    # Where distance/ETA came from: osrm, tile (precomputed) or haversine
+    route_source: Optional[str] = None
+    # Best dispatch slot in the delivery window (ISO 8601); eta_minutes is the trip from it
+    dispatch_at: Optional[str] = None
+    # Only with risk_mode
+    risk: Optional[RiskOut] = None
+
+class SplitAllocationOut(BaseModel):
+    vendor_id: int
+    vendor_name: str
+    # Positions in the request's items, and their SKUs
+    items: List[int]
+    skus: List[str]
+    landed_cost: float
+    breakdown: dict
+    eta_minutes: int
+    distance_km: float
+    route_source: Optional[str] = None
+    dispatch_at: Optional[str] = None
+
+class SplitPlanOut(BaseModel):
+    allocations: List[SplitAllocationOut]
+    landed_cost: float
+    eta_minutes: int
+    on_time_rate: float
+    acceptance_prob: float
+    # Same scale as the single-vendor ranking; lower is better
+    score: float
+    best_single_score: float
+    best_single_landed_cost: float
+
+class GeocodeOut(BaseModel):
+    lat: float
+    lng: float
+    confidence: float
+    matched: Optional[str] = None
+    kind: Optional[str] = None
+    source: str
 
 class PrepareResponse(BaseModel):
     summary: str
     candidates: List[CandidateOut]
+    split_plan: Optional[SplitPlanOut] = None
+    # Handle for /v1/smart-quote/quotes/{quote_id}/rerank
+    quote_id: Optional[str] = None
+    # How the site was located, for requests given only an address
+    site_geocode: Optional[GeocodeOut] = None
+    # Ranked on the simulated risk profile (risk_mode); candidates carry `risk`
+    risk_applied: bool = False
+
+class RerankRequest(BaseModel):
+    weights: Optional[Dict[str, float]] = None
+    max_eta_minutes: Optional[float] = None
+    min_quality_score: Optional[float] = None
+    # New quantity per item position in the original request
+    quantities: Dict[int, float] = {}
+    top_k: int = 5
+
+class RerankResponse(BaseModel):
+    quote_id: str
+    candidates: List[CandidateOut]
+    weights: Dict[str, float]
+    risk_applied: bool = False
+    filtered_out: int
+    compute_ms: float
+
+class BatchPrepareRequest(BaseModel):
+    requests: List[PrepareRequest]
+    # Per-entry flag: summarize[i] asks for an LLM summary of requests[i]
+    summarize: List[bool] = []
+
+class BatchPrepareResult(BaseModel):
+    index: int
+    summary: Optional[str] = None
+    candidates: List[CandidateOut] = []
+    split_plan: Optional[SplitPlanOut] = None
+    quote_id: Optional[str] = None
+    risk_applied: bool = False
+    error: Optional[str] = None
+
+class BatchPrepareResponse(BaseModel):
+    results: List[BatchPrepareResult]
 
 class SimplePrepareRequest(BaseModel):
     project_type: str
@@ -41,6 +143,7 @@ class SimplePrepareRequest(BaseModel):
     quantity: Optional[str] = None
     site_lat: Optional[float] = None
     site_lng: Optional[float] = None
+    llm_budget_s: Optional[float] = None
 
 class InvoiceRequest(BaseModel):
     project: Project
@@ -60,3 +163,6 @@ class InvoiceOut(BaseModel):
     payment_terms: str = "Net 15"
     notes: str
     file_path: str
+    # Set when the PDF is rendered in the background; poll /invoice/jobs/{job_id}
+    job_id: Optional[str] = None
+    html_path: Optional[str] = None
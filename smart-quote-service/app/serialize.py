@@ -0,0 +1,73 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+from .config import get_settings
+
+# Quote responses are built once as plain dicts of JSON-native values and
+# encoded straight to bytes, instead of models -> dicts -> response_model
+# validation -> jsonable_encoder -> json.dumps. Endpoints keep their
+# response_model for the OpenAPI schema; returning a Response skips
+# FastAPI's re-validation. VALIDATE_RESPONSES=1 checks every payload
+# against the model instead (tests, development).
+
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+try:
+    import msgpack
+except ImportError:  # optional; without it every client gets JSON
+    msgpack = None
+
+def encode_json(obj) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def _media_ranges(accept: str) -> List[Tuple[str, str, float]]:
+    # "type/subtype;q=0.5, ..." -> [(type, subtype, q)]; a bad q counts as 1
+    ranges = []
+    for part in accept.split(","):
+        media, *params = part.split(";")
+        kind, _, sub = media.strip().lower().partition("/")
+        if not kind or not sub:
+            continue
+        q = 1.0
+        for p in params:
+            name, _, value = p.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    pass
+        ranges.append((kind, sub, q))
+    return ranges
+
+def _quality(ranges: List[Tuple[str, str, float]], media: str) -> float:
+    # The q of the most specific range that matches media (RFC 9110 12.5.1)
+    kind, sub = media.split("/")
+    best, q = -1, 0.0
+    for rk, rs, rq in ranges:
+        rank = 2 if (rk, rs) == (kind, sub) else 1 if (rk, rs) == (kind, "*") else 0 if (rk, rs) == ("*", "*") else -1
+        if rank > best:
+            best, q = rank, rq
+    return q
+
+@lru_cache(maxsize=256)
+def _prefers_msgpack(accept: str) -> bool:
+    # JSON unless MessagePack is strictly preferred; ties (e.g. */*) stay JSON
+    ranges = _media_ranges(accept)
+    q = max(_quality(ranges, t) for t in _MSGPACK_TYPES)
+    return q > 0 and q > _quality(ranges, "application/json")
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and bool(accept) and _prefers_msgpack(accept)
+
+def render(request: Request, content, model: Optional[Type[BaseModel]]=None, status_code: int=200) -> Response:
+    """content as JSON, or MessagePack when the client's Accept header asks for it."""
+    if model is not None and get_settings().validate_responses:
+        model.model_validate(content)
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(request):
+        return Response(msgpack.packb(content, use_bin_type=True), status_code, headers, media_type=MSGPACK)
+    return Response(encode_json(content), status_code, headers, media_type="application/json")
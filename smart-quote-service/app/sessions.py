@@ -0,0 +1,161 @@
+import uuid
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from .cache import SharedCache, TTLCache, get_shared_cache
+from .config import get_settings
+from .costing import freight_cost, tax_gst
+from .dispatch import DispatchPlan
+from .risk import RiskProfile, simulate_risk
+from .pricing import PriceSnapshot, get_price_catalog
+from .ranking import DEFAULT_WEIGHTS, CandidateBatch, rank_batch
+
+@dataclass
+class QuoteSession:
+    """Everything /prepare computed before ranking, kept for what-if re-ranks.
+
+    Routing and pricing are not repeated: a re-rank re-scores this batch,
+    and a quantity change only reprices the changed lines (against the
+    price snapshot the quote was made with) and redoes the per-vendor sums.
+    """
+    quote_id: str
+    items: List[Dict]
+    site: Tuple[float, float]
+    batch: CandidateBatch
+    route_source: List[str]
+    rate_tkm: np.ndarray
+    unit_prices: np.ndarray     # vendors x lines
+    qty: np.ndarray
+    weight_ton: np.ndarray
+    prices: PriceSnapshot
+    gst_pct: float
+    weights: Optional[Dict[str, float]] = None
+    dispatch: Optional[DispatchPlan] = None
+    risk: Optional[RiskProfile] = None
+
+def merge_weights(weights: Optional[Dict[str, float]], base: Optional[Dict[str, float]]=None) -> Dict[str, float]:
+    """Partial weights over base (default DEFAULT_WEIGHTS); unknown keys are an error."""
+    base = base or DEFAULT_WEIGHTS
+    unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"unknown weight(s): {', '.join(sorted(unknown))}")
+    return {**base, **(weights or {})}
+
+def _with_quantities(s: QuoteSession, quantities: Dict[int, float]) -> CandidateBatch:
+    qty, weight = s.qty.copy(), s.weight_ton.copy()
+    for i, q in quantities.items():
+        if not 0 <= i < len(qty):
+            raise ValueError(f"item index {i} out of range")
+        if q < 0:
+            raise ValueError(f"item {i}: quantity must be >= 0")
+        # weight_ton is per line; keep the weight per unit
+        if qty[i] > 0:
+            weight[i] = weight[i] / qty[i] * q
+        qty[i] = q
+    changed = sorted(quantities)
+    unit = s.unit_prices.copy()
+    # Only the changed lines are repriced (quantity tiers may move)
+    unit[:, changed] = s.prices.line_prices([dict(s.items[i], qty=float(qty[i])) for i in changed],
+                                            s.batch.vendor_id, s.site)
+    material = unit @ qty
+    b = s.batch
+    return CandidateBatch(
+        b.vendor_id, b.vendor_name, distance_km=b.distance_km, eta_minutes=b.eta_minutes,
+        on_time_rate=b.on_time_rate, quality_score=b.quality_score, acceptance_prob=b.acceptance_prob,
+        price_volatility=b.price_volatility, material_cost=material, taxes=tax_gst(material, s.gst_pct),
+        handling=0.01 * material, freight_cost=freight_cost(b.distance_km, float(weight.sum()), base_rate_per_tkm=s.rate_tkm),
+    )
+
+def rerank(s: QuoteSession, weights: Optional[Dict[str, float]]=None, max_eta_minutes: Optional[float]=None,
+           min_quality_score: Optional[float]=None, quantities: Optional[Dict[int, float]]=None, top_k: int=5):
+    """(batch, rows best-first, scores, n_filtered_out, risk) for a what-if on a stored quote.
+
+    A risk-mode quote stays in risk mode; new quantities are re-simulated
+    with the quote's seed and scenario count.
+    """
+    batch = _with_quantities(s, quantities) if quantities else s.batch
+    risk = s.risk
+    if risk is not None and quantities:
+        risk = simulate_risk(batch, risk.window_h, s.dispatch.slot if s.dispatch is not None else 0.0,
+                             risk.scenarios, risk.seed, max_cells=risk.scenarios * len(batch))
+    keep = np.ones(len(batch), dtype=bool)
+    if max_eta_minutes is not None:
+        keep &= batch.eta_minutes <= max_eta_minutes
+    if min_quality_score is not None:
+        keep &= batch.quality_score >= min_quality_score
+    rows = np.flatnonzero(keep)
+    sub, sub_risk = batch, risk
+    if len(rows) != len(batch):
+        sub, sub_risk = batch.take(rows), risk and risk.take(rows)
+    order, scores = rank_batch(sub, merge_weights(weights, s.weights), top_k=top_k, risk=sub_risk)
+    return batch, rows[order], scores, int(len(batch) - len(rows)), risk
+
+def _session_doc(s: QuoteSession) -> dict:
+    # JSON for the shared cache; the price snapshot goes by version
+    arr = lambda a: np.asarray(a).tolist()
+    b = s.batch
+    return {
+        "quote_id": s.quote_id, "items": s.items, "site": list(s.site),
+        "batch": {"vendor_id": arr(b.vendor_id), "vendor_name": b.vendor_name,
+                  **{f: arr(v) for f, v in b.columns().items()}},
+        "route_source": s.route_source, "rate_tkm": arr(s.rate_tkm), "unit_prices": arr(s.unit_prices),
+        "qty": arr(s.qty), "weight_ton": arr(s.weight_ton), "prices": s.prices.version, "gst_pct": s.gst_pct,
+        "weights": s.weights,
+        "dispatch": s.dispatch and {"start": s.dispatch.start.isoformat(), "slot": arr(s.dispatch.slot),
+                                    "eta_minutes": arr(s.dispatch.eta_minutes)},
+        "risk": s.risk and {"p50": arr(s.risk.p50), "p90": arr(s.risk.p90), "p_on_time": arr(s.risk.p_on_time),
+                            "scenarios": s.risk.scenarios, "seed": s.risk.seed, "window_h": s.risk.window_h},
+    }
+
+def _session_from_doc(d: dict) -> QuoteSession:
+    a = np.asarray
+    b = dict(d["batch"])
+    dp, rp = d["dispatch"], d["risk"]
+    return QuoteSession(
+        quote_id=d["quote_id"], items=d["items"], site=tuple(d["site"]),
+        batch=CandidateBatch(a(b.pop("vendor_id")), b.pop("vendor_name"), **b),
+        route_source=d["route_source"], rate_tkm=a(d["rate_tkm"]), unit_prices=a(d["unit_prices"], dtype=float),
+        qty=a(d["qty"], dtype=float), weight_ton=a(d["weight_ton"], dtype=float),
+        prices=get_price_catalog().at(d["prices"]), gst_pct=d["gst_pct"], weights=d["weights"],
+        dispatch=dp and DispatchPlan(datetime.fromisoformat(dp["start"]), a(dp["slot"]), a(dp["eta_minutes"])),
+        risk=rp and RiskProfile(a(rp["p50"]), a(rp["p90"]), a(rp["p_on_time"]), rp["scenarios"], rp["seed"],
+                                rp["window_h"]),
+    )
+
+class QuoteSessionStore:
+    """Quote sessions by quote_id: a per-process LRU in front of the optional
+    SharedCache ("quote" namespace), so a re-rank can land on any worker."""
+
+    def __init__(self, maxsize: int, ttl_s: float, shared: Optional[SharedCache]=None):
+        self.ttl_s = ttl_s
+        self.shared = shared
+        self._cache = TTLCache(maxsize=maxsize, ttl_s=ttl_s)
+
+    def put(self, **fields) -> QuoteSession:
+        s = QuoteSession(quote_id=uuid.uuid4().hex, **fields)
+        self._cache.set(s.quote_id, s)
+        if self.shared is not None:
+            self.shared.set("quote", s.quote_id, _session_doc(s), self.ttl_s)
+        return s
+
+    def get(self, quote_id: str) -> Optional[QuoteSession]:
+        s = self._cache.get(quote_id)
+        if s is None and self.shared is not None:
+            doc = self.shared.get("quote", quote_id)
+            if doc is not None:
+                s = _session_from_doc(doc)
+                self._cache.set(quote_id, s)
+        return s
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "shared": self.shared is not None}
+
+_store: Optional[QuoteSessionStore] = None
+
+def get_quote_sessions() -> QuoteSessionStore:
+    global _store
+    if _store is None:
+        s = get_settings()
+        _store = QuoteSessionStore(s.quote_session_max, s.quote_session_ttl_s, get_shared_cache())
+    return _store
@@ -0,0 +1,96 @@
+import fcntl, os, shutil, threading, time, uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Generic, Optional, TypeVar
+
+# Versioned on-disk datasets (vendor registry, price catalog):
+#   <root>/CURRENT        name of the live version directory
+#   <root>/<version>/     the dataset's files
+# Publishing writes a new version directory and then swaps CURRENT with
+# os.replace, so readers in every worker see either the old or the new
+# data, never a half-written one.
+
+T = TypeVar("T")
+
+def publish_version(root: str, write: Callable[[str, str], None], keep: int=2) -> str:
+    """Write a new version via write(version_dir, version), point CURRENT at it, prune old ones.
+
+    Versions are ordered by when publishing started; CURRENT only moves forward.
+    """
+    os.makedirs(root, exist_ok=True)
+    # Fixed-width nanoseconds sort as strings in publish order; the random
+    # suffix keeps same-instant publishes (any process or thread) distinct
+    version = f"v{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    vdir = os.path.join(root, version)
+    os.makedirs(vdir)
+    write(vdir, version)
+    # Swap and prune under an exclusive lock on the root, so concurrent
+    # publishers cannot move CURRENT backwards or prune what another just made live
+    with open(os.path.join(root, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        live = current_version(root)
+        if live is None or version > live:
+            tmp = os.path.join(root, f"CURRENT.{version}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp, os.path.join(root, "CURRENT"))
+            live = version
+        # Old versions may still be mapped by running workers; on POSIX the
+        # mapping survives unlinking, so pruning is safe. Never the live one,
+        # nor anything newer than ours (another publisher may be writing it).
+        versions = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+        for old in versions[:-keep]:
+            if old < version and old != live:
+                shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+def current_version(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+class HotSnapshot(ABC, Generic[T]):
+    """Holds the live snapshot of a versioned dataset and hot-swaps it when CURRENT changes.
+
+    Workers poll the CURRENT pointer at most every check_s seconds and load
+    the new version on a background thread; the swap is a single reference
+    assignment, so in-flight requests keep the snapshot they started with.
+    Subclasses implement _load(), falling back to builtin data without a root.
+    """
+
+    label = "SNAPSHOT"
+
+    def __init__(self, root: Optional[str]=None, check_s: float=5.0):
+        self.root = root
+        self.check_s = check_s
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._reloading = False
+        self._snap: T = self._load()
+
+    @abstractmethod
+    def _load(self) -> T:
+        """The snapshot for the CURRENT version under root, or the builtin data."""
+
+    def snapshot(self) -> T:
+        if self.root and time.monotonic() - self._last_check >= self.check_s:
+            self._last_check = time.monotonic()
+            if not self._reloading and current_version(self.root) not in (None, self._snap.version):
+                self._reloading = True
+                threading.Thread(target=self._background_reload, daemon=True).start()
+        return self._snap
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"[{self.label}] reload failed:", e)
+        finally:
+            self._reloading = False
+
+    def reload(self) -> T:
+        with self._lock:
+            snap = self._load()
+            self._snap = snap
+        return snap
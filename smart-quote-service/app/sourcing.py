@@ -0,0 +1,141 @@
+import itertools, math
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+from .costing import freight_cost, tax_gst
+from .ranking import DEFAULT_WEIGHTS, CandidateBatch
+
+# Split sourcing: give each item line to one of up to max_vendors vendors so
+# that the plan's score is lowest. The score uses score_batch's weights and
+# the single-vendor candidates' min/max ranges, so a plan and a single-vendor
+# candidate are directly comparable (and one vendor is always a feasible plan).
+#
+# For a fixed vendor set U the landed cost is separable: material, GST,
+# handling, the 2% risk buffer and freight (linear in combined weight) are
+# all per line, so each line simply goes to its cheapest vendor in U. Only
+# the per-vendor terms couple the lines: the volatility buffer, ETA (the
+# last delivery), SLA and acceptance (every vendor must deliver). The search
+# is therefore over U: exhaustive over small sets of pruned vendors, greedy
+# once the enumeration would exceed COMBO_BUDGET cells.
+
+COMBO_BUDGET = 2_000_000
+HANDLING_PCT = 0.01
+RISK_PCT = 0.02
+
+@dataclass
+class SplitPlan:
+    rows: np.ndarray            # batch rows of the vendors used, largest landed cost first
+    assign: np.ndarray          # per item line, position in rows
+    material: np.ndarray
+    freight: np.ndarray
+    taxes: np.ndarray
+    handling: np.ndarray
+    landed: np.ndarray
+    eta_minutes: float
+    on_time_rate: float
+    acceptance_prob: float
+    score: float
+
+    @property
+    def landed_cost(self) -> float:
+        return float(self.landed.sum())
+
+class _Objective:
+    """Plan score for vendor sets given as (n_sets, k) arrays of batch rows."""
+
+    def __init__(self, batch: CandidateBatch, line_cost: np.ndarray, weights):
+        self.w = DEFAULT_WEIGHTS if weights is None else weights
+        self.line_cost = line_cost
+        self.fixed = 100.0 * batch.price_volatility
+        self.eta = batch.eta_minutes
+        self.on_time = batch.on_time_rate
+        self.accept = batch.acceptance_prob
+        # Same normalization as score_batch over the single-vendor candidates
+        self.terms = [(self.w[k], *_range(v)) for k, v in (
+            ("price", batch.landed_cost), ("eta", batch.eta_minutes),
+            ("sla", 1 - batch.on_time_rate), ("rel", 1 - batch.acceptance_prob))]
+
+    def combine(self, landed, eta, sla, rel) -> np.ndarray:
+        return sum(w*(x - lo)*scale for (w, lo, scale), x in zip(self.terms, (landed, eta, sla, rel)))
+
+    def __call__(self, sets: np.ndarray) -> np.ndarray:
+        landed = self.line_cost[sets].min(axis=1).sum(axis=1) + self.fixed[sets].sum(axis=1)
+        return self.combine(landed, self.eta[sets].max(axis=1),
+                            1 - self.on_time[sets].prod(axis=1), 1 - self.accept[sets].prod(axis=1))
+
+def _range(arr: np.ndarray):
+    lo, hi = float(arr.min()), float(arr.max())
+    return lo, (0.0 if hi - lo < 1e-9 else 1.0/(hi - lo))
+
+def _greedy(obj: _Objective, pool: np.ndarray, start: np.ndarray, best: float, max_vendors: int):
+    chosen = list(start)
+    while len(chosen) < max_vendors:
+        rest = np.setdiff1d(pool, chosen)
+        if not len(rest):
+            break
+        sets = np.column_stack([np.tile(chosen, (len(rest), 1)), rest])
+        scores = obj(sets)
+        j = int(np.argmin(scores))
+        if scores[j] >= best:
+            break
+        best = float(scores[j])
+        chosen.append(int(rest[j]))
+    return np.array(chosen), best
+
+def optimize_split(batch: CandidateBatch, line_material: np.ndarray, weight_ton: np.ndarray,
+                   rate_tkm: np.ndarray, gst_pct: float, weights=None,
+                   max_vendors: int=3, per_item: int=3) -> Optional[SplitPlan]:
+    """Best split of the item lines across the batch's vendors.
+
+    line_material is (vendors x lines) material cost per line (unit price x
+    qty) and weight_ton the weight per line. Vendors that are neither among
+    the per_item cheapest for some line nor among the per_item best single
+    vendors are pruned before the set search.
+    """
+    n_vendors, n_lines = line_material.shape
+    if n_vendors == 0 or n_lines == 0:
+        return None
+    weight_ton = np.asarray(weight_ton, dtype=np.float64)
+    per_ton = freight_cost(batch.distance_km, 1.0, base_rate_per_tkm=np.asarray(rate_tkm, dtype=np.float64))
+    line_cost = (line_material*(1 + gst_pct/100.0 + HANDLING_PCT + RISK_PCT)
+                 + per_ton[:, None]*weight_ton[None, :])
+    obj = _Objective(batch, line_cost, weights)
+
+    singles = obj(np.arange(n_vendors)[:, None])
+    best_set, best = np.array([int(np.argmin(singles))]), float(singles.min())
+    m = min(per_item, n_vendors)
+    cheapest = np.argpartition(line_cost, m - 1, axis=0)[:m].ravel()
+    pool = np.union1d(cheapest, np.argpartition(singles, m - 1)[:m])
+
+    for k in range(2, min(max_vendors, len(pool), n_lines) + 1):
+        n_sets = math.comb(len(pool), k)
+        if n_sets * k * n_lines > COMBO_BUDGET:
+            best_set, best = _greedy(obj, pool, best_set, best, max_vendors)
+            break
+        sets = pool[np.array(list(itertools.combinations(range(len(pool)), k)))]
+        scores = obj(sets)
+        j = int(np.argmin(scores))
+        if scores[j] < best:
+            best_set, best = sets[j], float(scores[j])
+    return _plan(batch, obj, line_material, line_cost, weight_ton, rate_tkm, gst_pct, best_set)
+
+def _plan(batch, obj, line_material, line_cost, weight_ton, rate_tkm, gst_pct, vendor_set) -> SplitPlan:
+    owner = vendor_set[np.argmin(line_cost[vendor_set], axis=0)]
+    rows = np.unique(owner)   # vendors that ended up with no line are dropped
+    material = np.array([line_material[r, owner == r].sum() for r in rows])
+    weight = np.array([weight_ton[owner == r].sum() for r in rows])
+    freight = np.array([freight_cost(float(batch.distance_km[r]), float(w), float(rate_tkm[r]))
+                        for r, w in zip(rows, weight)])
+    taxes = tax_gst(material, gst_pct)
+    handling = HANDLING_PCT * material
+    landed = material + freight + taxes + handling + (RISK_PCT*material + 100.0*batch.price_volatility[rows])
+    order = np.argsort(-landed, kind="stable")
+    rows, material, freight, taxes, handling, landed = (a[order] for a in (rows, material, freight, taxes, handling, landed))
+    on_time = float(batch.on_time_rate[rows].prod())
+    accept = float(batch.acceptance_prob[rows].prod())
+    eta = float(batch.eta_minutes[rows].max())
+    score = float(obj.combine(landed.sum(), eta, 1 - on_time, 1 - accept))
+    pos = {int(r): n for n, r in enumerate(rows)}
+    return SplitPlan(rows=rows, assign=np.array([pos[int(o)] for o in owner]),
+                     material=material, freight=freight, taxes=taxes, handling=handling, landed=landed,
+                     eta_minutes=eta, on_time_rate=on_time, acceptance_prob=accept, score=score)
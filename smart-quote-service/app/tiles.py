@@ -0,0 +1,150 @@
+import argparse, json, math, os
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from .config import get_settings
+from .geo import haversine_km
+from .snapshots import HotSnapshot, current_version, publish_version
+
+# Precomputed road distance/duration from a grid of origin cells to every
+# vendor, used when OSRM is down. A lookup routes from the centre of the
+# site's cell and adds a straight-line last leg from the site to that centre.
+LAST_MILE_DETOUR = 1.3
+LAST_MILE_KMPH = 30.0
+# Vendor coordinates are matched after rounding to ~1 m
+DEST_DECIMALS = 5
+
+ARRAYS = ("cell_lat", "cell_lng", "dest_lat", "dest_lng", "dist_km", "minutes")
+
+def _cell(lat: float, lng: float, cell_deg: float) -> Tuple[int, int]:
+    return math.floor(lat / cell_deg), math.floor(lng / cell_deg)
+
+def _dest_key(lat: float, lng: float) -> Tuple[float, float]:
+    return round(float(lat), DEST_DECIMALS), round(float(lng), DEST_DECIMALS)
+
+class TileSnapshot:
+    """One version of the travel-time tiles.
+
+    dist_km/minutes are (cells x vendors) float32 matrices, memory-mapped
+    when loaded from disk; NaN marks pairs OSRM could not route.
+    """
+
+    def __init__(self, version: str, cell_deg: float, arrays: Dict[str, np.ndarray]):
+        self.version = version
+        self.cell_deg = cell_deg
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self._row = {(int(a), int(b)): i for i, (a, b) in enumerate(zip(self.cell_lat, self.cell_lng))}
+        self._col = {_dest_key(a, b): j for j, (a, b) in enumerate(zip(self.dest_lat, self.dest_lng))}
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def lookup(self, origin: Tuple[float, float], dests: Sequence[Tuple[float, float]]) -> List[Optional[Tuple[float, float]]]:
+        """Raw (dist_km, minutes) per destination, None where the tiles have no answer."""
+        out: List[Optional[Tuple[float, float]]] = [None] * len(dests)
+        qlat, qlng = _cell(origin[0], origin[1], self.cell_deg)
+        row = self._row.get((qlat, qlng))
+        if row is None:
+            return out
+        centre = ((qlat + 0.5) * self.cell_deg, (qlng + 0.5) * self.cell_deg)
+        leg_km = haversine_km(origin[0], origin[1], centre[0], centre[1]) * LAST_MILE_DETOUR
+        leg_min = leg_km / LAST_MILE_KMPH * 60.0
+        for i, d in enumerate(dests):
+            j = self._col.get(_dest_key(*d))
+            if j is None:
+                continue
+            dist_km, minutes = float(self.dist_km[row, j]), float(self.minutes[row, j])
+            if not math.isnan(dist_km):
+                out[i] = (dist_km + leg_km, minutes + leg_min)
+        return out
+
+    @classmethod
+    def empty(cls) -> "TileSnapshot":
+        z = np.empty(0)
+        return cls("none", 1.0, {"cell_lat": z.astype(np.int32), "cell_lng": z.astype(np.int32),
+                                 "dest_lat": z, "dest_lng": z,
+                                 "dist_km": np.empty((0, 0), np.float32), "minutes": np.empty((0, 0), np.float32)})
+
+def grid_cells(lat0: float, lng0: float, lat1: float, lng1: float, cell_deg: float) -> List[Tuple[int, int]]:
+    a0, b0 = _cell(lat0, lng0, cell_deg)
+    a1, b1 = _cell(lat1, lng1, cell_deg)
+    return [(a, b) for a in range(a0, a1 + 1) for b in range(b0, b1 + 1)]
+
+def build_route_tiles(root: str, osrm_url: str, cells: List[Tuple[int, int]], cell_deg: float,
+                      dests: List[Tuple[float, float]], chunk_size: int=100, keep: int=2) -> str:
+    """Query OSRM /table from every cell centre to every destination and publish the result."""
+    from .routing import try_osrm_matrix
+    dist = np.full((len(cells), len(dests)), np.nan, dtype=np.float32)
+    mins = np.full((len(cells), len(dests)), np.nan, dtype=np.float32)
+    centres = [((a + 0.5) * cell_deg, (b + 0.5) * cell_deg) for a, b in cells]
+    step = max(1, chunk_size // 2)
+    for s0 in range(0, len(cells), step):
+        rows = try_osrm_matrix(osrm_url, centres[s0:s0+step], dests, chunk_size, fast_fail=False)
+        for r, row in enumerate(rows, start=s0):
+            for j, (d, t) in enumerate(row):
+                if d is not None:
+                    dist[r, j], mins[r, j] = d, t
+
+    def write(vdir: str, version: str):
+        arrays = {
+            "cell_lat": np.array([a for a, _ in cells], dtype=np.int32),
+            "cell_lng": np.array([b for _, b in cells], dtype=np.int32),
+            "dest_lat": np.array([d[0] for d in dests], dtype=np.float64),
+            "dest_lng": np.array([d[1] for d in dests], dtype=np.float64),
+            "dist_km": dist, "minutes": mins,
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(vdir, f"{name}.npy"), arr)
+        with open(os.path.join(vdir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "cell_deg": cell_deg, "cells": len(cells), "dests": len(dests),
+                       "routed": int(np.count_nonzero(~np.isnan(dist)))}, f)
+    return publish_version(root, write, keep)
+
+def load_route_tiles(root: str, version: Optional[str]=None) -> TileSnapshot:
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"no route tiles published under {root}")
+    vdir = os.path.join(root, version)
+    with open(os.path.join(vdir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    arrays = {a: np.load(os.path.join(vdir, f"{a}.npy"), mmap_mode="r") for a in ARRAYS}
+    return TileSnapshot(version, manifest["cell_deg"], arrays)
+
+class RouteTiles(HotSnapshot[TileSnapshot]):
+    """Holds the live TileSnapshot and hot-swaps it when CURRENT changes."""
+
+    label = "TILES"
+
+    def _load(self) -> TileSnapshot:
+        if self.root and current_version(self.root):
+            return load_route_tiles(self.root)
+        return TileSnapshot.empty()
+
+    def stats(self) -> dict:
+        s = self._snap
+        return {"version": s.version, "cells": len(s), "dests": len(s.dest_lat),
+                "cell_deg": s.cell_deg, "root": self.root}
+
+_tiles: Optional[RouteTiles] = None
+
+def get_route_tiles() -> RouteTiles:
+    global _tiles
+    if _tiles is None:
+        s = get_settings()
+        _tiles = RouteTiles(s.route_tiles_path, s.route_tiles_check_s)
+    return _tiles
+
+if __name__ == "__main__":
+    # python -m app.tiles <tiles_dir> --bbox 17.5,72.5,19.5,74.5 --cell-deg 0.1
+    from .vendors import get_vendor_registry
+    ap = argparse.ArgumentParser(description="Precompute travel-time tiles to every vendor via OSRM /table.")
+    ap.add_argument("root")
+    ap.add_argument("--bbox", required=True, help="lat0,lng0,lat1,lng1 covering the delivery sites")
+    ap.add_argument("--cell-deg", type=float, default=0.1)
+    ap.add_argument("--osrm-url", default=get_settings().osrm_url)
+    args = ap.parse_args()
+    lat0, lng0, lat1, lng1 = (float(x) for x in args.bbox.split(","))
+    snap = get_vendor_registry().snapshot()
+    cells = grid_cells(lat0, lng0, lat1, lng1, args.cell_deg)
+    dests = list(zip(snap.lat.tolist(), snap.lng.tolist()))
+    print(build_route_tiles(args.root, args.osrm_url, cells, args.cell_deg, dests, get_settings().osrm_table_chunk))
@@ -0,0 +1,224 @@
+import heapq, json, math, os, sys
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from .config import get_settings
+from .snapshots import HotSnapshot, current_version, publish_version
+
+EARTH_R_KM = 6371.0
+
+# Built-in demo catalog, used when no VENDOR_REGISTRY_PATH is configured
+VENDORS = [
+    {"id": 1, "name": "Mumbai Steel & Cement Co", "lat": 19.0760, "lng": 72.8777, "on_time_rate": 0.92, "quality_score": 0.88, "accept_prob": 0.65, "rate_tkm": 3.9, "price_volatility": 0.03},
+    {"id": 2, "name": "Chennai BuildSupplies",   "lat": 13.0827, "lng": 80.2707, "on_time_rate": 0.89, "quality_score": 0.86, "accept_prob": 0.60, "rate_tkm": 3.7, "price_volatility": 0.035},
+    {"id": 3, "name": "Delhi InfraMart",          "lat": 28.7041, "lng": 77.1025, "on_time_rate": 0.94, "quality_score": 0.90, "accept_prob": 0.70, "rate_tkm": 4.0, "price_volatility": 0.028},
+    {"id": 4, "name": "Ahmedabad Materials",      "lat": 23.0225, "lng": 72.5714, "on_time_rate": 0.91, "quality_score": 0.87, "accept_prob": 0.62, "rate_tkm": 3.6, "price_volatility": 0.032},
+    {"id": 5, "name": "Bengaluru Supply Hub",     "lat": 12.9716, "lng": 77.5946, "on_time_rate": 0.90, "quality_score": 0.89, "accept_prob": 0.68, "rate_tkm": 3.8, "price_volatility": 0.031},
+]
+
+def _to_xyz(lat: float, lng: float) -> Tuple[float, float, float]:
+    p, l = math.radians(lat), math.radians(lng)
+    return (math.cos(p)*math.cos(l), math.cos(p)*math.sin(l), math.sin(p))
+
+def _chord_to_km(chord: float) -> float:
+    return 2*EARTH_R_KM*math.asin(min(1.0, chord/2))
+
+def _km_to_chord(km: float) -> float:
+    return 2*math.sin(min(math.pi, km/EARTH_R_KM)/2)
+
+class VendorIndex:
+    """3-D k-d tree over vendor coordinates on the unit sphere.
+
+    Chord length is monotonic in great-circle distance, so nearest neighbours
+    in Euclidean xyz space are the nearest vendors by haversine distance.
+    """
+
+    def __init__(self, lat: Sequence[float], lng: Sequence[float]):
+        p, l = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lng, dtype=float))
+        xyz = np.column_stack([np.cos(p)*np.cos(l), np.cos(p)*np.sin(l), np.sin(p)])
+        self._root = self._build(xyz, np.arange(len(xyz)), 0)
+        # Queries walk plain Python lists; that beats NumPy scalar indexing.
+        self._pts = xyz.tolist()
+
+    LEAF_SIZE = 16
+
+    def _build(self, xyz: np.ndarray, idx: np.ndarray, depth: int):
+        # Inner nodes are (split_value, axis, left, right); leaves are a list
+        # of point indices that are scanned directly.
+        if len(idx) <= self.LEAF_SIZE:
+            return idx.tolist()
+        axis = depth % 3
+        mid = len(idx)//2
+        idx = idx[np.argpartition(xyz[idx, axis], mid)]
+        return (float(xyz[idx[mid], axis]), axis, self._build(xyz, idx[:mid], depth+1), self._build(xyz, idx[mid:], depth+1))
+
+    def __len__(self) -> int:
+        return len(self._pts)
+
+    def nearest(self, lat: float, lng: float, k: int) -> List[Tuple[int, float]]:
+        """The k nearest vendors as (row, great-circle km), closest first."""
+        if k <= 0 or not self._pts:
+            return []
+        q = _to_xyz(lat, lng)
+        pts = self._pts
+        qx, qy, qz = q
+        heap: List[Tuple[float, int]] = []  # max-heap of (-d2, i)
+        # Stack entries carry the squared distance to the splitting plane so
+        # far branches can be dropped once the k-th best is closer than that.
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, plane_d2 = stack.pop()
+            if len(heap) == k and plane_d2 >= -heap[0][0]:
+                continue
+            if isinstance(node, list):
+                for i in node:
+                    x, y, z = pts[i]
+                    d2 = (x-qx)**2 + (y-qy)**2 + (z-qz)**2
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d2, i))
+                    elif d2 < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d2, i))
+                continue
+            split, axis, left, right = node
+            diff = q[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, max(plane_d2, diff*diff)))
+            stack.append((near, plane_d2))
+        out = sorted((-nd2, i) for nd2, i in heap)
+        return [(i, _chord_to_km(math.sqrt(d2))) for d2, i in out]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+        """All vendors within radius_km as (row, great-circle km), closest first."""
+        if radius_km < 0 or not self._pts:
+            return []
+        q = _to_xyz(lat, lng)
+        r2 = _km_to_chord(radius_km)**2
+        pts = self._pts
+        qx, qy, qz = q
+        hits = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                for i in node:
+                    x, y, z = pts[i]
+                    d2 = (x-qx)**2 + (y-qy)**2 + (z-qz)**2
+                    if d2 <= r2:
+                        hits.append((d2, i))
+                continue
+            split, axis, left, right = node
+            diff = q[axis] - split
+            if diff < 0 or diff*diff <= r2:
+                stack.append(left)
+            if diff >= 0 or diff*diff <= r2:
+                stack.append(right)
+        hits.sort()
+        return [(i, _chord_to_km(math.sqrt(d2))) for d2, i in hits]
+
+    def shortlist(self, lat: float, lng: float, k: Optional[int]=None,
+                  radius_km: Optional[float]=None) -> np.ndarray:
+        """Rows worth routing: the k nearest, optionally capped to radius_km.
+
+        Returned in registry order so ranking ties break the same way as an
+        unfiltered scan.
+        """
+        if radius_km is not None:
+            found = self.within(lat, lng, radius_km)
+            if k is not None:
+                found = found[:k]
+        elif k is not None:
+            found = self.nearest(lat, lng, k)
+        else:
+            return np.arange(len(self._pts))
+        return np.sort(np.fromiter((i for i, _ in found), dtype=np.intp, count=len(found)))
+
+FLOAT_COLUMNS = ("lat", "lng", "on_time_rate", "quality_score", "accept_prob", "rate_tkm", "price_volatility")
+
+class VendorSnapshot:
+    """Immutable columnar view of the vendor catalog plus its spatial index.
+
+    Columns are NumPy arrays (memory-mapped when loaded from disk), so
+    callers select shortlisted rows with fancy indexing instead of dicts.
+    """
+
+    def __init__(self, version: str, columns: Dict[str, np.ndarray]):
+        self.version = version
+        self.id = columns["id"]
+        self.name = columns["name"]
+        for c in FLOAT_COLUMNS:
+            setattr(self, c, columns[c])
+        self.index = VendorIndex(self.lat, self.lng)
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def row(self, i: int) -> Dict:
+        out = {"id": int(self.id[i]), "name": str(self.name[i])}
+        for c in FLOAT_COLUMNS:
+            out[c] = float(getattr(self, c)[i])
+        return out
+
+    @classmethod
+    def from_records(cls, vendors: List[Dict], version: str="builtin") -> "VendorSnapshot":
+        return cls(version, _columns_from_records(vendors))
+
+def _columns_from_records(vendors: List[Dict]) -> Dict[str, np.ndarray]:
+    cols = {
+        "id": np.array([v["id"] for v in vendors], dtype=np.int64),
+        "name": np.array([v["name"] for v in vendors], dtype=str),
+    }
+    for c in FLOAT_COLUMNS:
+        cols[c] = np.array([v[c] for v in vendors], dtype=np.float64)
+    return cols
+
+# On-disk layout: one .npy file per column, memory-mapped on load, in a
+# version directory published via app.snapshots:
+#   <root>/<version>/     manifest.json + id.npy, name.npy, lat.npy, ...
+
+def write_vendor_registry(root: str, vendors: List[Dict], keep: int=2) -> str:
+    def write(vdir: str, version: str):
+        cols = _columns_from_records(vendors)
+        for name, arr in cols.items():
+            np.save(os.path.join(vdir, f"{name}.npy"), arr)
+        with open(os.path.join(vdir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "count": len(vendors), "columns": list(cols)}, f)
+    return publish_version(root, write, keep)
+
+def load_vendor_registry(root: str, version: Optional[str]=None) -> VendorSnapshot:
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"no vendor registry published under {root}")
+    vdir = os.path.join(root, version)
+    with open(os.path.join(vdir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    cols = {c: np.load(os.path.join(vdir, f"{c}.npy"), mmap_mode="r") for c in manifest["columns"]}
+    return VendorSnapshot(version, cols)
+
+class VendorRegistry(HotSnapshot[VendorSnapshot]):
+    """Holds the live VendorSnapshot and hot-swaps it when CURRENT changes."""
+
+    label = "VENDORS"
+
+    def _load(self) -> VendorSnapshot:
+        if self.root and current_version(self.root):
+            return load_vendor_registry(self.root)
+        return VendorSnapshot.from_records(VENDORS)
+
+    def stats(self) -> dict:
+        return {"version": self._snap.version, "count": len(self._snap), "root": self.root}
+
+_registry: Optional[VendorRegistry] = None
+
+def get_vendor_registry() -> VendorRegistry:
+    global _registry
+    if _registry is None:
+        s = get_settings()
+        _registry = VendorRegistry(s.vendor_registry_path, s.vendor_reload_check_s)
+    return _registry
+
+if __name__ == "__main__":
+    # python -m app.vendors <vendors.json> <registry_dir>
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.vendors <vendors.json> <registry_dir>")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        records = json.load(f)
+    print(write_vendor_registry(sys.argv[2], records))
@@ -0,0 +1,127 @@
+"""End-to-end load driver against the real app with stubbed OSRM and LLM providers.
+
+    python -m bench.load --vendors 2000 --requests 500 --concurrency 32 \
+        --osrm-latency-ms 20 --llm-latency-ms 300 --llm-fail-rate 0.1 --out load.json
+
+Stubs, the synthetic vendor registry and the app all run in this process
+on localhost, so numbers reflect the service and not the network.
+"""
+import argparse, asyncio, os, random, tempfile, time
+import httpx
+from . import report
+from .stubs import Fault, build_app, serve_in_thread
+from .synthetic import synthetic_items, synthetic_vendors
+
+ENDPOINTS = {
+    "prepare": "/v1/smart-quote/prepare",
+    "prepare-ai": "/v1/smart-quote/prepare-ai",
+    "prepare-simple": "/v1/smart-quote/prepare-simple",
+}
+
+def _configure_env(args, stub_url: str, workdir: str) -> None:
+    # Settings reads its defaults at import time, so env goes first and no
+    # app.* module may be imported before this runs
+    os.environ.update({
+        "OSRM_URL": stub_url,
+        "GROQ_URL": stub_url + "/openai/v1/chat/completions",
+        "GEMINI_BASE_URL": stub_url + "/v1",
+        "GROQ_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "VENDOR_REGISTRY_PATH": os.path.join(workdir, "vendors"),
+        "LLM_CACHE_ENABLED": "1" if args.llm_cache else "0",
+        "LLM_CACHE_DIR": os.path.join(workdir, "llm-cache"),
+        "INVOICE_DIR": os.path.join(workdir, "invoices"),
+        **({} if args.route_cache else {"ROUTE_CACHE_SIZE": "1", "ROUTE_CACHE_TTL_S": "0"}),
+    })
+    from app.vendors import write_vendor_registry
+    write_vendor_registry(os.environ["VENDOR_REGISTRY_PATH"], synthetic_vendors(args.vendors, args.seed))
+
+def _payload(rng: random.Random, endpoint: str, sites: int) -> dict:
+    # A small pool of sites so the route cache sees realistic repeats
+    i = rng.randrange(sites)
+    lat, lng = 12.0 + (i*0.37) % 16, 72.0 + (i*0.53) % 14
+    if endpoint != "prepare":
+        return {"project_type": "residential", "address": f"Site {i}", "materials": ["cement", "steel", "sand"],
+                "quantity": "200 bags", "site_lat": lat, "site_lng": lng}
+    return {"project": {"brief": "bench", "site_name": f"Site {i}", "site_lat": lat, "site_lng": lng},
+            "items": synthetic_items(3)}
+
+async def _drive(base_url: str, args) -> dict:
+    rng = random.Random(args.seed)
+    path = ENDPOINTS[args.endpoint]
+    bodies = [_payload(rng, args.endpoint, args.sites) for _ in range(args.requests)]
+    lat, statuses = [], {}
+    queue = asyncio.Queue()
+    for b in bodies:
+        queue.put_nowait(b)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout_s,
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        for b in bodies[:min(len(bodies), args.warmup)]:
+            await client.post(path, json=b)
+
+        async def worker():
+            while not queue.empty():
+                body = queue.get_nowait()
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post(path, json=body)
+                    key = str(r.status_code)
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                lat.append((time.perf_counter() - t0)*1000.0)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - t0
+        metrics = (await client.get("/metrics")).text
+    ok = statuses.get("200", 0)
+    return {
+        "requests": len(lat), "ok": ok, "errors": len(lat) - ok, "statuses": statuses,
+        "wall_s": wall, "throughput_rps": len(lat)/wall if wall else None,
+        "latency_ms": report.percentiles(lat),
+        "fallbacks": [l for l in metrics.splitlines() if l.startswith(("smartquote_osrm_fallback_total", "smartquote_llm_fallback_total"))],
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="prepare")
+    ap.add_argument("--vendors", type=int, default=1000)
+    ap.add_argument("--sites", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--timeout-s", type=float, default=60.0)
+    ap.add_argument("--osrm-latency-ms", type=float, default=10.0)
+    ap.add_argument("--osrm-jitter-ms", type=float, default=5.0)
+    ap.add_argument("--osrm-fail-rate", type=float, default=0.0)
+    ap.add_argument("--llm-latency-ms", type=float, default=200.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    ap.add_argument("--llm-fail-rate", type=float, default=0.0)
+    ap.add_argument("--no-route-cache", dest="route_cache", action="store_false")
+    ap.add_argument("--llm-cache", action="store_true", help="keep the summary cache on (off by default so every request hits the stub)")
+    ap.add_argument("--stub-port", type=int, default=18081)
+    ap.add_argument("--app-port", type=int, default=18082)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    random.seed(args.seed)
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stubs = build_app(Fault(args.osrm_latency_ms, args.osrm_jitter_ms, args.osrm_fail_rate),
+                      Fault(args.llm_latency_ms, args.llm_jitter_ms, args.llm_fail_rate))
+    with tempfile.TemporaryDirectory() as workdir:
+        with report.app_logs_to_stderr():
+            _configure_env(args, stub_url, workdir)
+            serve_in_thread(stubs, args.stub_port)
+            from main import app
+            server = serve_in_thread(app, args.app_port)
+            try:
+                result = asyncio.run(_drive(f"http://127.0.0.1:{args.app_port}", args))
+            finally:
+                server.should_exit = True
+        result["stub_calls"] = dict(stubs.state.calls)
+        report.write(report.envelope("load", vars(args), result), args.out)
+
+if __name__ == "__main__":
+    main()
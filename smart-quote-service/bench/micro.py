@@ -0,0 +1,130 @@
+"""Microbenchmarks for the quote hot paths.
+
+    python -m bench.micro --sizes 10,100,1000,10000,100000 --out micro.json
+    python -m bench.micro --compare micro.json
+
+Each case reports the best-of-`repeat` time per call, so runs are
+comparable across machines of the same class.
+"""
+import argparse, os, tempfile, time
+import numpy as np
+from app.dispatch import next_slot, plan_dispatch
+from app.geocode import Gazetteer, tokenize
+from app.costing import freight_cost, material_cost, material_lines, tax_gst
+from app.pricing import DEMO_PRICES
+from app.normalize import normalize_materials
+from app.invoice import build_invoice_html, render_invoice
+from app.ranking import Candidate, CandidateBatch, rank_batch, rank_candidates
+from app.risk import MIN_SCENARIOS, simulate_risk
+from app.routing import haversine_km, haversine_km_np
+from app.sourcing import optimize_split
+from . import report
+from .synthetic import synthetic_items, synthetic_places, synthetic_vendors
+
+SITE = (18.5204, 73.8567)
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _candidates(vendors, dists, m_cost):
+    return [Candidate(
+        vendor_id=v["id"], vendor_name=v["name"], distance_km=d,
+        on_time_rate=v["on_time_rate"], quality_score=v["quality_score"], acceptance_prob=v["accept_prob"],
+        material_cost=m_cost, freight_cost=freight_cost(d, 26.0, v["rate_tkm"]), taxes=tax_gst(m_cost, 18.0),
+        handling=0.01*m_cost, eta_minutes=d/45.0*60.0, price_volatility=v["price_volatility"],
+    ) for v, d in zip(vendors, dists)]
+
+def run_size(n: int, repeat: int):
+    vendors = synthetic_vendors(n)
+    lat = np.array([v["lat"] for v in vendors]); lng = np.array([v["lng"] for v in vendors])
+    rate = np.array([v["rate_tkm"] for v in vendors])
+    ids = np.array([v["id"] for v in vendors])
+    dists = [haversine_km(SITE[0], SITE[1], v["lat"], v["lng"]) for v in vendors]
+    items = synthetic_items(3)
+    m_cost = material_cost(items)
+    cands = _candidates(vendors, dists, m_cost)
+    batch = CandidateBatch.from_candidates(cands)
+    split_items = synthetic_items(10)
+    lines = material_lines(split_items, ids, SITE)
+    split_weight = [it["weight_ton"] for it in split_items]
+    gazetteer = Gazetteer(synthetic_places(n))
+    addresses = [f"Plot {i}, {p.name}, {p.district} {400000 + i}" for i, p in enumerate(gazetteer.places[:100:2])]
+    address_tokens = [tokenize(a) for a in addresses]
+    free_flow = np.asarray(dists) / 45.0 * 60.0
+    start = next_slot()
+    cases = {
+        "haversine_km": lambda: [haversine_km(SITE[0], SITE[1], a, b) for a, b in zip(lat.tolist(), lng.tolist())],
+        "haversine_km_np": lambda: haversine_km_np(SITE[0], SITE[1], lat, lng),
+        "freight_cost": lambda: [freight_cost(d, 26.0, r) for d, r in zip(dists, rate.tolist())],
+        "freight_cost_np": lambda: freight_cost(np.asarray(dists), 26.0, rate),
+        "material_cost_by_vendor": lambda: material_cost(items, vendor_ids=ids, site=SITE),
+        "rank_candidates": lambda: rank_candidates(cands),
+        "rank_batch_top5": lambda: rank_batch(batch, top_k=5),
+        "optimize_split_10_lines": lambda: optimize_split(batch, lines, split_weight, rate, 18.0),
+        # Best of the 336 hourly dispatch slots in a 14-day window, per vendor
+        "plan_dispatch_14d": lambda: plan_dispatch(free_flow, 14, start),
+        # Per 50 addresses; "cached" goes through the resolved-address LRU
+        "geocode_50_addresses": lambda: [gazetteer._resolve(t) for t in address_tokens],
+        "geocode_50_addresses_cached": lambda: [gazetteer.resolve(a) for a in addresses],
+    }
+    if n * MIN_SCENARIOS <= 200_000:
+        # 2000 scenarios per vendor within the default 200k-cell budget (fewer above 100 vendors;
+        # over 1000 the request is refused)
+        cases["simulate_risk"] = lambda: simulate_risk(batch, 336, 0.0, 2000, 0, max_cells=200_000)
+    out = []
+    for name, fn in cases.items():
+        t = timed(fn, repeat)
+        out.append({"case": f"{name}[n={n}]", "n": n, "seconds": t, "ns_per_item": t/n*1e9})
+    return out
+
+def run_fixed(repeat: int):
+    out = []
+    for n_items in (3, 30, 300):
+        items = synthetic_items(n_items)
+        for name, fn in (("material_cost_dict", lambda: material_cost(items, lambda s: DEMO_PRICES.get(s, 1000.0))),
+                         ("material_cost_catalog", lambda: material_cost(items))):
+            t = timed(fn, repeat)
+            out.append({"case": f"{name}[items={n_items}]", "n": n_items, "seconds": t, "ns_per_item": t/n_items*1e9})
+    words = ["Cement", "Steel TMT", "river sand", "Aggregates", "fly ash bricks", "RMC", "granite tiles"]
+    for n_materials in (5, 50, 500):
+        materials = tuple(f"{words[i % len(words)]} {i}" for i in range(n_materials))
+        # __wrapped__ skips the memo, so this is the cost of a first-seen request
+        t = timed(lambda: normalize_materials.__wrapped__(materials, "1,200 sq ft"), repeat)
+        out.append({"case": f"normalize_materials[materials={n_materials}]", "n": n_materials,
+                    "seconds": t, "ns_per_item": t/n_materials*1e9})
+    inv = {
+        "invoice_no": "BENCH-1", "bill_to": "Bench", "ship_to": "Pune",
+        "items": [{"sku": "cement", "desc": "Cement", "qty": 10, "unit_price": 360.0, "line_total": 3600.0}]*20,
+        "freight": 1000.0, "taxes": 900.0, "grand_total": 9000.0,
+        "estimated_delivery_date": "2026-01-01", "payment_terms": "Net 15", "notes": "",
+    }
+    out.append({"case": "build_invoice_html", "n": 1, "seconds": timed(lambda: build_invoice_html(inv), repeat)})
+    with tempfile.TemporaryDirectory() as d:
+        pdf, html = os.path.join(d, "i.pdf"), os.path.join(d, "i.html")
+        render_invoice(inv, pdf, html)  # first call pays WeasyPrint's import
+        out.append({"case": "render_invoice", "n": 1, "seconds": timed(lambda: render_invoice(inv, pdf, html), max(1, repeat//5)),
+                    "pdf": os.path.exists(pdf)})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,100,1000,10000,100000")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out")
+    ap.add_argument("--compare", help="previous micro JSON to diff against")
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    with report.app_logs_to_stderr():
+        results = [r for n in sizes for r in run_size(n, args.repeat)] + run_fixed(args.repeat)
+    doc = report.envelope("micro", vars(args), results)
+    report.write(doc, args.out)
+    if args.compare:
+        report.compare(args.compare, doc, "seconds")
+
+if __name__ == "__main__":
+    main()
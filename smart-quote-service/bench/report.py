@@ -0,0 +1,44 @@
+import contextlib, json, platform, sys, time
+from typing import Dict, List, Optional
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    xs = sorted(samples)
+    pick = lambda q: xs[min(len(xs)-1, int(q*len(xs)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": sum(xs)/len(xs)}
+
+def envelope(kind: str, params: dict, results) -> dict:
+    return {
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+def app_logs_to_stderr():
+    # The app prints [STARTUP]/[AI SUMMARY] lines; keep stdout for the report
+    return contextlib.redirect_stdout(sys.stderr)
+
+def write(doc: dict, path: Optional[str]) -> None:
+    """The report to path, or to stdout (as the only thing there) without one."""
+    text = json.dumps(doc, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"wrote {path}", file=sys.stderr)
+    else:
+        print(text)
+
+def compare(baseline_path: str, doc: dict, metric: str) -> None:
+    """Print per-case change of `metric` against a previous run's JSON."""
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {r["case"]: r for r in json.load(f)["results"]}
+    for r in doc["results"]:
+        b = base.get(r["case"])
+        if not b or not b.get(metric) or r.get(metric) is None:
+            continue
+        delta = (r[metric] - b[metric]) / b[metric] * 100
+        print(f"{r['case']:<40} {b[metric]:>12.4g} -> {r[metric]:>12.4g}  ({delta:+.1f}%)", file=sys.stderr)
@@ -0,0 +1,95 @@
+"""Per-response CPU of encoding quote responses: the old model path vs app.serialize.
+
+    python -m bench.serialize --out serialize.json
+
+"legacy" is what prepare did before responses were built once: CandidateOut
+models, .dict() copies for the LLM payload, response_model validation and
+model_dump, then json.dumps as in JSONResponse. "orjson" and "msgpack" build
+the plain dicts once and encode them directly.
+"""
+import argparse, json, time
+from app.api import _candidate_out
+from app.ranking import Candidate
+from app.schemas import BatchPrepareResponse, CandidateOut, PrepareResponse
+from app.serialize import encode_json, msgpack
+from . import report
+from .micro import timed
+from .synthetic import synthetic_vendors
+
+def _candidates(n: int):
+    return [Candidate(
+        vendor_id=v["id"], vendor_name=v["name"], distance_km=12.5 + i, on_time_rate=v["on_time_rate"],
+        quality_score=v["quality_score"], acceptance_prob=v["accept_prob"], material_cost=71234.5,
+        freight_cost=1803.2 + i, taxes=12822.2, handling=712.3, eta_minutes=45.0 + i,
+        price_volatility=v["price_volatility"],
+    ) for i, v in enumerate(synthetic_vendors(n))]
+
+def _legacy_out(c: Candidate) -> CandidateOut:
+    return CandidateOut(**_candidate_out(c, "osrm"))
+
+def legacy_prepare(cands, model=PrepareResponse) -> bytes:
+    top = [_legacy_out(c) for c in cands]
+    candidates_json = {"currency": "INR", "gst_pct": 18.0, "candidates": [t.dict() for t in top]}
+    payload = {"summary": "", "candidates": top, "split_plan": None, "quote_id": "q" * 22}
+    body = model.model_validate(payload).model_dump(mode="json")
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(), candidates_json
+
+def fast_payload(cands):
+    top = [_candidate_out(c, "osrm") for c in cands]
+    candidates_json = {"currency": "INR", "gst_pct": 18.0, "candidates": top}
+    return {"summary": "", "candidates": top, "split_plan": None, "quote_id": "q" * 22}, candidates_json
+
+def legacy_batch(entries) -> bytes:
+    results = []
+    for n, cands in enumerate(entries):
+        top = [_legacy_out(c) for c in cands]
+        results.append({"index": n, "summary": None, "candidates": top, "split_plan": None,
+                        "quote_id": "q" * 22, "error": None})
+    body = BatchPrepareResponse.model_validate({"results": results}).model_dump(mode="json")
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def fast_batch(entries):
+    return {"results": [{"index": n, "summary": None, "candidates": [_candidate_out(c, "osrm") for c in cands],
+                         "split_plan": None, "quote_id": "q" * 22, "error": None}
+                        for n, cands in enumerate(entries)]}
+
+def run(repeat: int):
+    out = []
+
+    def add(name, n, fn, legacy_s=None):
+        t = timed(fn, repeat)
+        row = {"case": name, "n": n, "seconds": t, "us_per_response": t*1e6}
+        if legacy_s:
+            row["speedup"] = round(legacy_s / t, 2)
+        out.append(row)
+        return t
+
+    for k in (5, 50, 500):
+        cands = _candidates(k)
+        base = add(f"prepare_legacy[candidates={k}]", k, lambda: legacy_prepare(cands))
+        add(f"prepare_orjson[candidates={k}]", k, lambda: encode_json(fast_payload(cands)[0]), base)
+        if msgpack is not None:
+            add(f"prepare_msgpack[candidates={k}]", k, lambda: msgpack.packb(fast_payload(cands)[0]), base)
+    for n in (50, 200):
+        entries = [_candidates(5)] * n
+        base = add(f"batch_legacy[entries={n}]", n, lambda: legacy_batch(entries))
+        add(f"batch_orjson[entries={n}]", n, lambda: encode_json(fast_batch(entries)), base)
+        if msgpack is not None:
+            add(f"batch_msgpack[entries={n}]", n, lambda: msgpack.packb(fast_batch(entries)), base)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out")
+    ap.add_argument("--compare", help="previous serialize JSON to diff against")
+    args = ap.parse_args()
+    with report.app_logs_to_stderr():
+        results = run(args.repeat)
+    doc = report.envelope("serialize", vars(args), results)
+    report.write(doc, args.out)
+    if args.compare:
+        report.compare(args.compare, doc, "seconds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Local stand-ins for OSRM, Groq and Gemini with injectable latency and failures.
+
+Distances are great-circle km with a fixed road factor, so results are
+deterministic and plausible without a routing graph.
+"""
+import asyncio, json, math, random, threading, time
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+ROAD_FACTOR = 1.25
+SPEED_KMPH = 45.0
+SUMMARY = ("Vendor 1 offers the best landed cost with an acceptable ETA; "
+           "Vendor 2 is the faster fallback at a small premium.")
+
+@dataclass
+class Fault:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    fail_rate: float = 0.0
+
+    async def apply(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay/1000.0)
+        return random.random() < self.fail_rate
+
+def _coords(path: str):
+    out = []
+    for pair in path.split(";"):
+        lng, lat = pair.split(",")
+        out.append((float(lat), float(lng)))
+    return out
+
+def _km(a, b):
+    la1, lo1, la2, lo2 = map(math.radians, (*a, *b))
+    h = math.sin((la2-la1)/2)**2 + math.cos(la1)*math.cos(la2)*math.sin((lo2-lo1)/2)**2
+    return 2*6371.0*math.asin(math.sqrt(h))*ROAD_FACTOR
+
+def _unavailable():
+    return JSONResponse({"code": "Unavailable"}, status_code=503)
+
+def build_app(osrm: Fault, llm: Fault) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = {"route": 0, "table": 0, "groq": 0, "gemini": 0}
+
+    @app.get("/route/v1/driving/{coords}")
+    async def route(coords: str):
+        app.state.calls["route"] += 1
+        if await osrm.apply():
+            return _unavailable()
+        a, b = _coords(coords)[:2]
+        km = _km(a, b)
+        return {"code": "Ok", "routes": [{"distance": km*1000.0, "duration": km/SPEED_KMPH*3600.0}]}
+
+    @app.get("/table/v1/driving/{coords}")
+    async def table(coords: str, sources: str, destinations: str):
+        app.state.calls["table"] += 1
+        if await osrm.apply():
+            return _unavailable()
+        pts = _coords(coords)
+        src = [pts[int(i)] for i in sources.split(";")]
+        dst = [pts[int(i)] for i in destinations.split(";")]
+        km = [[_km(s, d) for d in dst] for s in src]
+        return {"code": "Ok",
+                "distances": [[k*1000.0 for k in row] for row in km],
+                "durations": [[k/SPEED_KMPH*3600.0 for k in row] for row in km]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def groq(req: Request):
+        app.state.calls["groq"] += 1
+        body = await req.json()
+        if await llm.apply():
+            return _unavailable()
+        if not body.get("stream"):
+            return {"choices": [{"message": {"role": "assistant", "content": SUMMARY}}]}
+        async def events():
+            for word in SUMMARY.split(" "):
+                yield "data: " + json.dumps({"choices": [{"delta": {"content": word + " "}}]}) + "\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/models/{model_action}")
+    async def gemini(model_action: str):
+        app.state.calls["gemini"] += 1
+        if await llm.apply():
+            return _unavailable()
+        return {"candidates": [{"output": SUMMARY}]}
+
+    return app
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    """Run `app` on 127.0.0.1:port in a daemon thread; returns once it is accepting."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"server on port {port} did not start")
+        time.sleep(0.05)
+    return server
@@ -0,0 +1,42 @@
+import numpy as np
+from typing import Dict, List
+
+def synthetic_vendors(n: int, seed: int=0) -> List[Dict]:
+    """n vendors scattered over India with attributes in the demo catalog's ranges."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(8.0, 32.0, n)
+    lng = rng.uniform(69.0, 90.0, n)
+    return [{
+        "id": i + 1,
+        "name": f"Vendor {i + 1}",
+        "lat": float(lat[i]), "lng": float(lng[i]),
+        "on_time_rate": round(float(rng.uniform(0.8, 0.97)), 2),
+        "quality_score": round(float(rng.uniform(0.8, 0.95)), 2),
+        "accept_prob": round(float(rng.uniform(0.5, 0.8)), 2),
+        "rate_tkm": round(float(rng.uniform(3.4, 4.2)), 2),
+        "price_volatility": round(float(rng.uniform(0.02, 0.04)), 3),
+    } for i in range(n)]
+
+def synthetic_items(n: int=3) -> List[Dict]:
+    base = [
+        {"sku": "cement_bag_50kg", "desc": "Cement", "qty": 200, "weight_ton": 10.0},
+        {"sku": "rebar_tmt_10mm_ton", "desc": "TMT", "qty": 4, "weight_ton": 4.0},
+        {"sku": "sand_mt", "desc": "Sand", "qty": 12, "weight_ton": 12.0},
+    ]
+    return [dict(base[i % len(base)], unit_price=None) for i in range(n)]
+
+def synthetic_places(n: int, seed: int=0):
+    """n gazetteer localities with PIN codes, spread over 30 districts in 5 states."""
+    from app.geocode import LOCALITY, PIN, Place, builtin_places
+    rng = np.random.default_rng(seed)
+    syl = ["ka", "ra", "pu", "ne", "ma", "li", "go", "va", "shi", "der", "nag", "pal", "kot", "gaon", "wadi", "pur"]
+    states = ["maharashtra", "karnataka", "gujarat", "tamil nadu", "kerala"]
+    lat = rng.uniform(8.0, 32.0, n)
+    lng = rng.uniform(69.0, 90.0, n)
+    out = []
+    for i in range(n):
+        name = "".join(syl[j] for j in rng.integers(0, len(syl), 3))
+        state, district = states[i % 5], f"district{i % 30}"
+        out.append(Place(name, LOCALITY, float(lat[i]), float(lng[i]), state, district))
+        out.append(Place(str(400000 + i), PIN, float(lat[i]), float(lng[i]), state, district))
+    return out + builtin_places()
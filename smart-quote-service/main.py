@@ -1,15 +1,31 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import router as smart_router
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
 import os
 
-# Load .env from this folder explicitly so it works with any CWD
+# Load .env from this folder explicitly so it works with any CWD.
+# Must run before importing app.*: Settings reads its defaults from the env.
 load_dotenv(dotenv_path=Path(__file__).parent / ".env")
 
+from app.api import router as smart_router
+from app.resources import open_resources, close_resources
+from app.metrics import TimingMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Settings, HTTP pools, vendor data, caches and pre-warmed invoice
+    # workers, all built (and warmed) before the first request is accepted
+    app.state.resources = await open_resources()
+    try:
+        yield
+    finally:
+        await close_resources(app.state.resources)
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Smart Quote Service",
     version="1.0.0",
     description="AI-powered Smart Quotation and Supply Chain Optimization API."
@@ -24,8 +40,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Added last so it is outermost: latency and Server-Timing cover CORS too
+app.add_middleware(TimingMiddleware)
+
 @app.get("/")
 def root():
     return {"message": "Smart Quote Service is running"}
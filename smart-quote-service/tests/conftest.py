@@ -0,0 +1,26 @@
+import os, sys, tempfile
+from pathlib import Path
+
+# Offline: OSRM on a closed port (haversine fallback), no LLM keys, scratch invoice dir.
+# Set before app.* is imported: Settings reads its defaults from the env.
+os.environ.setdefault("OSRM_URL", "http://127.0.0.1:9")
+os.environ.setdefault("INVOICE_DIR", tempfile.mkdtemp(prefix="invoices-"))
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+for key in ("GEMINI_API_KEY", "GOOGLE_API_KEY", "GROQ_API_KEY"):
+    os.environ.pop(key, None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as c:
+        yield c
+
+def prepare_body(**project):
+    return {
+        "project": {"brief": "slab", "site_name": "Pune", "site_lat": 18.52, "site_lng": 73.85, **project},
+        "items": [{"sku": "cement_bag_50kg", "qty": 100, "weight_ton": 5}],
+    }
@@ -0,0 +1,60 @@
+import asyncio, random
+import pytest
+from app.admission import AdmissionGate, Overloaded
+
+async def _hold(gate, seconds):
+    async with gate.slot():
+        await asyncio.sleep(seconds)
+
+async def _try(gate):
+    try:
+        async with gate.slot():
+            await asyncio.sleep(0)
+        return True
+    except Overloaded:
+        return False
+
+def test_timeouts_racing_releases_keep_every_permit():
+    async def main():
+        rng = random.Random(0)
+        gate = AdmissionGate("test", limit=2, queue_max=100, wait_s=0.004, retry_after_s=1)
+        admitted = 0
+        for _ in range(300):
+            # Holders release right around the moment the waiters time out
+            holders = [asyncio.ensure_future(_hold(gate, rng.uniform(0.002, 0.006))) for _ in range(2)]
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(_try(gate)) for _ in range(4)]
+            admitted += sum(await asyncio.gather(*waiters))
+            await asyncio.gather(*holders)
+        # No permit was lost: the gate is idle and admits `limit` at once
+        assert gate._sem._value == 2 and gate.active == 0 and gate.waiting == 0
+        assert admitted and gate.timed_out
+    asyncio.run(main())
+
+def test_cancelled_waiter_releases_its_permit():
+    async def main():
+        gate = AdmissionGate("test", limit=1, queue_max=10, wait_s=5, retry_after_s=1)
+        holder = asyncio.ensure_future(_hold(gate, 0.01))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(_try(gate))
+        await asyncio.sleep(0)
+        await holder
+        # The permit is handed to the waiter; it is cancelled before it runs
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert gate._sem._value == 1 and not gate._sem.locked()
+    asyncio.run(main())
+
+@pytest.mark.parametrize("spins", range(4))
+def test_timeout_in_the_same_tick_as_the_release(spins):
+    async def main():
+        gate = AdmissionGate("test", limit=1, queue_max=10, wait_s=0, retry_after_s=1)
+        async with gate.slot():
+            waiter = asyncio.ensure_future(_try(gate))
+            for _ in range(spins):
+                await asyncio.sleep(0)
+        # Released while the zero timeout is already due
+        await waiter
+        assert gate._sem._value == 1 and gate.active == 0 and gate.waiting == 0
+    asyncio.run(main())
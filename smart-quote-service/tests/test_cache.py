@@ -0,0 +1,10 @@
+from app.cache import SharedCache
+
+def test_corrupt_value_is_a_miss(tmp_path):
+    cache = SharedCache(str(tmp_path / "shared.db"))
+    cache.set_many("route", {"good": [1.0, 2.0], "bad": [3.0, 4.0]}, ttl_s=60)
+    cache._conn().execute("UPDATE entries SET value = ? WHERE key = 'bad'", (b'[3.0, 4',))
+    assert cache.get_many("route", ["good", "bad"]) == {"good": [1.0, 2.0]}
+    assert cache._conn().execute("SELECT COUNT(*) FROM entries WHERE key = 'bad'").fetchone()[0] == 0
+    cache.set("route", "bad", [3.0, 4.0], ttl_s=60)
+    assert cache.get("route", "bad") == [3.0, 4.0]
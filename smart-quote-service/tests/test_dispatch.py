@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+from app.config import get_settings
+from app.dispatch import plan_dispatch
+from conftest import prepare_body
+
+def test_oversized_window_is_rejected(client):
+    days = get_settings().dispatch_max_window_days
+    assert client.post("/v1/smart-quote/prepare", json=prepare_body(delivery_window_days=days + 1)).status_code == 422
+    assert client.post("/v1/smart-quote/prepare", json=prepare_body(delivery_window_days=0)).status_code == 422
+    r = client.post("/v1/smart-quote/prepare", json=prepare_body(delivery_window_days=days))
+    assert r.status_code == 200 and r.json()["candidates"]
+
+def test_plan_dispatch_clamps_window():
+    days = get_settings().dispatch_max_window_days
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # The last slot ends inside the clamped window, whatever was asked for
+    plan = plan_dispatch([60.0] * 500, 100 * days, start)
+    assert plan.slot.max() < days * 24
@@ -0,0 +1,46 @@
+import os, signal, threading, time
+import app.invoice_queue as iq
+from app.invoice_queue import InvoiceQueue
+
+def test_concurrent_first_submits_share_one_pool(monkeypatch):
+    made = []
+
+    class Pool(iq.ProcessPoolExecutor):
+        def __init__(self, *a, **kw):
+            time.sleep(0.05)  # widen the check-then-create window
+            made.append(self)
+            super().__init__(*a, **kw)
+
+    monkeypatch.setattr(iq, "ProcessPoolExecutor", Pool)
+    q = InvoiceQueue(workers=1)
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def first():
+        barrier.wait()
+        pools.append(q.start(wait=False))
+
+    threads = [threading.Thread(target=first) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert len(made) == 1 and all(p is made[0] for p in pools)
+    finally:
+        q.shutdown()
+
+def test_broken_pool_is_replaced(tmp_path):
+    q = InvoiceQueue(workers=1)
+    q.start()
+    try:
+        for pid in list(q._pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+        job = q.submit("<p>x</p>", str(tmp_path / "x.pdf"), str(tmp_path / "x.html"))
+        deadline = time.time() + 30
+        while q.get(job)["status"] == "queued" and time.time() < deadline:
+            time.sleep(0.05)
+        assert q.get(job)["status"] in ("done", "html_only") and q.stats()["pool_restarts"] == 1
+    finally:
+        q.shutdown()
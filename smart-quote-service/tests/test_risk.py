@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import app.risk
+from app.ranking import CandidateBatch
+from app.risk import MIN_SCENARIOS, RiskBudgetExceeded, simulate_risk
+from conftest import prepare_body
+
+def _batch(n):
+    ones = np.ones(n)
+    return CandidateBatch(
+        vendor_id=np.arange(n), vendor_name=[str(i) for i in range(n)], distance_km=10*ones, eta_minutes=30*ones,
+        on_time_rate=0.9*ones, quality_score=0.8*ones, acceptance_prob=0.9*ones, price_volatility=0.1*ones,
+        material_cost=1000*ones, taxes=180*ones, handling=10*ones, freight_cost=50*ones,
+    )
+
+def test_over_cap_is_refused():
+    assert simulate_risk(_batch(10), 336, scenarios=2000, max_cells=10 * MIN_SCENARIOS).scenarios == MIN_SCENARIOS
+    with pytest.raises(RiskBudgetExceeded):
+        simulate_risk(_batch(11), 336, scenarios=2000, max_cells=10 * MIN_SCENARIOS)
+
+def test_over_cap_request_is_a_422(client, monkeypatch):
+    body = {**prepare_body(), "risk_mode": True}
+    r = client.post("/v1/smart-quote/prepare", json=body)
+    assert r.status_code == 200 and r.json()["risk_applied"] and r.json()["candidates"][0]["risk"]
+    assert not client.post("/v1/smart-quote/prepare", json=prepare_body()).json()["risk_applied"]
+    monkeypatch.setattr(app.risk, "MIN_SCENARIOS", 10**9)
+    body["risk_seed"] = 1
+    r = client.post("/v1/smart-quote/prepare", json=body)
+    assert r.status_code == 422 and "prefilter_k" in r.json()["detail"]
+    r = client.post("/v1/smart-quote/prepare-batch", json={"requests": [body]})
+    assert r.status_code == 200 and "prefilter_k" in r.json()["results"][0]["error"]
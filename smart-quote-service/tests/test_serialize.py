@@ -0,0 +1,33 @@
+import pytest
+from starlette.requests import Request
+from app.serialize import wants_msgpack
+from conftest import prepare_body
+
+def _request(accept):
+    headers = [] if accept is None else [(b"accept", accept.encode())]
+    return Request({"type": "http", "headers": headers})
+
+@pytest.mark.parametrize("accept, msgpack", [
+    (None, False),
+    ("*/*", False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("application/json, application/msgpack;q=0", False),
+    ("application/msgpack;q=0, */*", False),
+    ("application/msgpack;q=0.5, application/json", False),
+    ("application/json;q=0.5, application/msgpack", True),
+    ("application/msgpack, */*;q=0.1", True),
+    ("application/*;q=0.2, application/msgpack;q=0.9", True),
+    ("application/json;q=0.9, application/*;q=0.5", False),
+    ("Application/MsgPack; Q=0.8, application/json; q=0.3", True),
+])
+def test_accept_negotiation(accept, msgpack):
+    assert wants_msgpack(_request(accept)) is msgpack
+
+def test_msgpack_response(client):
+    r = client.post("/v1/smart-quote/prepare", json=prepare_body(),
+                    headers={"Accept": "application/json, application/msgpack;q=0"})
+    assert r.headers["content-type"] == "application/json" and r.json()["candidates"]
+    r = client.post("/v1/smart-quote/prepare", json=prepare_body(), headers={"Accept": "application/msgpack"})
+    assert r.headers["content-type"] == "application/msgpack"
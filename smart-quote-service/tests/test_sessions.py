@@ -0,0 +1,21 @@
+import numpy as np
+from app.cache import SharedCache
+from app.sessions import QuoteSessionStore, get_quote_sessions, rerank
+from conftest import prepare_body
+
+def test_session_is_shared_across_workers(client, tmp_path):
+    body = {**prepare_body(), "risk_mode": True}
+    quote_id = client.post("/v1/smart-quote/prepare", json=body).json()["quote_id"]
+    local = get_quote_sessions().get(quote_id)
+    # Two workers' stores over one cache file
+    a = QuoteSessionStore(10, 60, SharedCache(str(tmp_path / "shared.db")))
+    b = QuoteSessionStore(10, 60, SharedCache(str(tmp_path / "shared.db")))
+    fields = {k: getattr(local, k) for k in local.__dataclass_fields__ if k != "quote_id"}
+    s = a.put(**fields)
+    remote = b.get(s.quote_id)
+    assert remote is not None and b.get("missing") is None
+    for args in ({}, {"weights": {"eta": 0.9}, "quantities": {0: 250}}):
+        want, got = rerank(s, **args), rerank(remote, **args)
+        assert np.array_equal(want[1], got[1]) and np.allclose(want[2], got[2])
+        assert np.array_equal(want[4].p90, got[4].p90)
+    assert remote.dispatch.dispatch_at(0) == s.dispatch.dispatch_at(0)